@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
@@ -7,10 +7,21 @@ import bcrypt
 import jwt
 from datetime import datetime, timedelta
 import json
+import time
 import mlflow
 import mlflow.pyfunc
-import pandas as pd
-from model_loader import load_production_model 
+import numpy as np
+from model_loader import load_scoring_model, FEATURE_COLUMNS
+from scoring import prediction_cache, compute_features_matrix, DEFAULT_TOP_K, MAX_TOP_K
+from score_table import build_score_table
+from parallel_scoring import ScoringExecutor, score_and_select
+from response_cache import ResponseCache, request_key, profile_fingerprint
+from retrieval import shortlist, prior_scores, heuristic_scores
+from recommendation_store import open_store, model_fingerprint
+from cuisine_taxonomy import get_taxonomy
+from inference_telemetry import InferenceTelemetry, summarize_inference
+from recipe_catalog import RecipeCatalog, parse_ingredients_list, normalize_ingredients, unpack_bitmap
+from shared_catalog import open_shared_catalog
 
 # Load environment variables
 load_dotenv()
@@ -45,23 +56,121 @@ MLFLOW_EXPERIMENT = os.getenv('MLFLOW_EXPERIMENT', 'FlavorFit-Recommendation')
 mlflow.set_tracking_uri(MLFLOW_URI)
 mlflow.set_experiment(MLFLOW_EXPERIMENT)
 
+# Inference runs are queued here and written by a background thread
+inference_telemetry = InferenceTelemetry(MLFLOW_EXPERIMENT)
+
 # ================= LOAD MODEL ==================
 try:
-    ml_model = load_production_model()
+    ml_model = load_scoring_model()
     print("✓ ML model loaded successfully")
 except Exception as e:
     ml_model = None
     print(f"✗ ML model failed to load: {e}")
 
+# Optional dense score table for this model version (ML_SCORE_TABLE_MAX_INGREDIENTS)
+score_table = build_score_table(ml_model)
+
+# Serial or sharded scoring depending on the candidate count (see parallel_scoring.py)
+scoring_executor = ScoringExecutor()
+
+# Finished /api/recommend responses (see response_cache.py)
+response_cache = ResponseCache()
+
+# Offline precomputed responses for preset requests (PRECOMPUTED_STORE_PATH,
+# filled by precompute_recommendations.py)
+precomputed_store = open_store()
+
 # Initialize Supabase client
 supabase_url = os.getenv('SUPABASE_URL')
 supabase_key = os.getenv('SUPABASE_KEY')
 
+def create_supabase_client():
+    """Supabase client from SUPABASE_URL/SUPABASE_KEY, or None when they are not set"""
+    if not supabase_url or not supabase_key:
+        return None
+    return create_client(supabase_url, supabase_key)
+
 if not supabase_url or not supabase_key:
     print("WARNING: SUPABASE_URL and SUPABASE_KEY must be set in .env file")
-    supabase = None
-else:
-    supabase: Client = create_client(supabase_url, supabase_key)
+supabase: Client = create_supabase_client()
+
+# ================= RECIPE CATALOG ==================
+# Rows per request when paging through the recipes table
+CATALOG_PAGE_SIZE = int(os.getenv('RECIPE_CATALOG_PAGE_SIZE', 1000))
+
+def fetch_all_recipes():
+    """Fetch the full recipes table page by page"""
+    recipes = []
+    start = 0
+    while True:
+        page = (supabase.table('recipes').select('*').order('id')
+                .range(start, start + CATALOG_PAGE_SIZE - 1).execute().data)
+        recipes.extend(page)
+        if len(page) < CATALOG_PAGE_SIZE:
+            return recipes
+        start += CATALOG_PAGE_SIZE
+
+def fetch_recipe_changes(updated_since, after_id):
+    """Recipes with updated_at >= updated_since (or id > after_id), page by page"""
+    recipes = []
+    start = 0
+    while True:
+        query = supabase.table('recipes').select('*')
+        if updated_since is not None:
+            query = query.gte('updated_at', updated_since).order('updated_at').order('id')
+        else:
+            query = query.gt('id', after_id if after_id is not None else -1).order('id')
+        page = query.range(start, start + CATALOG_PAGE_SIZE - 1).execute().data
+        recipes.extend(page)
+        if len(page) < CATALOG_PAGE_SIZE:
+            return recipes
+        start += CATALOG_PAGE_SIZE
+
+def fetch_recipe_ids():
+    """Every recipe id (a narrow scan used to detect deleted recipes)"""
+    ids = []
+    start = 0
+    while True:
+        page = (supabase.table('recipes').select('id').order('id')
+                .range(start, start + CATALOG_PAGE_SIZE - 1).execute().data)
+        ids.extend(row['id'] for row in page)
+        if len(page) < CATALOG_PAGE_SIZE:
+            return ids
+        start += CATALOG_PAGE_SIZE
+
+# Loaded lazily on the first recipe request, then kept fresh in the background
+# by change polling (RECIPE_CATALOG_SYNC_SECONDS) and rare full reloads. With
+# RECIPE_CATALOG_SHARED_DIR, workers memory-map one on-disk snapshot instead
+recipe_catalog = RecipeCatalog(fetch_all_recipes, fetch_changes_fn=fetch_recipe_changes,
+                               fetch_ids_fn=fetch_recipe_ids, shared=open_shared_catalog())
+
+
+# ================= PRE-FORK SERVING ==================
+# gunicorn.conf.py imports this module once in the master (preload_app), so the
+# model above is loaded before the workers fork and shared copy-on-write
+
+def preload_for_workers():
+    """Load the read-only recipe catalog in the master, before workers fork"""
+    if not supabase:
+        return
+    try:
+        recipe_catalog.preload()
+    except Exception as e:
+        print(f"⚠️ Recipe catalog preload failed, workers load it on first use: {e}")
+
+def init_worker():
+    """Re-create the clients, pools and threads a forked worker cannot share with the master"""
+    global supabase
+    # HTTP clients: pooled connections opened in the master must not be reused
+    supabase = create_supabase_client()
+    try:
+        from mlflow.utils.request_utils import _cached_get_request_session
+        _cached_get_request_session.cache_clear()
+    except (ImportError, AttributeError):
+        pass
+    scoring_executor.after_fork()
+    inference_telemetry.after_fork()
+    recipe_catalog.after_fork()
 
 
 # ============= HELPER FUNCTIONS =============
@@ -93,35 +202,18 @@ def verify_token(token):
     except jwt.InvalidTokenError:
         return None
 
-def parse_ingredients_list(ingredients_str):
-    """Parse ingredients list from string to array"""
-    if not ingredients_str:
-        return []
-    
-    # If it's already a list, return it
-    if isinstance(ingredients_str, list):
-        return ingredients_str
-    
-    try:
-        # Try to parse as JSON array
-        if ingredients_str.startswith('['):
-            parsed = json.loads(ingredients_str.replace("'", '"'))
-            return parsed if isinstance(parsed, list) else []
-    except:
-        pass
-    
-    # Fallback: split by comma
-    return [ing.strip() for ing in ingredients_str.split(',') if ing.strip()]
-
-def format_recipe(recipe):
-    """Format recipe data for response"""
+def format_recipe(recipe, ingredients_list=None):
+    """Format recipe data for response (ingredients_list: already parsed ingredients)"""
     if not recipe:
         return None
     
+    if ingredients_list is None:
+        ingredients_list = parse_ingredients_list(recipe.get('ingredients_list', []))
+    
     return {
         'id': recipe['id'],
         'recipe_name': recipe.get('recipe_name', 'Unknown Recipe'),
-        'ingredients_list': parse_ingredients_list(recipe.get('ingredients_list', [])),
+        'ingredients_list': ingredients_list,
         'cuisine': recipe.get('cuisine', 'Various'),
         'cook_time_minutes': recipe.get('cook_time_minutes', 30),
         'timing': recipe.get('timing', ''),
@@ -135,7 +227,7 @@ def format_recipe(recipe):
 
 
 # ============= ML HELPER FUNCTIONS =============
-def compute_recipe_features(user_prefs, recipe):
+def compute_recipe_features(user_prefs, recipe, ingredients=None):
     """
     Compute the 5 features needed by the model
     (Same as the working test version)
@@ -143,6 +235,7 @@ def compute_recipe_features(user_prefs, recipe):
     Args:
         user_prefs: dict with user preferences
         recipe: dict with recipe details
+        ingredients: optional pre-normalized ingredient set from the catalog
     
     Returns:
         dict with the 5 computed features
@@ -151,16 +244,20 @@ def compute_recipe_features(user_prefs, recipe):
     max_cooking_time = user_prefs.get('max_cooking_time', 60)
     
     # Feature 2: Recipe attribute - cook time
-    recipe_cook_time = recipe.get('cook_time_minutes', 30)
+    recipe_cook_time = recipe.get('cook_time_minutes')
+    if recipe_cook_time is None:
+        recipe_cook_time = 30
     
     # Feature 3: Difference in cooking time
     cook_time_diff = abs(recipe_cook_time - max_cooking_time)
     
     # Feature 4: Ingredient overlap ratio
     # Calculate how many ingredients user can eat vs total ingredients
-    user_allergies = set(user_prefs.get('allergies', []))
-    user_dislikes = set(user_prefs.get('disliked_ingredients', []))
-    recipe_ingredients = set(parse_ingredients_list(recipe.get('ingredients_list', [])))
+    user_allergies = normalize_ingredients(user_prefs.get('allergies', []))
+    user_dislikes = normalize_ingredients(user_prefs.get('disliked_ingredients', []))
+    if ingredients is None:
+        ingredients = normalize_ingredients(parse_ingredients_list(recipe.get('ingredients_list', [])))
+    recipe_ingredients = ingredients
     
     blocked_ingredients = user_allergies | user_dislikes
     usable_ingredients = recipe_ingredients - blocked_ingredients
@@ -381,6 +478,7 @@ def update_profile():
         update_data = {k: v for k, v in update_data.items() if v is not None}
         
         result = supabase.table('users').update(update_data).eq('id', payload['user_id']).execute()
+        response_cache.invalidate_user(payload['user_id'])
         
         if result.data:
             user = result.data[0]
@@ -419,19 +517,18 @@ def get_recipes():
         max_time = request.args.get('maxTime', type=int)
         limit = request.args.get('limit', 20, type=int)
         
-        # Build query
-        query = supabase.table('recipes').select('*')
-        
-        if cuisine and cuisine != 'Any':
-            query = query.eq('cuisine', cuisine)
-        
-        if max_time:
-            query = query.lte('cook_time_minutes', max_time)
-        
-        result = query.limit(limit).execute()
+        # Filter the in-memory catalog
+        catalog = recipe_catalog.get_snapshot()
+        rows = catalog.filter_rows(
+            cuisine=cuisine if cuisine != 'Any' else None,
+            max_time=max_time
+        )
         
         # Format recipes
-        formatted_recipes = [format_recipe(recipe) for recipe in result.data]
+        formatted_recipes = [
+            format_recipe(catalog.record(row), catalog.ingredient_lists[row])
+            for row in rows[:max(limit, 0)]
+        ]
         
         return jsonify({
             'recipes': formatted_recipes
@@ -448,13 +545,20 @@ def get_recipe(recipe_id):
         if not supabase:
             return jsonify({'error': 'Database not configured'}), 500
             
-        result = supabase.table('recipes').select('*').eq('id', recipe_id).execute()
-        
-        if not result.data:
-            return jsonify({'error': 'Recipe not found'}), 404
+        catalog = recipe_catalog.get_snapshot()
+        row = catalog.row_by_id.get(recipe_id)
+        
+        if row is None:
+            # Not in the snapshot yet: it may have been added since the last refresh
+            result = supabase.table('recipes').select('*').eq('id', recipe_id).execute()
+            if not result.data:
+                return jsonify({'error': 'Recipe not found'}), 404
+            return jsonify({
+                'recipe': format_recipe(result.data[0])
+            }), 200
         
         return jsonify({
-            'recipe': format_recipe(result.data[0])
+            'recipe': format_recipe(catalog.record(row), catalog.ingredient_lists[row])
         }), 200
         
     except Exception as e:
@@ -479,6 +583,9 @@ def like_recipe(recipe_id):
         if not payload:
             return jsonify({'error': 'Invalid or expired token'}), 401
         
+        # Cached recommendations for this user are stale after feedback
+        response_cache.invalidate_user(payload['user_id'])
+
         # Check if already liked
         existing = supabase.table('recipe_likes').select('*').eq('user_id', payload['user_id']).eq('recipe_id', recipe_id).execute()
         
@@ -521,6 +628,9 @@ def dislike_recipe(recipe_id):
         if not payload:
             return jsonify({'error': 'Invalid or expired token'}), 401
         
+        # Cached recommendations for this user are stale after feedback
+        response_cache.invalidate_user(payload['user_id'])
+
         # Check if already disliked
         existing = supabase.table('recipe_dislikes').select('*').eq('user_id', payload['user_id']).eq('recipe_id', recipe_id).execute()
         
@@ -602,25 +712,304 @@ def get_disliked_recipes():
         return jsonify({'error': str(e)}), 500
 
 # ============= ML RECOMMENDATION ROUTE ============
+# Largest number of users accepted by one /api/recommend/batch call
+RECOMMEND_BATCH_MAX_USERS = int(os.getenv('RECOMMEND_BATCH_MAX_USERS', 500))
+
+# Default time budget of /api/recommend in milliseconds (0 = none); requests
+# may set their own deadline_ms
+RECOMMEND_DEADLINE_MS = float(os.getenv('RECOMMEND_DEADLINE_MS', 0))
+
+# Streaming formats of /api/recommend
+STREAM_MIMETYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
+
+def parse_recommend_options(data):
+    """
+    Normalized options of one recommendation request
+
+    Raises:
+        ValueError: top_k or deadline_ms is not a positive number
+    """
+    # Get search ingredients from request
+    search_ingredients = data.get('search_ingredients', [])  # e.g., ['chicken']
+    if isinstance(search_ingredients, str):
+        search_ingredients = [search_ingredients]
+    search_ingredients = set([ing.lower().strip() for ing in search_ingredients if ing])
+
+    # Number of recipes to return (server default, capped at MAX_TOP_K)
+    try:
+        top_k = int(data.get('top_k', DEFAULT_TOP_K))
+    except (TypeError, ValueError):
+        raise ValueError('top_k must be a positive integer')
+    if top_k < 1:
+        raise ValueError('top_k must be a positive integer')
+
+    # Time budget for the request (None = unbounded)
+    deadline_ms = data.get('deadline_ms') or RECOMMEND_DEADLINE_MS or None
+    if deadline_ms is not None:
+        try:
+            deadline_ms = float(deadline_ms)
+        except (TypeError, ValueError):
+            raise ValueError('deadline_ms must be a positive number')
+        if not deadline_ms > 0:
+            raise ValueError('deadline_ms must be a positive number')
+
+    # Get preferred cuisines
+    preferred_cuisines = data.get('preferred_cuisine', [])
+    if isinstance(preferred_cuisines, str):
+        preferred_cuisines = [preferred_cuisines]
+
+    return {
+        'deadline_ms': deadline_ms,
+        'search_ingredients': search_ingredients,
+        'top_k': min(top_k, MAX_TOP_K),
+        'preferred_cuisine': preferred_cuisines,
+        'preferred_cuisines': set([c.lower().strip() for c in preferred_cuisines if c]),
+        'max_cooking_time': data.get('max_cooking_time', 60),
+    }
+
+
+def recommend_cache_key(user_id, user, options):
+    return request_key(user_id, profile_fingerprint(user), options['preferred_cuisines'],
+                       options['max_cooking_time'], options['search_ingredients'], options['top_k'])
+
+
+def select_candidates(catalog, user, options, shortlist_size=None):
+    """
+    Catalog rows passing a user's hard filters, with their model features and boost inputs
+
+    Args:
+        shortlist_size: first-stage size (default RECOMMEND_SHORTLIST_SIZE)
+
+    Returns:
+        dict with 'filtered' (catalog row indices of the shortlisted
+        candidates), 'num_candidates' (rows passing the filters), 'features'
+        and the match_counts / time_diffs / cuisine_matches boost inputs
+    """
+    allergies = normalize_ingredients(user.get('allergies', []))
+    disliked = normalize_ingredients(user.get('disliked_ingredients', []))
+    diet = user.get('diet', 'regular')
+    search_ingredients = options['search_ingredients']
+    preferred_cuisines = options['preferred_cuisines']
+
+    user_prefs = {
+        'preferred_cuisine': options['preferred_cuisine'],
+        'max_cooking_time': options['max_cooking_time'],
+        'allergies': list(allergies),
+        'disliked_ingredients': list(disliked),
+        'diet': diet
+    }
+
+    # ---------------- Hard rules filter ----------------
+    # Expand umbrella categories (e.g. 'asian') to the cuisines stored on recipes
+    filter_cuisines = get_taxonomy().expand(preferred_cuisines)
+
+    # Allergies and dislikes: OR of the blocked ingredients' bitmaps, removed
+    # from the candidate set in one vectorized step
+    candidates = unpack_bitmap(catalog.exclude_ingredients(allergies | disliked), len(catalog))
+
+    # Skip if diet doesn't match
+    if diet != 'regular':
+        diet_code = catalog.diet_index.get(diet)
+        candidates &= catalog.diet_codes == (diet_code if diet_code is not None else -1)
+
+    # **HARD FILTER: Skip if cuisine doesn't match (when user specified one)**
+    if filter_cuisines:
+        candidates &= catalog.cuisine_mask(filter_cuisines)
+
+    # **If user searched for specific ingredients, only include recipes that contain them**
+    # Partial matches ("chicken" -> "chicken breast") resolve through the
+    # catalog's trigram index; the counts are reused by the ingredient boost
+    if search_ingredients:
+        search_matches = catalog.search_match_counts(search_ingredients)
+        candidates &= search_matches > 0
+
+    filtered = np.flatnonzero(candidates)
+
+    # Boost inputs, applied to the base scores as array operations:
+    # BOOST 1: ingredient search matches (0.2 each)
+    # BOOST 2: cooking time within 5 / 15 / 30 minutes of the maximum
+    # BOOST 3: the recipe's own cuisine was requested (not just its umbrella category)
+    match_counts = search_matches[filtered] if search_ingredients else np.zeros(len(filtered))
+    cook_times = catalog.cook_time_minutes[filtered]
+    cook_times = np.where(np.isnan(cook_times), 60.0, cook_times)
+    time_diffs = np.abs(cook_times - user_prefs.get('max_cooking_time', 60))
+    cuisine_matches = catalog.cuisine_mask(preferred_cuisines)[filtered]
+
+    # ---------------- Stage 1: shortlist by a cheap prior ----------------
+    # Only the RECOMMEND_SHORTLIST_SIZE best candidates by prior (boosts,
+    # rating, cook time distance) reach feature computation and the model
+    num_candidates = len(filtered)
+    keep = shortlist(catalog, filtered, match_counts, time_diffs, cuisine_matches, size=shortlist_size)
+    if len(keep) < num_candidates:
+        filtered, match_counts = filtered[keep], match_counts[keep]
+        time_diffs, cuisine_matches = time_diffs[keep], cuisine_matches[keep]
+    filtered = filtered.tolist()
+
+    # Model features of the remaining recipes
+    features = compute_features_matrix(user_prefs, catalog, filtered)
+
+    return {
+        'filtered': filtered,
+        'num_candidates': num_candidates,
+        'features': features,
+        'match_counts': match_counts,
+        'time_diffs': time_diffs,
+        'cuisine_matches': cuisine_matches,
+    }
+
+
+def empty_recommend_payload(options):
+    message = 'No recipes found with these ingredients' if options['search_ingredients'] else 'No recipes match your preferences'
+    return {'recipes': [], 'message': message, 'total_candidates': 0, 'total_scored': 0}
+
+
+# Failed predictions logged one by one per request; the rest are only counted
+LOG_FAILED_PREDICTIONS_MAX = 5
+
+def log_failed_predictions(catalog, selected, scored):
+    failed = np.flatnonzero(scored.failed).tolist()
+    for idx in failed[:LOG_FAILED_PREDICTIONS_MAX]:
+        print(f"ML prediction error for recipe {catalog.ids[selected['filtered'][idx]]}: {scored.errors[idx]}")
+        print(f"Features were: {dict(zip(FEATURE_COLUMNS, selected['features'][idx].tolist()))}")
+    if len(failed) > LOG_FAILED_PREDICTIONS_MAX:
+        print(f"ML prediction failed for {len(failed) - LOG_FAILED_PREDICTIONS_MAX} more recipes "
+              f"(ranked by the heuristic score)")
+
+
+def recommend_header(selected, options, scored=None):
+    """Response fields other than 'recipes'"""
+    num_scored = len(selected['filtered'])
+    header = {
+        'total_candidates': selected['num_candidates'],
+        'total_scored': num_scored,
+        # Candidates after the hard filters, the stage 1 shortlist sent to
+        # the model, and the recipes returned
+        'stage_sizes': {
+            'filtered': selected['num_candidates'],
+            'shortlisted': num_scored,
+            'returned': min(options['top_k'], num_scored),
+        },
+        'top_k': options['top_k'],
+        'search_ingredients': list(options['search_ingredients']) if options['search_ingredients'] else []
+    }
+    if scored is not None:
+        # Candidates ranked by the heuristic instead of the model (deadline
+        # reached, model missing or failing); any makes the result partial
+        heuristic = int(np.count_nonzero(scored.failed | scored.unscored))
+        header['heuristic_scored'] = heuristic
+        header['partial'] = heuristic > 0
+    return header
+
+
+def iter_recommend_items(catalog, selected, scored):
+    """Formatted top recipes, best first, produced one at a time"""
+    filtered = selected['filtered']
+    for idx in scored.top.tolist():
+        row = filtered[idx]
+        item = format_recipe(catalog.record(row), catalog.ingredient_lists[row])
+        item['ml_score'] = round(float(scored.final_scores[idx]), 4)
+        yield item
+
+
+def recommend_payload(catalog, selected, scored, options):
+    """Response body for one user's scored candidates"""
+    log_failed_predictions(catalog, selected, scored)
+    return {'recipes': list(iter_recommend_items(catalog, selected, scored)),
+            **recommend_header(selected, options, scored)}
+
+
+def recommend_stream_format():
+    """
+    'ndjson', 'sse' or None (a single JSON document) for this request
+
+    Chosen by ?stream=ndjson|sse (?stream=1 means ndjson) or by an Accept
+    header preferring application/x-ndjson or text/event-stream.
+    """
+    flag = request.args.get('stream', '').lower().strip()
+    if flag in ('ndjson', 'sse'):
+        return flag
+    if flag in ('1', 'true', 'yes'):
+        return 'ndjson'
+    accept = request.accept_mimetypes
+    for stream_format, mimetype in STREAM_MIMETYPES.items():
+        if accept[mimetype] > accept['application/json']:
+            return stream_format
+    return None
+
+
+def stream_recommendations(stream_format, header, items, on_complete=None):
+    """
+    Streamed response: a header record, one record per ranked recipe, then an end record
+
+    Each record is {"type": "header" | "recipe" | "end" | "error", ...}; a
+    recipe record carries its 1-based rank. NDJSON writes one record per
+    line, SSE one event per record (event name = record type). Recipes are
+    formatted and serialized as the client reads them. on_complete receives
+    the full payload once every recipe has been sent.
+    """
+    def encode(record):
+        data = json.dumps(record, separators=(',', ':'))
+        if stream_format == 'sse':
+            return f"event: {record['type']}\ndata: {data}\n\n"
+        return data + '\n'
+
+    def generate():
+        yield encode({'type': 'header', **header})
+        recipes = []
+        try:
+            for item in items:
+                recipes.append(item)
+                yield encode({'type': 'recipe', 'rank': len(recipes), 'recipe': item})
+        except Exception as e:
+            print(f"Recommendation stream error: {e}")
+            yield encode({'type': 'error', 'error': str(e)})
+            return
+        yield encode({'type': 'end', 'count': len(recipes)})
+        if on_complete is not None:
+            on_complete({'recipes': recipes, **header})
+
+    response = Response(generate(), mimetype=STREAM_MIMETYPES[stream_format])
+    # Keep proxies (nginx) from buffering the stream
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def send_recommend_payload(stream_format, payload):
+    """A finished payload as one JSON document, or streamed like a fresh result"""
+    if stream_format is None:
+        return jsonify(payload)
+    header = {key: value for key, value in payload.items() if key != 'recipes'}
+    return stream_recommendations(stream_format, header, iter(payload['recipes']))
+
+
 @app.route('/api/recommend', methods=['POST'])
 def recommend():
-    """Recommend recipes based on ML model with ingredient search filtering"""
+    """
+    Recommend recipes based on ML model with ingredient search filtering
+
+    Without a loaded model, or past the request's deadline_ms, candidates are
+    ranked by a heuristic score and the response is flagged as partial.
+    """
+    started = time.monotonic()
     try:
         if not supabase:
             return jsonify({'error': 'Database not configured'}), 500
-        if not ml_model:
-            return jsonify({'error': 'ML model not loaded'}), 500
 
         data = request.json
         user_id = data.get('user_id')
         if not user_id:
             return jsonify({'error': 'user_id required'}), 400
 
-        # Get search ingredients from request
-        search_ingredients = data.get('search_ingredients', [])  # e.g., ['chicken']
-        if isinstance(search_ingredients, str):
-            search_ingredients = [search_ingredients]
-        search_ingredients = set([ing.lower().strip() for ing in search_ingredients if ing])
+        try:
+            options = parse_recommend_options(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        search_ingredients = options['search_ingredients']
+        preferred_cuisines = options['preferred_cuisines']
+        top_k = options['top_k']
+        stream_format = recommend_stream_format()
 
         # ---------------- Fetch user -----------------
         user_result = supabase.table('users').select('*').eq('id', user_id).execute()
@@ -628,190 +1017,229 @@ def recommend():
             return jsonify({'error': 'User not found'}), 404
         user = user_result.data[0]
 
-        allergies = set(user.get('allergies', []))
-        disliked = set(user.get('disliked_ingredients', []))
-        diet = user.get('diet', 'regular')
+        # ---------------- Recipes (in-memory catalog) ----------------
+        catalog = recipe_catalog.get_snapshot()
 
-        user_prefs = {
-            'preferred_cuisine': data.get('preferred_cuisine', []),
-            'max_cooking_time': data.get('max_cooking_time', 60),
-            'allergies': list(allergies),
-            'disliked_ingredients': list(disliked),
-            'diet': diet
-        }
+        # ---------------- Response cache ----------------
+        cache_key = recommend_cache_key(user_id, user, options)
+        cached = response_cache.get(cache_key, ml_model, catalog.version)
+        if cached is not None:
+            return send_recommend_payload(stream_format, cached)
 
-        # ---------------- Fetch recipes ----------------
-        recipes_result = supabase.table('recipes').select('*').execute()
-        recipes = recipes_result.data
-
-        # ---------------- Hard rules filter ----------------
-        # Get preferred cuisines
-        preferred_cuisines = user_prefs.get('preferred_cuisine', [])
-        if isinstance(preferred_cuisines, str):
-            preferred_cuisines = [preferred_cuisines]
-        preferred_cuisines = set([c.lower().strip() for c in preferred_cuisines if c])
-        
-        # Map cuisine categories to actual database cuisines
-        CUISINE_MAPPING = {
-            'mediterranean': {'greek', 'moroccan', 'spanish', 'middle eastern', 'turkish', 'lebanese'},
-            'asian': {'chinese', 'japanese', 'thai', 'vietnamese', 'korean', 'asian'},
-            'european': {'french', 'italian', 'german', 'british', 'english', 'spanish', 'polish', 'dutch', 'austrian', 'scandinavian', 'hungarian', 'irish'}
-        }
-        
-        # Expand preferred cuisines based on mapping
-        expanded_cuisines = set()
-        for pref in preferred_cuisines:
-            if pref in CUISINE_MAPPING:
-                # Add all related cuisines
-                expanded_cuisines.update(CUISINE_MAPPING[pref])
-            else:
-                # Keep the original cuisine
-                expanded_cuisines.add(pref)
-        
-        # Use expanded cuisines for filtering
-        filter_cuisines = expanded_cuisines if expanded_cuisines else set()
-        
-        filtered = []
-        for r in recipes:
-            ingredients = set(parse_ingredients_list(r.get('ingredients_list')))
-            
-            # Skip if contains allergies
-            if allergies & ingredients:
-                continue
-            
-            # Skip if contains disliked ingredients
-            if disliked & ingredients:
-                continue
-            
-            # Skip if diet doesn't match
-            if diet != 'regular' and r.get('diet') != diet:
-                continue
-            
-            # **HARD FILTER: Skip if cuisine doesn't match (when user specified one)**
-            if filter_cuisines:
-                recipe_cuisine = str(r.get('cuisine', '')).lower().strip()
-                if recipe_cuisine not in filter_cuisines:
-                    continue
-            
-            # **If user searched for specific ingredients, only include recipes that contain them**
-            if search_ingredients:
-                # Convert recipe ingredients to lowercase for comparison
-                recipe_ingredients_lower = set([ing.lower().strip() for ing in ingredients])
-                
-                # Check if ANY of the searched ingredients are in the recipe
-                # Use partial matching (e.g., "chicken" matches "chicken breast")
-                if not any(
-                    search_ing in recipe_ing 
-                    for search_ing in search_ingredients 
-                    for recipe_ing in recipe_ingredients_lower
-                ):
-                    continue
-            
-            filtered.append(r)
+        # ---------------- Precomputed store (exact preset matches) ----------------
+        if precomputed_store is not None and not search_ingredients:
+            payload = precomputed_store.get(user_id, preferred_cuisines, options['max_cooking_time'], top_k,
+                                            profile_fingerprint(user), catalog.fingerprint(),
+                                            model_fingerprint(ml_model))
+            if payload is not None:
+                response_cache.put(cache_key, user_id, payload, ml_model, catalog.version)
+                return send_recommend_payload(stream_format, payload)
+
+        selected = select_candidates(catalog, user, options)
+        filtered = selected['filtered']
 
         if not filtered:
-            message = 'No recipes found with these ingredients' if search_ingredients else 'No recipes match your preferences'
-            return jsonify({'recipes': [], 'message': message, 'total_candidates': 0, 'total_scored': 0})
+            payload = empty_recommend_payload(options)
+            response_cache.put(cache_key, user_id, payload, ml_model, catalog.version)
+            return send_recommend_payload(stream_format, payload)
 
         # ---------------- ML scoring with boosting ----------------
-        scored = []
-        with mlflow.start_run(run_name=f"user_{user_id}_inference"):
-            # ---- SAFE PARAMS ----
-            mlflow.log_param("user_id", user_id)
-            mlflow.log_param("num_candidates", len(filtered))
-
-            if search_ingredients:
-                mlflow.log_param(
-                    "search_ingredients",
-                    ",".join(sorted(search_ingredients))  # ✅ stringify
-                )
-
-            if preferred_cuisines:
-                mlflow.log_param(
-                    "preferred_cuisines",
-                    ",".join(sorted(preferred_cuisines))  # ✅ stringify
-                )
-
-            for recipe in filtered:
-                features = compute_recipe_features(user_prefs, recipe)
-                input_df = pd.DataFrame([features])
-                
-                try:
-                    # Get base ML score
-                    base_score = float(ml_model.predict(input_df)[0])
-                    
-                    # Apply boosting to make scores more meaningful
-                    boosted_score = base_score
-                    
-                    # BOOST 1: Ingredient search match (0.2 bonus per matching ingredient)
-                    if search_ingredients:
-                        recipe_ingredients = set([ing.lower().strip() for ing in parse_ingredients_list(recipe.get('ingredients_list', []))])
-                        matches = sum(1 for search_ing in search_ingredients 
-                                    if any(search_ing in recipe_ing for recipe_ing in recipe_ingredients))
-                        if matches > 0:
-                            ingredient_boost = matches * 0.2
-                            boosted_score += ingredient_boost
-                            mlflow.log_metric(f"recipe_{recipe['id']}_ingredient_boost", ingredient_boost)
-                    
-                    # BOOST 2: Perfect/near-perfect cooking time match
-                    cook_time = recipe.get('cook_time_minutes', 60)
-                    max_time = user_prefs.get('max_cooking_time', 60)
-                    time_diff = abs(cook_time - max_time)
-                    if time_diff <= 5:
-                        time_boost = 0.15  # Within 5 minutes
-                        boosted_score += time_boost
-                    elif time_diff <= 15:
-                        time_boost = 0.10  # Within 15 minutes
-                        boosted_score += time_boost
-                    elif time_diff <= 30:
-                        time_boost = 0.05  # Within 30 minutes
-                        boosted_score += time_boost
-                    
-                    # BOOST 3: Cuisine match (already filtered, but boost for logging)
-                    if preferred_cuisines:
-                        recipe_cuisine = str(recipe.get('cuisine', '')).lower().strip()
-                        if recipe_cuisine in preferred_cuisines:
-                            cuisine_boost = 0.1
-                            boosted_score += cuisine_boost
-                    
-                    # Cap the score at 1.0 (100%)
-                    final_score = min(1.0, boosted_score)
-                    
-                    mlflow.log_metric(f"recipe_{recipe['id']}_base_score", base_score)
-                    mlflow.log_metric(f"recipe_{recipe['id']}_final_score", final_score)
-                    
-                except Exception as e:
-                    final_score = 0.0
-                    print(f"ML prediction error for recipe {recipe['id']}: {e}")
-                    print(f"Features were: {features}")
-                
-                scored.append((recipe, final_score))
-
-            scored.sort(key=lambda x: x[1], reverse=True)
-            if scored:
-                mlflow.log_param('top_recipe', scored[0][0]['recipe_name'])
-                mlflow.log_metric('top_score', scored[0][1])
+        # Base ML scores come from the score table when the features are on its
+        # grid, otherwise each distinct feature row is scored once (and rows
+        # seen in earlier requests come from the prediction cache). Scoring,
+        # boosting and partial top-K selection of large candidate pools are
+        # sharded across the scoring executor's workers
+        # Past the deadline (or without a working model), the remaining
+        # candidates are ranked by a heuristic base score instead
+        heuristic = heuristic_scores(catalog, filtered, selected['features'])
+        deadline, priority = None, None
+        if options['deadline_ms']:
+            deadline = started + options['deadline_ms'] / 1000
+            priority = prior_scores(catalog, filtered, selected['match_counts'], selected['time_diffs'],
+                                    selected['cuisine_matches'])
+        try:
+            scored = scoring_executor.score(ml_model, score_table, selected['features'], selected['match_counts'],
+                                            selected['time_diffs'], selected['cuisine_matches'], top_k,
+                                            fallback_scores=heuristic, deadline=deadline, priority=priority)
+        except Exception as e:
+            print(f"⚠️ ML scoring failed, serving heuristic ranking: {e}")
+            scored = score_and_select(None, None, selected['features'], selected['match_counts'],
+                                      selected['time_diffs'], selected['cuisine_matches'], top_k,
+                                      fallback_scores=heuristic)
+        base_scores, final_scores = scored.base_scores, scored.final_scores
+        ingredient_boosts, failed, top = scored.ingredient_boosts, scored.failed, scored.top
+        log_failed_predictions(catalog, selected, scored)
+
+        # ---- Inference telemetry (queued; written to MLflow in the background) ----
+        params = {'user_id': user_id, 'num_candidates': selected['num_candidates'],
+                  'num_shortlisted': len(filtered)}
+        if options['deadline_ms']:
+            params['deadline_ms'] = options['deadline_ms']
+        if search_ingredients:
+            params['search_ingredients'] = ",".join(sorted(search_ingredients))
+        if preferred_cuisines:
+            params['preferred_cuisines'] = ",".join(sorted(preferred_cuisines))
+        params['top_recipe'] = catalog.record(filtered[top[0]])['recipe_name']
+
+        if inference_telemetry.mode == 'per_recipe':
+            metrics = {}
+            for idx in np.flatnonzero(~(failed | scored.unscored)).tolist():
+                recipe_id = catalog.ids[filtered[idx]]
+                if ingredient_boosts[idx] > 0:
+                    metrics[f"recipe_{recipe_id}_ingredient_boost"] = ingredient_boosts[idx]
+                metrics[f"recipe_{recipe_id}_base_score"] = base_scores[idx]
+                metrics[f"recipe_{recipe_id}_final_score"] = final_scores[idx]
+        else:
+            metrics = summarize_inference(base_scores, final_scores, failed, ingredient_boosts,
+                                          selected['time_diffs'], selected['cuisine_matches'],
+                                          unscored=scored.unscored)
+        metrics['top_score'] = final_scores[top[0]]
+        metrics['heuristic_scored'] = int(np.count_nonzero(failed | scored.unscored))
+
+        inference_telemetry.record(f"user_{user_id}_inference", params, metrics, scores={
+            'recipe_ids': catalog.ids[filtered],
+            'base_scores': base_scores.astype(np.float32),
+            'final_scores': final_scores.astype(np.float32),
+        })
 
         # ---------------- Build response ----------------
-        response = []
-        for r, score in scored:
-            item = format_recipe(r)
-            item['ml_score'] = round(score, 4)
-            response.append(item)
+        header = recommend_header(selected, options, scored)
+
+        def cache_payload(payload):
+            # Partial (heuristic) rankings are not cached
+            if not header['partial']:
+                response_cache.put(cache_key, user_id, payload, ml_model, catalog.version)
+
+        items = iter_recommend_items(catalog, selected, scored)
+        if stream_format is not None:
+            # Ranked recipes are sent as they are formatted; the complete
+            # payload is cached once the stream finishes
+            return stream_recommendations(stream_format, header, items, on_complete=cache_payload)
+
+        payload = {'recipes': list(items), **header}
+        cache_payload(payload)
+        return jsonify(payload)
+
+    except Exception as e:
+        print(f"Recommendation error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """
+    Recommendations for many users in one call (email jobs, dashboard prefetch)
+
+    Body: {"requests": [{"user_id": ..., <the /api/recommend options>}, ...]}.
+    All users are fetched in one query against one catalog snapshot, and
+    every user's candidates are stacked into one feature tensor that is
+    scored in shared batched predict calls. Each user gets the same payload
+    /api/recommend would return (and it is cached the same way). The batch
+    writes one telemetry run, and throughput is reported in users per second.
+    """
+    try:
+        if not supabase:
+            return jsonify({'error': 'Database not configured'}), 500
+
+        started = time.perf_counter()
+        data = request.json or {}
+        batch = data.get('requests')
+        if not isinstance(batch, list) or not batch:
+            return jsonify({'error': 'requests must be a non-empty list'}), 400
+        if len(batch) > RECOMMEND_BATCH_MAX_USERS:
+            return jsonify({'error': f'At most {RECOMMEND_BATCH_MAX_USERS} users per batch'}), 400
+
+        entries = []
+        for item in batch:
+            user_id = item.get('user_id') if isinstance(item, dict) else None
+            if not user_id:
+                return jsonify({'error': 'user_id required for every request'}), 400
+            try:
+                entries.append((user_id, parse_recommend_options(item)))
+            except ValueError as e:
+                return jsonify({'error': f'user {user_id}: {e}'}), 400
+
+        # ---------------- Fetch all users in one query -----------------
+        user_ids = sorted({str(user_id) for user_id, _ in entries})
+        users = {str(row['id']): row
+                 for row in supabase.table('users').select('*').in_('id', user_ids).execute().data}
+
+        catalog = recipe_catalog.get_snapshot()
+
+        # ---------------- Cache lookups and filters, per user ----------------
+        results = [None] * len(entries)
+        pending = []   # (position, cache_key, selected)
+        for position, (user_id, options) in enumerate(entries):
+            user = users.get(str(user_id))
+            if user is None:
+                results[position] = {'user_id': user_id, 'error': 'User not found'}
+                continue
+            cache_key = recommend_cache_key(user_id, user, options)
+            payload = response_cache.get(cache_key, ml_model, catalog.version)
+            if payload is None:
+                selected = select_candidates(catalog, user, options)
+                if selected['filtered']:
+                    pending.append((position, cache_key, selected))
+                    continue
+                payload = empty_recommend_payload(options)
+                response_cache.put(cache_key, user_id, payload, ml_model, catalog.version)
+            results[position] = {'user_id': user_id, **payload}
+
+        # ---------------- One shared scoring pass ----------------
+        # Rows the model fails on (or all rows, without a model) are ranked by
+        # the heuristic score, as in /api/recommend
+        segments = [(selected['features'], selected['match_counts'], selected['time_diffs'],
+                     selected['cuisine_matches'], entries[position][1]['top_k'],
+                     heuristic_scores(catalog, selected['filtered'], selected['features']))
+                    for position, _, selected in pending]
+        try:
+            scored_users = scoring_executor.score_many(ml_model, score_table, segments)
+        except Exception as e:
+            print(f"⚠️ ML batch scoring failed, serving heuristic rankings: {e}")
+            scored_users = scoring_executor.score_many(None, None, segments)
+
+        for (position, cache_key, selected), scored in zip(pending, scored_users):
+            user_id, options = entries[position]
+            payload = recommend_payload(catalog, selected, scored, options)
+            if not payload['partial']:
+                response_cache.put(cache_key, user_id, payload, ml_model, catalog.version)
+            results[position] = {'user_id': user_id, **payload}
+
+        elapsed = time.perf_counter() - started
+        users_per_second = len(entries) / elapsed if elapsed > 0 else 0.0
+
+        # ---- One telemetry run for the whole batch ----
+        params = {'num_users': len(entries), 'num_scored_users': len(pending)}
+        if scored_users:
+            metrics = summarize_inference(
+                np.concatenate([scored.base_scores for scored in scored_users]),
+                np.concatenate([scored.final_scores for scored in scored_users]),
+                np.concatenate([scored.failed for scored in scored_users]),
+                np.concatenate([scored.ingredient_boosts for scored in scored_users]),
+                np.concatenate([selected['time_diffs'] for _, _, selected in pending]),
+                np.concatenate([selected['cuisine_matches'] for _, _, selected in pending]),
+                unscored=np.concatenate([scored.unscored for scored in scored_users]))
+        else:
+            metrics = {}
+        metrics['batch_seconds'] = elapsed
+        metrics['users_per_second'] = users_per_second
+        inference_telemetry.record('batch_inference', params, metrics)
 
         return jsonify({
-            'recipes': response,
-            'total_candidates': len(filtered),
-            'total_scored': len(scored),
-            'search_ingredients': list(search_ingredients) if search_ingredients else []
+            'results': results,
+            'num_users': len(entries),
+            'elapsed_seconds': round(elapsed, 4),
+            'users_per_second': round(users_per_second, 2)
         })
 
     except Exception as e:
-        print(f"Recommendation error: {e}")
+        print(f"Batch recommendation error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
-    
+
 
 
 # ============= HEALTH CHECK =============
@@ -822,7 +1250,13 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
-        'database': 'connected' if supabase else 'not configured'
+        'database': 'connected' if supabase else 'not configured',
+        'telemetry': inference_telemetry.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'score_table': score_table.stats() if score_table else None,
+        'response_cache': response_cache.stats(),
+        'precomputed_store': precomputed_store.stats() if precomputed_store else None,
+        'recipe_catalog': recipe_catalog.stats()
     }), 200
 
 # ============= SERVE FRONTEND =============
@@ -0,0 +1,128 @@
+"""
+Benchmark: two-stage retrieval vs scoring every candidate
+
+Usage: python benchmarks/bench_two_stage.py [--recipes N] [--users N]
+                                            [--shortlist M,M,...] [--top-k K]
+
+Builds a synthetic catalog and random user requests. Each request is scored
+twice: once with every filtered candidate going through the model, and once
+through the RECOMMEND_SHORTLIST_SIZE = M first stage. For each M the script
+reports:
+- recall@K: the fraction of the full top-K that the two-stage top-K keeps
+- mean and worst-case recall
+- the per-request latency of both paths
+
+Uses the production model when app.py can load it. Otherwise it trains a
+small XGBoost model on synthetic labels, so the numbers only show relative
+cost.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import ml_model, parse_recommend_options, select_candidates
+from parallel_scoring import score_and_select
+from recipe_catalog import CatalogSnapshot
+from retrieval import recall_at_k
+from scoring import prediction_cache
+
+CUISINES = ['italian', 'mexican', 'greek', 'chinese', 'thai', 'indian', 'french', 'american']
+PRESET_CUISINES = [[], ['italian'], ['asian'], ['mediterranean'], ['indian']]
+
+
+def synthetic_catalog(num_recipes, rng):
+    vocab = [f"ingredient {i}" for i in range(2000)]
+    records = []
+    for recipe_id in range(1, num_recipes + 1):
+        ingredients = rng.choice(vocab, size=rng.integers(3, 15), replace=False).tolist()
+        records.append({
+            'id': recipe_id,
+            'recipe_name': f"Recipe {recipe_id}",
+            'cuisine': CUISINES[rng.integers(len(CUISINES))],
+            'diet': 'regular',
+            'cook_time_minutes': int(rng.integers(5, 240)),
+            'rating': round(float(rng.uniform(2.5, 5.0)), 1),
+            'ingredients_list': str(ingredients),
+        })
+    return CatalogSnapshot(records), vocab
+
+
+def synthetic_model(rng):
+    """Small XGBoost regressor on random labels, used when no production model loads"""
+    import xgboost as xgb
+    from model_loader import NativeXGBoostScorer
+
+    features = np.column_stack([rng.integers(15, 181, 5000), rng.integers(5, 240, 5000), np.zeros(5000),
+                                rng.random(5000), rng.integers(0, 2, 5000)]).astype(np.float32)
+    features[:, 2] = np.abs(features[:, 1] - features[:, 0])
+    labels = np.clip(0.3 * features[:, 3] + 0.2 * features[:, 4] - 0.002 * features[:, 2]
+                     + 0.1 * rng.standard_normal(5000) + 0.5, 0, 1)
+    model = xgb.XGBRegressor(n_estimators=100, max_depth=5).fit(features, labels)
+    return NativeXGBoostScorer(model, fallback=None)
+
+
+def random_requests(num_users, vocab, rng):
+    requests = []
+    for _ in range(num_users):
+        user = {'allergies': rng.choice(vocab, size=3, replace=False).tolist(),
+                'disliked_ingredients': [], 'diet': 'regular'}
+        data = {'preferred_cuisine': PRESET_CUISINES[rng.integers(len(PRESET_CUISINES))],
+                'max_cooking_time': int(rng.choice(np.arange(15, 181, 15)))}
+        if rng.random() < 0.3:
+            data['search_ingredients'] = ['ingredient 1']
+        requests.append((user, data))
+    return requests
+
+
+def run_request(model, catalog, user, options, shortlist_size):
+    # Cold prediction cache, so both paths pay for their model calls
+    prediction_cache.clear()
+    started = time.perf_counter()
+    selected = select_candidates(catalog, user, options, shortlist_size=shortlist_size)
+    scored = score_and_select(model, None, selected['features'], selected['match_counts'],
+                              selected['time_diffs'], selected['cuisine_matches'], options['top_k'])
+    elapsed = time.perf_counter() - started
+    return np.asarray(selected['filtered'])[scored.top], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--recipes', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--shortlist', default='500,1000,2000,5000')
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    catalog, vocab = synthetic_catalog(args.recipes, rng)
+    model = ml_model
+    if model is None:
+        print("ℹ️ Production model not available, using a synthetic XGBoost model")
+        model = synthetic_model(rng)
+    requests = [(user, parse_recommend_options(dict(data, top_k=args.top_k)))
+                for user, data in random_requests(args.users, vocab, rng)]
+
+    run_request(model, catalog, *requests[0], 0)   # warm-up
+    full = [run_request(model, catalog, user, options, 0) for user, options in requests]
+    full_ms = 1000 * np.mean([elapsed for _, elapsed in full])
+    print(f"{args.recipes} recipes, {args.users} requests, top-{args.top_k}")
+    print(f"{'shortlist':>10} {'recall@K':>9} {'min':>6} {'ms/req':>8} {'full ms/req':>12}")
+
+    for size in [int(m) for m in args.shortlist.split(',')]:
+        recalls, times = [], []
+        for (user, options), (reference, _) in zip(requests, full):
+            top, elapsed = run_request(model, catalog, user, options, size)
+            recalls.append(recall_at_k(reference, top))
+            times.append(elapsed)
+        print(f"{size:>10} {np.mean(recalls):>9.3f} {np.min(recalls):>6.3f} "
+              f"{1000 * np.mean(times):>8.2f} {full_ms:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
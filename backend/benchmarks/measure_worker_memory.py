@@ -0,0 +1,157 @@
+"""
+Benchmark: memory per gunicorn worker, with and without pre-fork loading
+
+Usage: python benchmarks/measure_worker_memory.py [--workers N] [--requests N]
+                                                  [--recipes N] [--model-trees N]
+
+Starts gunicorn with gunicorn.conf.py twice, once with GUNICORN_PRELOAD=0
+and once with GUNICORN_PRELOAD=1. It waits for /api/health to answer and
+sends a few requests, then reads each process's memory with psutil:
+- RSS counts every resident page, shared or not
+- PSS splits each shared page evenly across the processes mapping it
+- USS counts only the pages that process alone holds, i.e. what it costs to
+  run one more worker
+
+--model-trees registers an XGBoost model with that many trees in a
+throwaway MLflow registry (sqlite, in a temporary directory) and points the
+app at it. --recipes serves benchmarks/synthetic_catalog_app.py, which loads
+that many generated recipes into the in-memory catalog without Supabase.
+Without them only the imports are measured.
+
+Measured with 4 workers, a 300-tree depth-8 model and 50,000 recipes
+(--recipes 50000 --model-trees 300), on the pinned gunicorn 21.2.0 with
+Python 3.11 on Linux. XGBoost 3.2 and MLflow 3.17 were installed, not the
+pinned versions. Only /api/health was requested, so no recommendation
+caches were filled:
+
+    GUNICORN_PRELOAD=0: 543 MB USS per worker, 2279 MB PSS in total, ready in 37.8s
+    GUNICORN_PRELOAD=1:  11 MB USS per worker,  656 MB PSS in total, ready in 6.5s
+
+With preloading the model and catalog are loaded once in the master, and
+the workers share those pages instead of each holding a copy.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+import psutil
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_workers(master, url, workers, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if master.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {master.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            if len(psutil.Process(master.pid).children()) >= workers:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"gunicorn did not answer {url} within {timeout}s")
+
+
+def register_model(directory, trees):
+    """
+    Train an XGBoost regressor on random features and register it in a
+    SQLite MLflow store under directory
+
+    Returns:
+        environment variables that make model_loader load it
+    """
+    import mlflow
+    import mlflow.xgboost
+    import numpy as np
+    import xgboost as xgb
+    sys.path.insert(0, BACKEND_DIR)
+    from model_loader import FEATURE_COLUMNS
+
+    env = {
+        'MLFLOW_TRACKING_URI': f"sqlite:///{os.path.join(directory, 'mlflow.db')}",
+        'MLFLOW_EXPERIMENT_NAME': 'worker-memory-benchmark',
+        'MLFLOW_EXPERIMENT': 'worker-memory-benchmark',
+        'MLFLOW_MODEL_NAME': 'worker-memory-benchmark',
+        'MLFLOW_MODEL_VERSION': '1',
+    }
+    mlflow.set_tracking_uri(env['MLFLOW_TRACKING_URI'])
+    mlflow.create_experiment(env['MLFLOW_EXPERIMENT_NAME'], artifact_location=os.path.join(directory, 'artifacts'))
+    mlflow.set_experiment(env['MLFLOW_EXPERIMENT_NAME'])
+    rng = np.random.default_rng(0)
+    features = rng.random((20000, len(FEATURE_COLUMNS)), dtype=np.float32)
+    model = xgb.XGBRegressor(n_estimators=trees, max_depth=8).fit(features, rng.random(20000))
+    with mlflow.start_run():
+        mlflow.xgboost.log_model(model, name='model', registered_model_name=env['MLFLOW_MODEL_NAME'],
+                                 input_example=features[:2])
+    return env
+
+
+def measure(preload, workers, requests, timeout, extra_env, app_target):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0', GUNICORN_WORKERS=str(workers),
+               PORT=str(port), **extra_env)
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', app_target],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/api/health"
+    try:
+        started = time.time()
+        wait_for_workers(master, url, workers, timeout)
+        boot_seconds = time.time() - started
+        for _ in range(requests):
+            urllib.request.urlopen(url, timeout=30).read()
+        time.sleep(1)
+
+        parent = psutil.Process(master.pid)
+        rows = [('master', parent.memory_full_info())]
+        rows += [(f"worker {child.pid}", child.memory_full_info()) for child in parent.children()]
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+
+    print(f"\nGUNICORN_PRELOAD={int(preload)}, {workers} workers, ready in {boot_seconds:.1f}s")
+    print(f"{'process':>14} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8}")
+    for name, info in rows:
+        print(f"{name:>14} {info.rss / MB:>8.1f} {info.pss / MB:>8.1f} {info.uss / MB:>8.1f}")
+    worker_rows = [info for name, info in rows if name != 'master']
+    print(f"{'total':>14} {sum(i.rss for _, i in rows) / MB:>8.1f} {sum(i.pss for _, i in rows) / MB:>8.1f} "
+          f"{sum(i.uss for _, i in rows) / MB:>8.1f}")
+    print(f"mean worker USS: {sum(i.uss for i in worker_rows) / len(worker_rows) / MB:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--recipes', type=int, default=0,
+                        help='serve this many synthetic recipes from an in-memory catalog instead of Supabase')
+    parser.add_argument('--model-trees', type=int, default=0,
+                        help='register and load a synthetic XGBoost model with this many trees')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        extra_env = register_model(directory, args.model_trees) if args.model_trees else {}
+        app_target = 'app:app'
+        if args.recipes:
+            extra_env['BENCH_RECIPES'] = str(args.recipes)
+            app_target = 'benchmarks.synthetic_catalog_app:app'
+        for preload in (False, True):
+            measure(preload, args.workers, args.requests, args.timeout, extra_env, app_target)
+
+
+if __name__ == '__main__':
+    main()
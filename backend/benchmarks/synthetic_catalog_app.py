@@ -0,0 +1,44 @@
+"""
+app.py with a synthetic in-memory recipe catalog, for measure_worker_memory.py
+
+Importing this module imports app and loads BENCH_RECIPES generated recipes
+into app.recipe_catalog without a database. With GUNICORN_PRELOAD=1 that
+happens once in the master; with GUNICORN_PRELOAD=0 in every worker.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from recipe_catalog import RecipeCatalog
+
+BENCH_RECIPES = int(os.getenv('BENCH_RECIPES', 50000))
+CUISINES = ['Italian', 'Greek', 'Thai', 'Mexican', 'Indian', 'French', 'Chinese', 'American']
+
+
+def synthetic_recipes(count=BENCH_RECIPES, vocab_size=20000, seed=0):
+    """count recipe rows shaped like the recipes table (8 ingredients from vocab_size names)"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, vocab_size, size=(count, 8)).tolist()
+    minutes = rng.integers(10, 180, size=count).tolist()
+    return [{
+        'id': i + 1,
+        'recipe_name': f"Recipe {i + 1}",
+        'cuisine': CUISINES[i % len(CUISINES)],
+        'diet': 'vegan' if i % 5 == 0 else 'regular',
+        'cook_time_minutes': minutes[i],
+        'calories': 200 + i % 600,
+        'servings': 2 + i % 4,
+        'rating': round(3.0 + (i % 20) / 10, 1),
+        'ingredients_list': str([f"ingredient {j}" for j in picks[i]]),
+        'directions': f"Prepare the ingredients for recipe {i + 1}. " * 6,
+        'updated_at': '2026-10-01T00:00:00+00:00',
+    } for i in range(count)]
+
+
+app_module.recipe_catalog = RecipeCatalog(synthetic_recipes, refresh_seconds=0)
+app_module.recipe_catalog.preload()
+app = app_module.app
@@ -0,0 +1,54 @@
+"""
+Cuisine taxonomy: maps umbrella categories to the cuisines stored on recipes
+
+Loaded once per process from a JSON file of the form
+{"category": ["cuisine", ...]}. Set CUISINE_TAXONOMY_PATH to use a
+different file.
+"""
+import os
+import json
+
+from recipe_catalog import normalize_cuisine
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cuisine_taxonomy.json')
+
+_taxonomy = None
+
+
+class CuisineTaxonomy:
+    """Umbrella category -> canonical cuisine codes"""
+
+    def __init__(self, categories):
+        self.categories = {
+            normalize_cuisine(category): frozenset(normalize_cuisine(c) for c in cuisines)
+            for category, cuisines in categories.items()
+        }
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def expand(self, preferences):
+        """
+        Canonical cuisines matching the given preferences
+
+        Umbrella categories expand to all their cuisines; any other value is
+        kept as a cuisine of its own.
+        """
+        expanded = set()
+        for pref in preferences:
+            pref = normalize_cuisine(pref)
+            expanded.update(self.categories.get(pref, (pref,)))
+        return expanded
+
+
+def get_taxonomy():
+    """Process-wide taxonomy, loaded on first use"""
+    global _taxonomy
+
+    if _taxonomy is None:
+        path = os.getenv('CUISINE_TAXONOMY_PATH', DEFAULT_TAXONOMY_PATH)
+        _taxonomy = CuisineTaxonomy.from_file(path)
+        print(f"✓ Cuisine taxonomy loaded: {len(_taxonomy.categories)} categories from {path}")
+    return _taxonomy
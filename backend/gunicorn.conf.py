@@ -0,0 +1,63 @@
+"""
+Gunicorn configuration: pre-fork model and catalog loading
+
+Usage: gunicorn --config gunicorn.conf.py app:app
+
+With GUNICORN_PRELOAD=1 (the default) the master imports app.py once. That
+loads the MLflow model, and preload_for_workers() then loads the recipe
+catalog. Workers are forked from the master and share those pages
+copy-on-write, so the model artifacts are downloaded once rather than once
+per worker.
+
+CPython writes to an object's header whenever its reference count or GC
+state changes, which copies the page it sits on into the worker. To keep
+the preloaded objects shared:
+- the cyclic GC is disabled in the master while the app loads
+- gc.freeze() moves every object alive at fork time to the permanent
+  generation, so the workers' collections never touch them
+- the master re-enables the GC once the loaded objects are frozen, and each
+  worker re-enables it after the fork
+
+Reference counting still dirties the pages of objects a worker reads (for
+example the rows of a catalog kept in process memory). The NumPy arrays of
+RECIPE_CATALOG_SHARED_DIR snapshots are file-backed mmaps and stay shared.
+
+post_fork calls app.init_worker(), which re-creates what must not cross a
+fork: the Supabase and MLflow HTTP sessions, the scoring pool, and the
+telemetry and catalog threads.
+
+benchmarks/measure_worker_memory.py reports RSS, PSS and USS per worker
+with and without preloading. USS is the memory only that worker holds.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+if preload_app:
+    # Objects allocated while the app loads are frozen before the fork instead
+    gc.disable()
+
+
+def when_ready(server):
+    """Master: the app is imported; load the catalog before any worker forks"""
+    if preload_app:
+        import app
+        app.preload_for_workers()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()
+        # Frozen objects are never collected, so the master's own GC can run again
+        gc.enable()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import app
+        app.init_worker()
+        gc.enable()
@@ -0,0 +1,305 @@
+"""
+Asynchronous MLflow logging of recommendation inferences
+
+recommend() hands each inference to InferenceTelemetry.record(), which only
+puts it on a bounded in-process queue. A background writer drains the queue
+every flush interval and writes each inference as one MLflow run through
+MlflowClient.log_batch, so tracking-server latency never reaches the request.
+When the queue is full, new events are dropped and counted instead of blocking.
+
+In the default 'aggregate' mode each inference is logged as a fixed set of
+summary metrics (see summarize_inference), so the number of metric keys per
+run does not grow with the catalog. A sample of requests also keeps its full
+score vectors; those are written as one compressed .npz artifact per window.
+'per_recipe' mode keeps the old recipe_{id}_* metric keys.
+"""
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from mlflow.tracking import MlflowClient
+from mlflow.entities import Metric, Param
+
+# Inference events buffered before new ones are dropped
+TELEMETRY_QUEUE_SIZE = int(os.getenv('TELEMETRY_QUEUE_SIZE', 1000))
+# Seconds between background flushes
+TELEMETRY_FLUSH_SECONDS = float(os.getenv('TELEMETRY_FLUSH_SECONDS', 5))
+# Metrics + params per log_batch call (MLflow accepts at most 1000 metrics / 100 params)
+TELEMETRY_BATCH_SIZE = int(os.getenv('TELEMETRY_BATCH_SIZE', 1000))
+
+# 'aggregate' (fixed-size summaries) or 'per_recipe' (one metric key per recipe)
+TELEMETRY_MODE = os.getenv('TELEMETRY_MODE', 'aggregate')
+# Fraction of requests whose full score vectors are kept, and seconds of
+# samples collected into each .npz artifact
+TELEMETRY_SAMPLE_RATE = float(os.getenv('TELEMETRY_SAMPLE_RATE', 0.01))
+TELEMETRY_SAMPLE_WINDOW_SECONDS = float(os.getenv('TELEMETRY_SAMPLE_WINDOW_SECONDS', 300))
+
+SCORE_HISTOGRAM_BINS = 10
+SCORE_QUANTILES = (0.5, 0.9, 0.99)
+
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+
+
+def summarize_inference(base_scores, final_scores, failed, ingredient_boosts, time_diffs,
+                        cuisine_matches, unscored=None):
+    """
+    Fixed-size summary metrics for one scored candidate set
+
+    Args:
+        base_scores: model scores (NaN where prediction failed)
+        final_scores: boosted scores
+        failed: bool mask of candidates whose prediction failed
+        ingredient_boosts: ingredient boost added to each candidate
+        time_diffs: minutes between each recipe and the user's maximum
+        cuisine_matches: bool mask of candidates with a requested cuisine
+        unscored: optional bool mask of candidates the model never saw
+            (deadline reached or no model); like failed ones, they are left
+            out of the score statistics
+
+    Returns:
+        dict of metric name -> float with the same keys for any catalog size
+    """
+    failed = np.asarray(failed, dtype=bool)
+    unscored = np.zeros_like(failed) if unscored is None else np.asarray(unscored, dtype=bool)
+    scored = ~(failed | unscored)
+    metrics = {
+        'num_candidates': len(failed),
+        'num_scored': int(scored.sum()),
+        'num_failed': int(failed.sum()),
+        'num_unscored': int(unscored.sum()),
+        'ingredient_boost_count': int((np.asarray(ingredient_boosts)[scored] > 0).sum()),
+        'cook_time_boost_count': int((np.asarray(time_diffs)[scored] <= 30).sum()),
+        'cuisine_boost_count': int(np.asarray(cuisine_matches, dtype=bool)[scored].sum()),
+    }
+
+    for name, scores in (('base_score', base_scores), ('final_score', final_scores)):
+        scores = np.asarray(scores, dtype=np.float64)[scored]
+        # Out-of-range scores land in the first / last bin
+        counts, _ = np.histogram(np.clip(scores, 0.0, 1.0), bins=SCORE_HISTOGRAM_BINS, range=(0.0, 1.0))
+        for i, count in enumerate(counts.tolist()):
+            metrics[f'{name}_hist_{i:02d}'] = count
+        if len(scores):
+            metrics[f'{name}_mean'] = scores.mean()
+            metrics[f'{name}_min'] = scores.min()
+            metrics[f'{name}_max'] = scores.max()
+            for q, value in zip(SCORE_QUANTILES, np.quantile(scores, SCORE_QUANTILES).tolist()):
+                metrics[f'{name}_p{int(q * 100)}'] = value
+
+    return metrics
+
+
+class InferenceTelemetry:
+    """
+    Bounded queue of inference events plus the writer thread that drains it
+
+    Args:
+        experiment_name: MLflow experiment the inference runs are logged to
+        queue_size: maximum number of pending events
+        flush_interval: seconds between background flushes
+        batch_size: maximum metrics + params per log_batch call
+        mode: 'aggregate' or 'per_recipe'
+        sample_rate: fraction of recorded score vectors kept for artifacts
+        sample_window: seconds of samples per .npz artifact
+        client_factory: callable returning an MlflowClient
+    """
+
+    def __init__(self, experiment_name, queue_size=TELEMETRY_QUEUE_SIZE,
+                 flush_interval=TELEMETRY_FLUSH_SECONDS, batch_size=TELEMETRY_BATCH_SIZE,
+                 mode=TELEMETRY_MODE, sample_rate=TELEMETRY_SAMPLE_RATE,
+                 sample_window=TELEMETRY_SAMPLE_WINDOW_SECONDS, client_factory=MlflowClient):
+        if mode not in ('aggregate', 'per_recipe'):
+            raise ValueError(f"Unknown telemetry mode: {mode}")
+        self.experiment_name = experiment_name
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.sample_window = sample_window
+        self._samples = []
+        self._window_start = time.time()
+        self._client_factory = client_factory
+        self._client = None
+        self._experiment_id = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._flush_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer_pid = None
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.samples_written = 0
+
+    def record(self, run_name, params=None, metrics=None, scores=None):
+        """
+        Queue one inference for logging without blocking
+
+        Args:
+            run_name: MLflow run name
+            params: dict of run params
+            metrics: dict of run metrics
+            scores: optional dict of equal-length arrays (e.g. recipe_ids,
+                base_scores, final_scores); kept for the sample artifact
+                with probability sample_rate
+
+        Returns:
+            True if queued, False if the queue was full and the event dropped
+        """
+        event = {
+            'run_name': run_name,
+            'timestamp': int(time.time() * 1000),
+            'params': {k: str(v) for k, v in (params or {}).items()},
+            'metrics': {k: float(v) for k, v in (metrics or {}).items()},
+            'scores': None,
+        }
+        if scores is not None and self.sample_rate > 0 and random.random() < self.sample_rate:
+            event['scores'] = {k: np.asarray(v) for k, v in scores.items()}
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        self._ensure_writer()
+        return True
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        return {
+            'queued': self._queue.qsize(),
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'written': self.written,
+            'failed': self.failed,
+            'samples_written': self.samples_written,
+        }
+
+    def flush(self, close_window=False):
+        """
+        Write every queued event now (called by the writer thread)
+
+        Sampled score vectors are written once the current window has
+        elapsed, or immediately with close_window=True.
+        """
+        with self._flush_lock:
+            while True:
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event['scores'] is not None:
+                    self._samples.append((event['run_name'], event['timestamp'], event['scores']))
+                try:
+                    self._write(event)
+                    self.written += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Telemetry write failed for {event['run_name']}: {e}")
+
+            if close_window or time.time() - self._window_start >= self.sample_window:
+                self._write_samples()
+
+    def _write_samples(self):
+        """Write the window's sampled score vectors as one .npz artifact"""
+        samples, self._samples = self._samples, []
+        window_start, self._window_start = self._window_start, time.time()
+        if not samples:
+            return
+
+        # Vectors are concatenated; offsets[i]:offsets[i + 1] is request i
+        keys = sorted(set().union(*(scores.keys() for _, _, scores in samples)))
+        lengths = [len(next(iter(scores.values()), ())) for _, _, scores in samples]
+        arrays = {
+            'run_names': np.array([name for name, _, _ in samples]),
+            'timestamps': np.array([ts for _, ts, _ in samples], dtype=np.int64),
+            'offsets': np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+        }
+        for key in keys:
+            arrays[key] = np.concatenate([scores[key] for _, _, scores in samples])
+
+        try:
+            client = self._get_client()
+            run_name = f"score_samples_{int(window_start)}"
+            run = client.create_run(self._experiment_id, start_time=int(window_start * 1000),
+                                    run_name=run_name)
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, f"{run_name}.npz")
+                np.savez_compressed(path, **arrays)
+                client.log_artifact(run.info.run_id, path)
+            client.log_batch(run.info.run_id, metrics=[
+                Metric('num_requests', len(samples), int(time.time() * 1000), 0)
+            ])
+            client.set_terminated(run.info.run_id)
+            self.samples_written += len(samples)
+        except Exception as e:
+            print(f"Telemetry sample artifact failed ({len(samples)} requests lost): {e}")
+
+    def _write(self, event):
+        client = self._get_client()
+        run = client.create_run(self._experiment_id, start_time=event['timestamp'],
+                                run_name=event['run_name'])
+        run_id = run.info.run_id
+
+        metrics = [Metric(key, value, event['timestamp'], 0) for key, value in event['metrics'].items()]
+        params = [Param(key, value) for key, value in event['params'].items()]
+        # Each log_batch call carries at most batch_size entries and stays
+        # within MLflow's per-call limits
+        while metrics or params:
+            param_chunk = params[:min(MAX_PARAMS_PER_BATCH, self.batch_size)]
+            metric_chunk = metrics[:min(MAX_METRICS_PER_BATCH, self.batch_size - len(param_chunk))]
+            params = params[len(param_chunk):]
+            metrics = metrics[len(metric_chunk):]
+            client.log_batch(run_id, metrics=metric_chunk, params=param_chunk)
+
+        client.set_terminated(run_id)
+
+    def _get_client(self):
+        if self._client is None:
+            client = self._client_factory()
+            experiment = client.get_experiment_by_name(self.experiment_name)
+            if experiment is None:
+                self._experiment_id = client.create_experiment(self.experiment_name)
+            else:
+                self._experiment_id = experiment.experiment_id
+            self._client = client
+        return self._client
+
+    def after_fork(self):
+        """
+        Fresh queue, locks, client and writer thread in a forked worker
+
+        Anything the parent had queued stays with the parent, so it is not
+        logged once per worker.
+        """
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._flush_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer_pid = None
+        self._client = None
+        self._samples = []
+        self._window_start = time.time()
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        """Start the writer thread once per process (threads do not survive fork)"""
+        if self._writer_pid == os.getpid():
+            return
+        with self._writer_lock:
+            if self._writer_pid == os.getpid():
+                return
+            threading.Thread(target=self._writer_loop, name='inference-telemetry', daemon=True).start()
+            self._writer_pid = os.getpid()
+
+    def _writer_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Telemetry flush failed: {e}")
@@ -1,4 +1,7 @@
 import os
+import abc
+import numpy as np
+import pandas as pd
 import mlflow
 import mlflow.pyfunc
 from dotenv import load_dotenv
@@ -7,11 +10,32 @@ from dotenv import load_dotenv
 load_dotenv()
 
 _model = None
+_model_uri = None
 _expected_features = None
 
+# 'auto' scores through the native XGBoost booster when the registered model
+# has an xgboost flavor and passes the load-time parity check; 'compiled'
+# prefers the pure-NumPy tree evaluator (tree_compiler.py); 'pyfunc' always
+# uses the MLflow pyfunc wrapper
+ML_MODEL_BACKEND = os.getenv('ML_MODEL_BACKEND', 'auto')
+# Largest batch the compiled evaluator scores itself; bigger batches go to
+# the native booster, which is faster there
+ML_COMPILED_MAX_ROWS = int(os.getenv('ML_COMPILED_MAX_ROWS', 64))
+# Largest absolute difference from pyfunc accepted by the parity check
+ML_PARITY_TOLERANCE = float(os.getenv('ML_PARITY_TOLERANCE', 1e-6))
+
+# Column order the production model was trained on
+FEATURE_COLUMNS = [
+    'max_cooking_time',
+    'recipe_cook_time',
+    'cook_time_diff',
+    'ingredient_overlap_ratio',
+    'cuisine_similarity',
+]
+
 
 def load_production_model():
-    global _model, _expected_features
+    global _model, _model_uri, _expected_features
 
     if _model is not None:
         return _model
@@ -49,6 +73,7 @@ def load_production_model():
 
     # ---- LOAD MODEL ----
     _model = mlflow.pyfunc.load_model(model_uri)
+    _model_uri = model_uri
 
     print("✅ ML model loaded successfully")
     return _model
@@ -56,3 +81,175 @@ def load_production_model():
 
 def get_expected_features():
     return _expected_features
+
+
+class MatrixScorer(abc.ABC):
+    """
+    Model handle that scores a float32 feature matrix directly
+
+    predict() takes an (n, 5) matrix in FEATURE_COLUMNS order (a DataFrame
+    is also accepted) and skips pyfunc schema enforcement and pandas
+    conversion. `fallback` is the pyfunc model it was built from.
+    """
+
+    backend = None
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.metadata = getattr(fallback, 'metadata', None)
+
+    @staticmethod
+    def as_matrix(features):
+        """Contiguous float32 matrix from a matrix, DataFrame or list of feature dicts"""
+        if isinstance(features, np.ndarray):
+            return np.ascontiguousarray(features, dtype=np.float32)
+        return pd.DataFrame(features, columns=FEATURE_COLUMNS).to_numpy(dtype=np.float32)
+
+    def predict(self, features):
+        return self.predict_matrix(self.as_matrix(features))
+
+    @abc.abstractmethod
+    def predict_matrix(self, matrix):
+        """(n,) scores of a contiguous float32 (n, 5) matrix"""
+
+
+class NativeXGBoostScorer(MatrixScorer):
+    """Scores with Booster.inplace_predict (no DMatrix, no DataFrame)"""
+
+    backend = 'xgboost'
+
+    def __init__(self, xgb_model, fallback):
+        super().__init__(fallback)
+        # mlflow.xgboost.load_model returns a Booster or an sklearn wrapper
+        if hasattr(xgb_model, 'get_booster'):
+            self.booster = xgb_model.get_booster()
+        else:
+            self.booster = xgb_model
+        # Match sklearn predict(), which stops at the early-stopping iteration
+        best_iteration = self.booster.attr('best_iteration')
+        self.iteration_range = (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+
+    def predict_matrix(self, matrix):
+        return self.booster.inplace_predict(matrix, iteration_range=self.iteration_range,
+                                            validate_features=False)
+
+
+class CompiledTreeScorer(MatrixScorer):
+    """
+    Scores with a CompiledTreeEnsemble (pure NumPy, see tree_compiler)
+
+    The NumPy walk beats XGBoost's per-call overhead only for small
+    matrices; batches above max_rows go to large_batch_scorer when given.
+    """
+
+    backend = 'compiled'
+
+    def __init__(self, ensemble, fallback, large_batch_scorer=None, max_rows=None):
+        super().__init__(fallback)
+        self.ensemble = ensemble
+        self.large_batch_scorer = large_batch_scorer
+        self.max_rows = ML_COMPILED_MAX_ROWS if max_rows is None else max_rows
+
+    def predict(self, features):
+        matrix = self.as_matrix(features)
+        if self.large_batch_scorer is not None and len(matrix) > self.max_rows:
+            return self.large_batch_scorer.predict_matrix(matrix)
+        return self.predict_matrix(matrix)
+
+    def predict_matrix(self, matrix):
+        return self.ensemble.predict(matrix)
+
+
+def parity_probe_matrix(rows=256, seed=0):
+    """Deterministic spread of plausible feature rows for load-time parity checks"""
+    rng = np.random.default_rng(seed)
+    max_time = rng.choice([10, 15, 20, 30, 45, 60, 90, 120, 180], size=rows).astype(np.float64)
+    cook_time = rng.choice([5, 10, 15, 20, 25, 30, 40, 45, 60, 75, 90, 120, 240], size=rows).astype(np.float64)
+    matrix = np.empty((rows, len(FEATURE_COLUMNS)), dtype=np.float32)
+    matrix[:, 0] = max_time
+    matrix[:, 1] = cook_time
+    matrix[:, 2] = np.abs(cook_time - max_time)
+    matrix[:, 3] = rng.integers(0, 11, size=rows) / 10
+    matrix[:, 4] = rng.random(rows) < 0.5
+    return matrix
+
+
+def check_parity(scorer, reference, tolerance=None):
+    """
+    Compare a MatrixScorer with the pyfunc model on parity_probe_matrix()
+
+    Returns:
+        (passed, max_abs_diff)
+    """
+    # Imported here: scoring depends on this module for FEATURE_COLUMNS
+    from scoring import predict_scores
+
+    tolerance = ML_PARITY_TOLERANCE if tolerance is None else tolerance
+    probe = parity_probe_matrix()
+    expected, errors = predict_scores(reference, probe)
+    if errors:
+        return False, float('inf')
+    actual = np.asarray(scorer.predict_matrix(probe), dtype=np.float64).reshape(-1)
+    if actual.shape != (len(probe),):
+        return False, float('inf')
+    max_diff = float(np.max(np.abs(actual - np.asarray(expected, dtype=np.float64))))
+    return max_diff <= tolerance, max_diff
+
+
+def load_native_xgboost(model_uri, pyfunc_model):
+    """NativeXGBoostScorer for an xgboost-flavored model, or None"""
+    flavors = getattr(getattr(pyfunc_model, 'metadata', None), 'flavors', None) or {}
+    if 'xgboost' not in flavors:
+        return None
+    import mlflow.xgboost
+    return NativeXGBoostScorer(mlflow.xgboost.load_model(model_uri), pyfunc_model)
+
+
+def load_compiled_trees(native_scorer):
+    """CompiledTreeScorer built from a NativeXGBoostScorer's booster"""
+    from tree_compiler import compile_booster
+    return CompiledTreeScorer(compile_booster(native_scorer.booster, FEATURE_COLUMNS),
+                              native_scorer.fallback, large_batch_scorer=native_scorer)
+
+
+def load_scoring_model(backend=None):
+    """
+    Production model handle used by /api/recommend
+
+    Loads the pyfunc model, then tries the faster backend selected by
+    ML_MODEL_BACKEND: 'auto' uses the native XGBoost booster, 'compiled'
+    the NumPy tree evaluator (falling back to the native booster). A fast
+    backend is only used after it reproduces the pyfunc predictions on the
+    parity probe; otherwise the pyfunc model is returned.
+    """
+    backend = backend or ML_MODEL_BACKEND
+    model = load_production_model()
+    if backend == 'pyfunc':
+        return model
+
+    try:
+        scorer = load_native_xgboost(_model_uri, model)
+    except Exception as e:
+        print(f"⚠️ Native XGBoost backend unavailable, using pyfunc: {e}")
+        return model
+    if scorer is None:
+        print("ℹ️ Model has no xgboost flavor, using pyfunc")
+        return model
+
+    candidates = []
+    if backend == 'compiled':
+        try:
+            candidates.append(('Compiled tree', load_compiled_trees(scorer)))
+        except Exception as e:
+            print(f"⚠️ Tree compilation failed: {e}")
+    candidates.append(('Native XGBoost', scorer))
+
+    for name, candidate in candidates:
+        passed, max_diff = check_parity(candidate, model)
+        if passed:
+            print(f"✅ {name} backend enabled (parity max diff {max_diff:.2e})")
+            return candidate
+        print(f"⚠️ {name} backend failed parity check (max diff {max_diff})")
+
+    print("ℹ️ Using pyfunc model")
+    return model
@@ -0,0 +1,279 @@
+"""
+Scoring executor for /api/recommend
+
+score_and_select() runs the model scoring, boosts and top-K selection for
+one candidate matrix. ScoringExecutor runs it serially for ordinary
+requests. Above a candidate-count threshold it splits the matrix into one
+contiguous shard per worker and scores the shards in parallel, in one of two
+ways:
+
+- 'thread': a thread pool in this process. Native XGBoost releases the GIL
+  during prediction.
+- 'process': a process pool whose workers hold their own copy of the model
+  and score table.
+
+Each shard returns its own top-K, and the merged result is identical to
+scoring the whole matrix at once. If the pool itself fails (a worker
+process dies, or the inputs cannot be sent to it) the pool is discarded and
+the request is scored serially; the next large request starts a new pool.
+
+A request with a deadline is scored serially in chunks, in priority order
+(the retrieval prior), until the deadline passes. Candidates never reached
+are 'unscored'. Like rows whose prediction failed, they get the caller's
+fallback (heuristic) base score before the boosts.
+"""
+import os
+import time
+import pickle
+import threading
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+
+from scoring import ModelFailure, apply_boosts, select_top_k
+from score_table import score_candidates
+
+# 'thread', 'process' or 'off'
+PARALLEL_SCORING_BACKEND = os.getenv('PARALLEL_SCORING_BACKEND', 'thread')
+PARALLEL_SCORING_WORKERS = int(os.getenv('PARALLEL_SCORING_WORKERS', os.cpu_count() or 1))
+# Candidate pools smaller than this are scored serially
+PARALLEL_SCORING_MIN_CANDIDATES = int(os.getenv('PARALLEL_SCORING_MIN_CANDIDATES', 20000))
+# Candidates scored between deadline checks
+DEADLINE_CHUNK_SIZE = int(os.getenv('RECOMMEND_DEADLINE_CHUNK_SIZE', 256))
+
+# Failures of the pool rather than of the scoring: a dead worker process, or
+# a model/shard that cannot be pickled to reach it
+POOL_ERRORS = (BrokenExecutor, OSError, pickle.PicklingError, AttributeError, TypeError)
+
+
+class ScoredCandidates:
+    """Scores of one candidate matrix (or shard) and its best `k` rows"""
+
+    def __init__(self, base_scores, final_scores, ingredient_boosts, failed, errors, top, unscored=None):
+        self.base_scores = base_scores
+        self.final_scores = final_scores
+        self.ingredient_boosts = ingredient_boosts
+        self.failed = failed
+        self.errors = errors
+        self.top = top
+        # Rows the model never saw (deadline reached or no model)
+        self.unscored = np.zeros(len(failed), dtype=bool) if unscored is None else unscored
+
+    @classmethod
+    def merge(cls, parts, k):
+        """Concatenate shard results and select the overall top-K from the shards' top-Ks"""
+        offsets = np.cumsum([0] + [len(part.final_scores) for part in parts])
+        final_scores = np.concatenate([part.final_scores for part in parts])
+        errors = {}
+        for offset, part in zip(offsets.tolist(), parts):
+            errors.update({offset + i: e for i, e in part.errors.items()})
+
+        # The union of the shard top-Ks contains the global top-K; sorting it
+        # by row keeps select_top_k's tie order (earlier row first)
+        union = np.sort(np.concatenate([part.top + offset for offset, part in zip(offsets, parts)]))
+        top = union[select_top_k(final_scores[union], k)]
+
+        return cls(np.concatenate([part.base_scores for part in parts]), final_scores,
+                   np.concatenate([part.ingredient_boosts for part in parts]),
+                   np.concatenate([part.failed for part in parts]), errors, top,
+                   np.concatenate([part.unscored for part in parts]))
+
+    def split(self, sizes, ks):
+        """Per-segment results (segment i: the next sizes[i] rows, its own top ks[i])"""
+        parts = []
+        offsets = np.cumsum([0] + list(sizes)).tolist()
+        for start, end, k in zip(offsets[:-1], offsets[1:], ks):
+            final_scores = self.final_scores[start:end]
+            errors = {i - start: e for i, e in self.errors.items() if start <= i < end}
+            parts.append(ScoredCandidates(self.base_scores[start:end], final_scores,
+                                          self.ingredient_boosts[start:end], self.failed[start:end],
+                                          errors, select_top_k(final_scores, k), self.unscored[start:end]))
+        return parts
+
+
+def score_and_select(model, table, features, match_counts, time_diffs, cuisine_matches, k,
+                     fallback_scores=None, deadline=None, priority=None):
+    """
+    Base scores, boosted scores and top-K rows for a candidate matrix
+
+    Rows whose prediction failed, and rows left unscored (no model, or the
+    `deadline` on the time.monotonic() clock passed first), take
+    `fallback_scores` as their base score. Without fallback scores they get
+    a final score of 0.0. With a deadline, rows are scored in chunks of
+    DEADLINE_CHUNK_SIZE, highest `priority` first.
+    """
+    n = len(features)
+    unscored = np.zeros(n, dtype=bool)
+    if model is None:
+        scores, errors = [None] * n, {}
+        unscored[:] = True
+    elif deadline is None:
+        scores, errors = score_candidates(model, features, table)
+    else:
+        scores, errors = _score_until(model, table, features, deadline, priority, unscored)
+
+    failed = np.array([score is None for score in scores], dtype=bool) & ~unscored
+    base_scores = np.array([np.nan if score is None else score for score in scores], dtype=np.float64)
+
+    if fallback_scores is None:
+        final_scores, ingredient_boosts = apply_boosts(base_scores, match_counts, time_diffs, cuisine_matches)
+        final_scores[failed | unscored] = 0.0
+    else:
+        boost_input = np.where(failed | unscored, fallback_scores, base_scores)
+        final_scores, ingredient_boosts = apply_boosts(boost_input, match_counts, time_diffs, cuisine_matches)
+
+    return ScoredCandidates(base_scores, final_scores, ingredient_boosts, failed, errors,
+                            select_top_k(final_scores, k), unscored)
+
+
+def _score_until(model, table, features, deadline, priority, unscored):
+    """Score chunks in priority order while time remains; marks the rest in `unscored`"""
+    n = len(features)
+    scores, errors = [None] * n, {}
+    order = np.arange(n) if priority is None else np.argsort(-np.asarray(priority), kind='stable')
+    unscored[:] = True
+    for start in range(0, n, DEADLINE_CHUNK_SIZE):
+        if time.monotonic() >= deadline:
+            break
+        rows = order[start:start + DEADLINE_CHUNK_SIZE]
+        chunk_scores, chunk_errors = score_candidates(model, np.asarray(features)[rows], table)
+        for position, row in enumerate(rows.tolist()):
+            scores[row] = chunk_scores[position]
+            if position in chunk_errors:
+                errors[row] = chunk_errors[position]
+        unscored[rows] = False
+        if any(isinstance(error, ModelFailure) for error in chunk_errors.values()):
+            # The model is broken: the remaining chunks keep the fallback score
+            break
+    return scores, errors
+
+
+# ---- Process pool workers: model and table arrive once, through the initializer ----
+_worker_model = None
+_worker_table = None
+
+
+def _init_process_worker(model, table):
+    global _worker_model, _worker_table
+    _worker_model, _worker_table = model, table
+
+
+def _score_shard_in_process(args):
+    return score_and_select(_worker_model, _worker_table, *args)
+
+
+class ScoringExecutor:
+    """Serial or sharded scoring, chosen per request by candidate count"""
+
+    def __init__(self, backend=PARALLEL_SCORING_BACKEND, workers=PARALLEL_SCORING_WORKERS,
+                 min_candidates=PARALLEL_SCORING_MIN_CANDIDATES):
+        if backend not in ('thread', 'process', 'off'):
+            raise ValueError(f"Unknown parallel scoring backend: {backend}")
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.min_candidates = min_candidates
+        self._pool = None
+        self._pool_pid = None
+        self._pool_inputs = None
+        self._lock = threading.Lock()
+
+    def uses_parallel(self, num_candidates):
+        return (self.backend != 'off' and self.workers > 1
+                and num_candidates >= max(self.min_candidates, self.workers))
+
+    def score(self, model, table, features, match_counts, time_diffs, cuisine_matches, k,
+              fallback_scores=None, deadline=None, priority=None):
+        """
+        score_and_select, sharded across the pool for large candidate sets
+
+        Requests with a deadline (or no model) are scored serially.
+        """
+        n = len(features)
+        if model is None or deadline is not None or not self.uses_parallel(n):
+            return score_and_select(model, table, features, match_counts, time_diffs, cuisine_matches, k,
+                                    fallback_scores, deadline, priority)
+
+        bounds = np.linspace(0, n, self.workers + 1).astype(np.int64)
+        shards = [(features[start:end], np.asarray(match_counts)[start:end],
+                   np.asarray(time_diffs)[start:end], np.asarray(cuisine_matches)[start:end], k,
+                   None if fallback_scores is None else np.asarray(fallback_scores)[start:end])
+                  for start, end in zip(bounds[:-1], bounds[1:])]
+
+        pool = None
+        try:
+            pool = self._get_pool(model, table)
+            if self.backend == 'process':
+                parts = list(pool.map(_score_shard_in_process, shards))
+            else:
+                parts = list(pool.map(lambda shard: score_and_select(model, table, *shard), shards))
+        except POOL_ERRORS as e:
+            # A scoring bug would fail the same way serially, so nothing is hidden here
+            print(f"⚠️ Parallel scoring pool failed ({type(e).__name__}: {e}); scoring {n} candidates serially")
+            self._discard_pool(pool)
+            return score_and_select(model, table, features, match_counts, time_diffs, cuisine_matches, k,
+                                    fallback_scores)
+        return ScoredCandidates.merge(parts, k)
+
+    def score_many(self, model, table, segments):
+        """
+        Score several candidate matrices (e.g. one per user) as one tensor
+
+        segments: (features, match_counts, time_diffs, cuisine_matches, k,
+        fallback_scores) tuples, where fallback_scores (or None) stands in for
+        the model's score on rows it fails or does not score, as in score().
+        The stacked rows are scored together, so rows shared between
+        segments reach the model once, and large stacks are sharded like
+        score(). Returns one ScoredCandidates per segment.
+        """
+        if not segments:
+            return []
+        columns = [np.concatenate([np.asarray(segment[i]) for segment in segments]) for i in range(4)]
+        fallback = None
+        if any(segment[5] is not None for segment in segments):
+            fallback = np.concatenate([np.zeros(len(segment[0])) if segment[5] is None
+                                       else np.asarray(segment[5], dtype=np.float64) for segment in segments])
+        scored = self.score(model, table, *columns, 0, fallback_scores=fallback)
+        return scored.split([len(segment[0]) for segment in segments], [segment[4] for segment in segments])
+
+    def _get_pool(self, model, table):
+        """Pool for this process; process pools are rebuilt when the model changes"""
+        with self._lock:
+            current = self._pool is not None and self._pool_pid == os.getpid()
+            if current and (self.backend != 'process' or
+                            (self._pool_inputs[0] is model and self._pool_inputs[1] is table)):
+                return self._pool
+            if current:
+                self._pool.shutdown(wait=False)
+
+            if self.backend == 'process':
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_process_worker,
+                                                 initargs=(model, table))
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scoring')
+            self._pool_pid = os.getpid()
+            self._pool_inputs = (model, table)
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """Drop a failed pool so the next parallel request builds a new one"""
+        with self._lock:
+            if pool is None or self._pool is not pool:
+                return
+            self._pool = None
+            self._pool_inputs = None
+        try:
+            pool.shutdown(wait=False, cancel_futures=True)
+        except Exception as e:
+            print(f"⚠️ Could not shut down the failed scoring pool: {e}")
+
+    def after_fork(self):
+        """Forget the parent's pool and lock in a forked worker; a new pool is made on first use"""
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self._pool_inputs = None
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=True)
+            self._pool = None
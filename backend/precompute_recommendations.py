@@ -0,0 +1,121 @@
+"""
+Batch job: precompute every user's recommendations for the preset requests
+
+Usage: python precompute_recommendations.py [--restart] [--users-per-batch N]
+
+Pages through the users table in id order. Each page's users x presets are
+scored as one stacked tensor, the same way /api/recommend/batch does it.
+The payloads go to the store at PRECOMPUTED_STORE_PATH (see
+recommendation_store.py). Progress is checkpointed with every page, so
+running the job again resumes where it stopped.
+
+A job is identified by the catalog fingerprint, the model, the presets and
+top_k. A changed catalog or model therefore starts a fresh pass.
+"""
+import sys
+import time
+import argparse
+
+from response_cache import _digest, profile_fingerprint
+from recommendation_store import (RecommendationStore, PRECOMPUTED_STORE_PATH, PRECOMPUTE_TOP_K,
+                                  default_presets, model_fingerprint)
+
+USER_COLUMNS = 'id, allergies, disliked_ingredients, diet, updated_at'
+
+
+def fetch_users_page(after, limit):
+    """Up to `limit` user rows with id greater than `after`, in id order"""
+    from app import supabase
+    query = supabase.table('users').select(USER_COLUMNS).order('id').limit(limit)
+    if after is not None:
+        query = query.gt('id', after)
+    return query.execute().data
+
+
+def precompute(store, presets=None, top_k=PRECOMPUTE_TOP_K, users_per_batch=100, restart=False,
+               fetch_users=fetch_users_page):
+    """
+    Fill the store for every user, resuming from the job's checkpoint
+
+    Returns:
+        number of users stored by this run
+    """
+    from app import (ml_model, recipe_catalog, score_table, scoring_executor, parse_recommend_options,
+                     select_candidates, recommend_payload, empty_recommend_payload, heuristic_scores)
+
+    if ml_model is None:
+        raise RuntimeError('ML model not loaded')
+    presets = default_presets() if presets is None else presets
+    catalog = recipe_catalog.get_snapshot()
+    catalog_fp = catalog.fingerprint()
+    model_fp = model_fingerprint(ml_model)
+    job = _digest({'catalog': catalog_fp, 'model': model_fp, 'top_k': top_k,
+                   'presets': [[sorted(cuisines), minutes] for cuisines, minutes in presets]})
+
+    if restart:
+        store.reset_job(job)
+    last_user_id, users_done, finished = store.checkpoint(job)
+    if finished:
+        print(f"✓ Precompute job {job[:12]} already finished ({users_done} users)")
+        return 0
+    if last_user_id is not None:
+        print(f"Resuming precompute job {job[:12]} after user {last_user_id} ({users_done} users done)")
+
+    options = [parse_recommend_options({'preferred_cuisine': cuisines, 'max_cooking_time': minutes,
+                                        'top_k': top_k})
+               for cuisines, minutes in presets]
+    started = time.time()
+    stored = 0
+    while True:
+        users = fetch_users(last_user_id, users_per_batch)
+        if not users:
+            break
+
+        entries = []
+        pending = []   # (entry position, selected, options)
+        for user in users:
+            profile = profile_fingerprint(user)
+            for (cuisines, minutes), preset_options in zip(presets, options):
+                selected = select_candidates(catalog, user, preset_options)
+                entry = [user['id'], preset_options['preferred_cuisines'], minutes, top_k,
+                         profile, catalog_fp, model_fp, None]
+                if selected['filtered']:
+                    pending.append((len(entries), selected, preset_options))
+                else:
+                    entry[-1] = empty_recommend_payload(preset_options)
+                entries.append(entry)
+
+        segments = [(selected['features'], selected['match_counts'], selected['time_diffs'],
+                     selected['cuisine_matches'], top_k,
+                     heuristic_scores(catalog, selected['filtered'], selected['features']))
+                    for _, selected, _ in pending]
+        for (position, selected, preset_options), scored in zip(
+                pending, scoring_executor.score_many(ml_model, score_table, segments)):
+            entries[position][-1] = recommend_payload(catalog, selected, scored, preset_options)
+        # Partial (heuristic) rankings are scored live instead of being stored
+        entries = [entry for entry in entries if not entry[-1].get('partial')]
+
+        last_user_id = str(users[-1]['id'])
+        users_done += len(users)
+        stored += len(users)
+        store.put_many(entries, checkpoint=(job, last_user_id, users_done))
+        elapsed = time.time() - started
+        print(f"  {users_done} users ({len(entries)} presets this page, "
+              f"{stored / elapsed if elapsed > 0 else 0:.1f} users/s)")
+
+    store.finish(job, users_done)
+    print(f"✓ Precompute job {job[:12]} finished: {users_done} users x {len(presets)} presets")
+    return stored
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute preset recommendations for every user')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start over')
+    parser.add_argument('--users-per-batch', type=int, default=100)
+    args = parser.parse_args()
+
+    if not PRECOMPUTED_STORE_PATH:
+        print('PRECOMPUTED_STORE_PATH is not set')
+        sys.exit(1)
+    precompute(RecommendationStore(PRECOMPUTED_STORE_PATH), users_per_batch=args.users_per_batch,
+               restart=args.restart)
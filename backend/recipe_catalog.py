@@ -0,0 +1,954 @@
+"""
+In-memory recipe catalog shared by all recommendation requests
+
+The recipes table is loaded once per process and kept as an immutable,
+columnar snapshot (or, with RECIPE_CATALOG_SHARED_DIR, once per host and
+memory-mapped by every worker; see shared_catalog.py). A background thread
+replaces the snapshot, so request handlers never wait on the catalog
+download.
+
+When change polling is configured, the thread fetches only rows newer than
+the snapshot's high-water mark every few seconds. The mark is the latest
+updated_at, or the highest id when rows have no updated_at. Deletions are
+found by listing ids. The changes are applied as a new snapshot with a
+higher version, built by copying the arrays of the current one and patching
+only the changed rows. Only those rows are parsed; a memory-mapped snapshot's
+other rows are copied as stored JSON bytes without being decoded. Full
+reloads then only run on the longer refresh interval, as a safety net.
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+# Seconds between full background catalog reloads (0 disables them); with
+# change polling on they only correct drift, so the default is long
+CATALOG_REFRESH_SECONDS = float(os.getenv('RECIPE_CATALOG_REFRESH_SECONDS', 3600))
+# Seconds between incremental change polls (0 disables them) and between
+# id listings that detect deleted rows
+CATALOG_SYNC_SECONDS = float(os.getenv('RECIPE_CATALOG_SYNC_SECONDS', 10))
+CATALOG_DELETE_CHECK_SECONDS = float(os.getenv('RECIPE_CATALOG_DELETE_CHECK_SECONDS', 60))
+
+
+def parse_ingredients_list(ingredients_str):
+    """Parse ingredients list from string to array"""
+    if not ingredients_str:
+        return []
+
+    # If it's already a list, return it
+    if isinstance(ingredients_str, list):
+        return ingredients_str
+
+    try:
+        # Try to parse as JSON array
+        if ingredients_str.startswith('['):
+            parsed = json.loads(ingredients_str.replace("'", '"'))
+            return parsed if isinstance(parsed, list) else []
+    except:
+        pass
+
+    # Fallback: split by comma
+    return [ing.strip() for ing in ingredients_str.split(',') if ing.strip()]
+
+
+def normalize_ingredient(value):
+    """Canonical form used for ingredient comparisons"""
+    return str(value).lower().strip()
+
+
+def normalize_ingredients(values):
+    """Set of canonical ingredient names from a list (or None)"""
+    return {normalize_ingredient(v) for v in (values or [])}
+
+
+def normalize_cuisine(value):
+    """Canonical form used for cuisine comparisons"""
+    return str(value).lower().strip()
+
+
+def pack_mask(mask):
+    """Pack a boolean row mask into a little-endian bitmap (one bit per recipe)"""
+    return np.packbits(mask, bitorder='little')
+
+
+def unpack_bitmap(bitmap, size):
+    """Boolean row mask of length size from a packed bitmap"""
+    return np.unpackbits(bitmap, count=size, bitorder='little').view(bool)
+
+
+def _build_bitmaps(codes, rows, num_codes, num_rows):
+    """Packed (num_codes, ceil(num_rows / 8)) bitmaps with bit row set for each (code, row)"""
+    bitmaps = np.zeros((num_codes, (num_rows + 7) // 8), dtype=np.uint8)
+    np.bitwise_or.at(bitmaps, (codes, rows >> 3), (1 << (rows & 7)).astype(np.uint8))
+    return bitmaps
+
+
+def _patch_bitmaps(bitmaps, num_codes, num_rows, cleared, added):
+    """
+    Copy of bitmaps resized to (num_codes, ceil(num_rows / 8)) with bits changed
+
+    Args:
+        bitmaps: packed bitmaps whose rows keep their bit positions
+        cleared: (codes, rows) bits to unset
+        added: (codes, rows) bits to set
+    """
+    patched = np.zeros((num_codes, (num_rows + 7) // 8), dtype=np.uint8)
+    width = min(patched.shape[1], bitmaps.shape[1])
+    patched[:len(bitmaps), :width] = bitmaps[:, :width]
+    codes, rows = cleared
+    # Bytes past the new width were cut off with their rows
+    inside = (rows >> 3) < patched.shape[1]
+    codes, rows = codes[inside], rows[inside]
+    np.bitwise_and.at(patched, (codes, rows >> 3), ~(1 << (rows & 7)).astype(np.uint8))
+    codes, rows = added
+    np.bitwise_or.at(patched, (codes, rows >> 3), (1 << (rows & 7)).astype(np.uint8))
+    return patched
+
+
+class TrigramIndex:
+    """
+    Substring index over the distinct ingredient vocabulary
+
+    match(term) returns the IDs of every ingredient name that contains term,
+    exactly like ``term in name``, without scanning the vocabulary: the
+    posting lists of the term's trigrams are intersected and only those
+    candidates are verified.
+    """
+
+    def __init__(self, vocab):
+        self.vocab = vocab
+        postings = {}
+        # Names shorter than a trigram cannot be reached through postings
+        self.short_ids = []
+        for ingredient_id, name in enumerate(vocab):
+            if len(name) < 3:
+                self.short_ids.append(ingredient_id)
+            for gram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                postings.setdefault(gram, []).append(ingredient_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    @classmethod
+    def from_postings(cls, vocab, short_ids, grams, offsets, ids):
+        """Index over saved CSR postings; gram i owns ids[offsets[i]:offsets[i + 1]] (views, no copy)"""
+        index = cls.__new__(cls)
+        index.vocab = vocab
+        index.short_ids = list(short_ids)
+        index.postings = {gram: ids[offsets[i]:offsets[i + 1]] for i, gram in enumerate(grams)}
+        return index
+
+    def to_postings(self):
+        """(grams, offsets, ids) CSR form of the posting lists"""
+        grams = list(self.postings)
+        lengths = [len(self.postings[gram]) for gram in grams]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        ids = (np.concatenate([self.postings[gram] for gram in grams]) if grams
+               else np.empty(0, dtype=np.int32)).astype(np.int32)
+        return grams, offsets, ids
+
+    def extend(self, vocab):
+        """Index over vocab, which starts with this index's vocabulary; only the new names are indexed"""
+        index = TrigramIndex.__new__(TrigramIndex)
+        index.vocab = vocab
+        index.short_ids = list(self.short_ids)
+        added = {}
+        for ingredient_id in range(len(self.vocab), len(vocab)):
+            name = vocab[ingredient_id]
+            if len(name) < 3:
+                index.short_ids.append(ingredient_id)
+            for gram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                added.setdefault(gram, []).append(ingredient_id)
+        index.postings = dict(self.postings)
+        for gram, ids in added.items():
+            ids = np.array(ids, dtype=np.int32)
+            if gram in index.postings:
+                ids = np.concatenate([index.postings[gram], ids])
+            index.postings[gram] = ids
+        return index
+
+    def match(self, term):
+        """Sorted IDs of the ingredient names containing term"""
+        if not term:
+            return np.arange(len(self.vocab), dtype=np.int32)
+
+        if len(term) < 3:
+            # Any name of 3+ characters containing term has a trigram containing it
+            parts = [ids for gram, ids in self.postings.items() if term in gram]
+        else:
+            grams = {term[i:i + 3] for i in range(len(term) - 2)}
+            lists = sorted((self.postings.get(gram) for gram in grams),
+                           key=lambda ids: -1 if ids is None else len(ids))
+            if lists[0] is None:
+                return np.empty(0, dtype=np.int32)
+            candidates = lists[0]
+            for ids in lists[1:]:
+                candidates = np.intersect1d(candidates, ids, assume_unique=True)
+                if len(candidates) == 0:
+                    break
+            parts = [candidates]
+
+        candidates = np.unique(np.concatenate(parts + [np.array(self.short_ids, dtype=np.int32)]))
+        return np.array([i for i in candidates.tolist() if term in self.vocab[i]], dtype=np.int32)
+
+
+# Fractional seconds and a trailing UTC offset without minutes, which
+# datetime.fromisoformat only accepts with exactly 6 digits and HH:MM before
+# Python 3.11 (Postgres drops trailing zeros, e.g. "12:00:00.12345+00")
+_FRACTION = re.compile(r'\.(\d+)')
+_HOUR_OFFSET = re.compile(r'(:\d{2}(?:\.\d{6})?)([+-]\d{2})$')
+
+
+def _parse_timestamp(value):
+    """datetime of an ISO-8601 updated_at value (None when missing or unparseable)"""
+    if not value:
+        return None
+    text = str(value).replace('Z', '+00:00')
+    text = _FRACTION.sub(lambda m: '.' + m.group(1)[:6].ljust(6, '0'), text, count=1)
+    text = _HOUR_OFFSET.sub(r'\1\2:00', text)
+    try:
+        stamp = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+
+def _float_column(records, key):
+    """Numeric column with NaN where the value is missing or not a number"""
+    column = np.full(len(records), np.nan, dtype=np.float64)
+    for row, record in enumerate(records):
+        value = record.get(key)
+        if value is None:
+            continue
+        try:
+            column[row] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return column
+
+
+def _intern(vocab, index, value):
+    """Code of value in a dictionary encoding, appended to vocab when it is new"""
+    code = index.get(value)
+    if code is None:
+        code = index[value] = len(vocab)
+        vocab.append(value)
+    return code
+
+
+def _encode_column(values):
+    """Dictionary-encode a list of hashable values into (vocab, int32 codes)"""
+    vocab = []
+    index = {}
+    codes = np.array([_intern(vocab, index, value) for value in values], dtype=np.int32)
+    return vocab, index, codes
+
+
+def _record_digest(record):
+    """SHA-256 of one record's canonical JSON"""
+    return hashlib.sha256(json.dumps(record, sort_keys=True, default=str).encode('utf-8')).digest()
+
+
+def _parse_record(record):
+    """(parsed ingredient list, unique normalized names, digest) of one recipe row"""
+    ingredients = parse_ingredients_list(record.get('ingredients_list'))
+    # dict.fromkeys dedupes while keeping first-seen order, so IDs are stable
+    names = list(dict.fromkeys(normalize_ingredient(i) for i in ingredients))
+    return ingredients, names, _record_digest(record)
+
+
+def _encode_json_rows(values):
+    """JSON documents stored back to back as (uint8 bytes, int64 offsets)"""
+    encoded = [json.dumps(value, separators=(',', ':'), default=str).encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(item) for item in encoded])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class _LazyRows:
+    """Read-only sequence whose items are built by decode(row) on every access"""
+
+    def __init__(self, size, decode):
+        self._size = size
+        self._decode = decode
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, row):
+        return self._decode(range(self._size)[row])
+
+    def __iter__(self):
+        return (self._decode(row) for row in range(self._size))
+
+
+class _JsonRows(_LazyRows):
+    """JSON documents stored back to back as (uint8 data, int64 offsets), decoded on access"""
+
+    def __init__(self, data, offsets):
+        super().__init__(len(offsets) - 1, self._decode_row)
+        self.data = data
+        self.offsets = offsets
+
+    def _decode_row(self, row):
+        return json.loads(self.data[self.offsets[row]:self.offsets[row + 1]].tobytes())
+
+    def take(self, source, added_values):
+        """
+        New _JsonRows whose row i copies row source[i], or encodes
+        added_values[-1 - source[i]] when source[i] is negative
+
+        Copied rows are moved as raw bytes, one range per run of consecutive
+        rows, so only the added values are encoded and nothing is decoded.
+        """
+        added_data, added_offsets = _encode_json_rows(added_values)
+        old = self._size
+        # Rows numbered across both buffers: the old rows, then the added ones
+        rows = np.where(source >= 0, source, old - 1 - source)
+        starts = np.concatenate([self.offsets[:-1], added_offsets[:-1]])
+        ends = np.concatenate([self.offsets[1:], added_offsets[1:]])
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(ends[rows] - starts[rows], out=offsets[1:])
+
+        data = np.empty(offsets[-1], dtype=np.uint8)
+        breaks = (np.flatnonzero((np.diff(rows) != 1) | (rows[1:] == old)) + 1).tolist()
+        for first, last in zip([0] + breaks, breaks + [len(rows)]):
+            if first == last:
+                continue
+            buffer = self.data if rows[first] < old else added_data
+            data[offsets[first]:offsets[last]] = buffer[starts[rows[first]]:ends[rows[last - 1]]]
+        return _JsonRows(data, offsets)
+
+
+class _IdIndex:
+    """
+    Read-only recipe id -> row mapping backed by sorted id arrays
+
+    Stands in for the row_by_id dict of a memory-mapped snapshot, so workers
+    do not each build a dict over the whole catalog.
+    """
+
+    def __init__(self, ids, sorted_ids, order):
+        self._ids = ids
+        self._sorted_ids = sorted_ids
+        self._order = order
+
+    def get(self, recipe_id, default=None):
+        if isinstance(recipe_id, bool) or not isinstance(recipe_id, (int, np.integer)):
+            return default
+        position = int(np.searchsorted(self._sorted_ids, recipe_id))
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == recipe_id:
+            return int(self._order[position])
+        return default
+
+    def items(self):
+        return zip(self._ids.tolist(), range(len(self._ids)))
+
+    def __contains__(self, recipe_id):
+        return self.get(recipe_id) is not None
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class CatalogSnapshot:
+    """
+    Immutable columnar view of the recipes table
+
+    Row ``i`` of every column array describes ``records[i]``. Missing numeric
+    values are stored as NaN so callers can apply their own defaults.
+
+    save() writes the snapshot as a directory of .npy files, and load() maps
+    it back read-only. A loaded snapshot shares its arrays with every process
+    that maps the same directory. Its records and ingredient lists are only
+    decoded from JSON when a row is accessed.
+    """
+
+    # Columns saved as .npy files and memory-mapped by load()
+    ARRAYS = ('ids', 'cook_time_minutes', 'calories', 'rating', 'cuisine_codes', 'cuisine_bitmaps',
+              'diet_codes', 'ingredient_offsets', 'ingredient_ids', 'ingredient_counts', 'ingredient_rows',
+              'ingredient_bitmaps', 'all_rows_bitmap', 'row_digests')
+
+    def __init__(self, records, version=1):
+        self.version = version
+        self.loaded_at = time.time()
+        self.records = list(records)
+
+        self.ids = np.array([r['id'] for r in self.records], dtype=np.int64)
+        self.row_by_id = {recipe_id: row for row, recipe_id in enumerate(self.ids.tolist())}
+
+        self.cook_time_minutes = _float_column(self.records, 'cook_time_minutes')
+        self.calories = _float_column(self.records, 'calories')
+        self.rating = _float_column(self.records, 'rating')
+
+        self.cuisine_vocab, self.cuisine_index, self.cuisine_codes = _encode_column(
+            [normalize_cuisine(r.get('cuisine', '')) for r in self.records]
+        )
+        # cuisine_bitmaps[c] marks the recipes whose cuisine code is c
+        self.cuisine_bitmaps = _build_bitmaps(
+            self.cuisine_codes, np.arange(len(self.records), dtype=np.int64),
+            len(self.cuisine_vocab), len(self.records)
+        )
+        self.diet_vocab, self.diet_index, self.diet_codes = _encode_column(
+            [r.get('diet') for r in self.records]
+        )
+
+        # Ingredients are parsed, normalized and interned once. ingredient_lists
+        # keeps the parsed display form; ingredient_sets and the CSR id arrays
+        # hold the unique normalized names, where recipe i owns
+        # ingredient_ids[ingredient_offsets[i]:ingredient_offsets[i + 1]]
+        parsed = [_parse_record(r) for r in self.records]
+        self.ingredient_lists = [p[0] for p in parsed]
+        normalized_lists = [p[1] for p in parsed]
+        digests = [p[2] for p in parsed]
+        self._normalized_lists = normalized_lists
+        self.ingredient_sets = [frozenset(names) for names in normalized_lists]
+        self.ingredient_vocab = []
+        self.ingredient_index = {}
+        offsets = np.zeros(len(self.records) + 1, dtype=np.int64)
+        flat_ids = []
+        for row, names in enumerate(normalized_lists):
+            flat_ids.extend(sorted(_intern(self.ingredient_vocab, self.ingredient_index, name) for name in names))
+            offsets[row + 1] = len(flat_ids)
+        self.ingredient_offsets = offsets
+        self.ingredient_ids = np.array(flat_ids, dtype=np.int32)
+        self.ingredient_counts = np.diff(offsets)
+
+        # Inverted index: row i of ingredient_bitmaps has bit r set when recipe r
+        # contains ingredient i
+        # ingredient_rows[j] is the recipe row that owns ingredient_ids[j]
+        self.ingredient_rows = np.repeat(np.arange(len(self.records), dtype=np.int64), self.ingredient_counts)
+        self.ingredient_bitmaps = _build_bitmaps(
+            self.ingredient_ids, self.ingredient_rows, len(self.ingredient_vocab), len(self.records)
+        )
+        self.all_rows_bitmap = pack_mask(np.ones(len(self.records), dtype=bool))
+        self.ingredient_search = TrigramIndex(self.ingredient_vocab)
+
+        # Per-row content digests, so the fingerprint is ready before any
+        # request needs it and a delta only re-hashes its changed rows
+        self.row_digests = np.frombuffer(b''.join(digests), dtype=np.uint8).reshape(len(digests), 32)
+        self._fingerprint = hashlib.sha256(self.row_digests.tobytes()).hexdigest()
+
+        # High-water mark for change polling: latest updated_at and highest id
+        stamps = [(_parse_timestamp(r.get('updated_at')), r.get('updated_at')) for r in self.records]
+        stamps = [stamp for stamp in stamps if stamp[0] is not None]
+        self.updated_at_max = max(stamps)[1] if stamps else None
+        self.max_id = int(self.ids.max()) if len(self.ids) else None
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(self, row):
+        """Raw recipe row as returned by the database"""
+        return self.records[row]
+
+    def row_ingredient_ids(self, row):
+        """Interned ingredient IDs of one recipe"""
+        return self.ingredient_ids[self.ingredient_offsets[row]:self.ingredient_offsets[row + 1]]
+
+    def lookup_ingredient_ids(self, names):
+        """Interned IDs of the given ingredient names that occur in the catalog"""
+        index = self.ingredient_index
+        return sorted(index[n] for n in normalize_ingredients(names) if n in index)
+
+    def count_ingredients(self, ingredient_ids, rows=None):
+        """Per-recipe number of the given ingredient IDs each recipe contains"""
+        hits = np.isin(self.ingredient_ids, list(ingredient_ids))
+        counts = np.bincount(self.ingredient_rows[hits], minlength=len(self.records))
+        return counts if rows is None else counts[rows]
+
+    def ingredients_bitmap(self, ingredient_ids):
+        """Packed bitmap of recipes containing any of the given ingredient IDs"""
+        if len(ingredient_ids) == 0:
+            return np.zeros_like(self.all_rows_bitmap)
+        return np.bitwise_or.reduce(self.ingredient_bitmaps[list(ingredient_ids)], axis=0)
+
+    def exclude_ingredients(self, names, candidates=None):
+        """
+        Packed candidate bitmap with every recipe containing one of names removed
+
+        Args:
+            names: ingredient names (normalized here) to block
+            candidates: packed bitmap to start from (defaults to all recipes)
+        """
+        if candidates is None:
+            candidates = self.all_rows_bitmap
+        blocked = self.ingredients_bitmap(self.lookup_ingredient_ids(names))
+        return candidates & ~blocked
+
+    def cuisine_mask(self, cuisines):
+        """Boolean row mask of recipes whose normalized cuisine is in cuisines"""
+        codes = [self.cuisine_index[c] for c in cuisines if c in self.cuisine_index]
+        if not codes:
+            return np.zeros(len(self.records), dtype=bool)
+        bitmap = np.bitwise_or.reduce(self.cuisine_bitmaps[codes], axis=0)
+        return unpack_bitmap(bitmap, len(self.records))
+
+    def search_match_counts(self, terms):
+        """
+        Per-recipe count of search terms matching at least one ingredient
+
+        A term matches an ingredient when it is a substring of the normalized
+        name ("chicken" matches "chicken breast").
+        """
+        counts = np.zeros(len(self.records), dtype=np.int32)
+        for term in terms:
+            bitmap = self.ingredients_bitmap(self.ingredient_search.match(term))
+            counts += unpack_bitmap(bitmap, len(self.records))
+        return counts
+
+    def apply_changes(self, upserts, deleted_ids, version):
+        """
+        New snapshot with rows inserted or replaced and rows deleted
+
+        Rows stay in id order. Only the changed rows are parsed and hashed:
+        the other rows' columns are copied, the vocabularies and trigram
+        postings are only extended with new names, and the bitmaps have the
+        changed rows' bits patched. When inserts or deletes move rows, the
+        bitmaps are rebuilt from the copied CSR arrays instead. Names that no
+        row uses any more stay in the vocabularies (with empty bitmaps) until
+        the next full load, and the updated_at mark never moves back.
+        On a memory-mapped snapshot the other rows' records and ingredient
+        lists are copied as JSON bytes, and save() writes those bytes as is.
+        """
+        changed = {r['id']: r for r in upserts}
+        deleted = set(deleted_ids)
+        added = sorted((r for r in changed.values() if r['id'] not in deleted), key=lambda r: r['id'])
+        dropped = np.isin(self.ids, np.array(list(deleted | changed.keys()), dtype=np.int64))
+        kept = np.flatnonzero(~dropped)
+
+        # source[row] is the old row copied to row, or -1 - i for added[i]
+        ids = np.concatenate([self.ids[kept], np.array([r['id'] for r in added], dtype=np.int64)])
+        order = np.argsort(ids, kind='stable')
+        source = np.concatenate([kept, -1 - np.arange(len(added), dtype=np.int64)])[order]
+        size = len(source)
+        copied = np.flatnonzero(source >= 0)
+        inserted = np.flatnonzero(source < 0)
+        in_place = np.array_equal(source[copied], copied)
+        parsed = [_parse_record(r) for r in added]
+
+        def gather(values, added_values):
+            return [values[row] if row >= 0 else added_values[-1 - row] for row in source.tolist()]
+
+        def column(values, added_values):
+            out = np.empty((size,) + values.shape[1:], dtype=values.dtype)
+            out[copied] = values[source[copied]]
+            out[inserted] = added_values
+            return out
+
+        # A memory-mapped snapshot stays lazy: its rows are copied as JSON
+        # bytes and never decoded
+        lazy = isinstance(self.records, _JsonRows)
+        snapshot = CatalogSnapshot.__new__(CatalogSnapshot)
+        snapshot.version = version
+        snapshot.loaded_at = time.time()
+        snapshot.ids = ids[order]
+        if lazy:
+            snapshot.records = self.records.take(source, added)
+            # Rows are in id order, so the ids are their own sorted index
+            snapshot.row_by_id = _IdIndex(snapshot.ids, snapshot.ids, np.arange(size, dtype=np.int64))
+        else:
+            snapshot.records = gather(self.records, added)
+            snapshot.row_by_id = {recipe_id: row for row, recipe_id in enumerate(snapshot.ids.tolist())}
+        for key in ('cook_time_minutes', 'calories', 'rating'):
+            setattr(snapshot, key, column(getattr(self, key), _float_column(added, key)))
+
+        snapshot.cuisine_vocab = list(self.cuisine_vocab)
+        snapshot.cuisine_index = dict(self.cuisine_index)
+        snapshot.cuisine_codes = column(self.cuisine_codes, [
+            _intern(snapshot.cuisine_vocab, snapshot.cuisine_index, normalize_cuisine(r.get('cuisine', '')))
+            for r in added])
+        snapshot.diet_vocab = list(self.diet_vocab)
+        snapshot.diet_index = dict(self.diet_index)
+        snapshot.diet_codes = column(self.diet_codes, [
+            _intern(snapshot.diet_vocab, snapshot.diet_index, r.get('diet')) for r in added])
+
+        if lazy:
+            snapshot.ingredient_lists = self.ingredient_lists.take(source, [p[0] for p in parsed])
+        else:
+            snapshot.ingredient_lists = gather(self.ingredient_lists, [p[0] for p in parsed])
+            snapshot._normalized_lists = gather(self._normalized_lists, [p[1] for p in parsed])
+            snapshot.ingredient_sets = gather(self.ingredient_sets, [frozenset(p[1]) for p in parsed])
+        snapshot.ingredient_vocab = vocab = list(self.ingredient_vocab)
+        snapshot.ingredient_index = index = dict(self.ingredient_index)
+        snapshot.ingredient_counts = column(self.ingredient_counts, [len(p[1]) for p in parsed])
+        snapshot.ingredient_offsets = offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(snapshot.ingredient_counts, out=offsets[1:])
+        snapshot.ingredient_rows = rows = np.repeat(np.arange(size, dtype=np.int64), snapshot.ingredient_counts)
+        # Copied rows take their id runs from the old CSR arrays
+        flat_ids = np.empty(offsets[-1], dtype=np.int32)
+        from_old = source[rows] >= 0
+        old_rows = source[rows[from_old]]
+        position = np.arange(len(flat_ids), dtype=np.int64)[from_old] - offsets[rows[from_old]]
+        flat_ids[from_old] = self.ingredient_ids[self.ingredient_offsets[old_rows] + position]
+        for row, (_, names, _) in zip(inserted.tolist(), parsed):
+            flat_ids[offsets[row]:offsets[row + 1]] = sorted(_intern(vocab, index, name) for name in names)
+        snapshot.ingredient_ids = flat_ids
+        snapshot.ingredient_search = self.ingredient_search.extend(vocab)
+        if lazy:
+            snapshot._lazy_ingredient_rows()
+
+        if in_place:
+            # Every kept row keeps its bit position: unset the dropped rows'
+            # bits and set the inserted ones'
+            dropped_rows = np.flatnonzero(dropped)
+            dropped_entries = dropped[self.ingredient_rows]
+            snapshot.ingredient_bitmaps = _patch_bitmaps(
+                self.ingredient_bitmaps, len(vocab), size,
+                (self.ingredient_ids[dropped_entries], self.ingredient_rows[dropped_entries]),
+                (flat_ids[~from_old], rows[~from_old]))
+            snapshot.cuisine_bitmaps = _patch_bitmaps(
+                self.cuisine_bitmaps, len(snapshot.cuisine_vocab), size,
+                (self.cuisine_codes[dropped_rows], dropped_rows),
+                (snapshot.cuisine_codes[inserted], inserted))
+        else:
+            snapshot.ingredient_bitmaps = _build_bitmaps(flat_ids, rows, len(vocab), size)
+            snapshot.cuisine_bitmaps = _build_bitmaps(
+                snapshot.cuisine_codes, np.arange(size, dtype=np.int64), len(snapshot.cuisine_vocab), size)
+        snapshot.all_rows_bitmap = pack_mask(np.ones(size, dtype=bool))
+
+        snapshot.row_digests = column(
+            self.row_digests, np.frombuffer(b''.join(p[2] for p in parsed), dtype=np.uint8).reshape(len(parsed), 32))
+        snapshot._fingerprint = hashlib.sha256(snapshot.row_digests.tobytes()).hexdigest()
+
+        stamps = [(_parse_timestamp(r.get('updated_at')), r.get('updated_at')) for r in added]
+        stamps.append((_parse_timestamp(self.updated_at_max), self.updated_at_max))
+        stamps = [stamp for stamp in stamps if stamp[0] is not None]
+        snapshot.updated_at_max = max(stamps)[1] if stamps else None
+        snapshot.max_id = int(snapshot.ids.max()) if size else None
+        return snapshot
+
+    def fingerprint(self):
+        """
+        SHA-256 over the per-row digests, computed when the snapshot is built
+
+        Unlike `version`, which counts loads in this process, equal contents
+        give equal fingerprints across processes and restarts.
+        """
+        return self._fingerprint
+
+    def save(self, path):
+        """Write the snapshot to a new directory (see load)"""
+        os.makedirs(path)
+        columns = {name: getattr(self, name) for name in self.ARRAYS}
+        for prefix, rows in (('records', self.records), ('lists', self.ingredient_lists)):
+            if not isinstance(rows, _JsonRows):
+                rows = _JsonRows(*_encode_json_rows(rows))
+            columns[f"{prefix}_data"], columns[f"{prefix}_offsets"] = rows.data, rows.offsets
+        columns['id_order'] = np.argsort(self.ids, kind='stable')
+        columns['sorted_ids'] = self.ids[columns['id_order']]
+        grams, columns['trigram_offsets'], columns['trigram_ids'] = self.ingredient_search.to_postings()
+        for name, array in columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+
+        meta = {
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'size': len(self),
+            'fingerprint': self.fingerprint(),
+            'updated_at_max': self.updated_at_max,
+            'max_id': self.max_id,
+            'cuisine_vocab': self.cuisine_vocab,
+            'diet_vocab': self.diet_vocab,
+            'ingredient_vocab': self.ingredient_vocab,
+            'short_ids': self.ingredient_search.short_ids,
+            'grams': grams,
+        }
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Snapshot saved by save(), with every array memory-mapped read-only
+
+        Only the vocabularies and the trigram dict are built per process.
+        """
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        def mapped(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+        snapshot = cls.__new__(cls)
+        snapshot.version = meta['version']
+        snapshot.loaded_at = meta['loaded_at']
+        for name in cls.ARRAYS:
+            setattr(snapshot, name, mapped(name))
+        snapshot.records = _JsonRows(mapped('records_data'), mapped('records_offsets'))
+        snapshot.ingredient_lists = _JsonRows(mapped('lists_data'), mapped('lists_offsets'))
+        snapshot.row_by_id = _IdIndex(snapshot.ids, mapped('sorted_ids'), mapped('id_order'))
+
+        snapshot.cuisine_vocab = meta['cuisine_vocab']
+        snapshot.cuisine_index = {value: code for code, value in enumerate(snapshot.cuisine_vocab)}
+        snapshot.diet_vocab = meta['diet_vocab']
+        snapshot.diet_index = {value: code for code, value in enumerate(snapshot.diet_vocab)}
+        snapshot.ingredient_vocab = vocab = meta['ingredient_vocab']
+        snapshot.ingredient_index = {name: i for i, name in enumerate(vocab)}
+        snapshot._lazy_ingredient_rows()
+        snapshot.ingredient_search = TrigramIndex.from_postings(
+            vocab, meta['short_ids'], meta['grams'], mapped('trigram_offsets'), mapped('trigram_ids'))
+
+        snapshot._fingerprint = meta['fingerprint']
+        snapshot.updated_at_max = meta['updated_at_max']
+        snapshot.max_id = meta['max_id']
+        return snapshot
+
+    def _lazy_ingredient_rows(self):
+        """Per-row normalized names and sets read from the CSR arrays on access"""
+        vocab = self.ingredient_vocab
+        self._normalized_lists = _LazyRows(
+            len(self.ids), lambda row: [vocab[i] for i in self.row_ingredient_ids(row).tolist()])
+        self.ingredient_sets = _LazyRows(len(self.ids), lambda row: frozenset(self._normalized_lists[row]))
+
+    def get(self, recipe_id):
+        """Recipe row by ID, or None if it is not in the snapshot"""
+        row = self.row_by_id.get(recipe_id)
+        return None if row is None else self.records[row]
+
+    def filter_rows(self, cuisine=None, max_time=None):
+        """Row indices matching an optional cuisine and maximum cook time"""
+        mask = np.ones(len(self.records), dtype=bool)
+        if cuisine:
+            mask &= self.cuisine_mask([normalize_cuisine(cuisine)])
+        if max_time:
+            # NaN compares False, matching SQL's NULL <= x
+            mask &= self.cook_time_minutes <= max_time
+        return np.flatnonzero(mask)
+
+
+class RecipeCatalog:
+    """
+    Process-level holder of the current CatalogSnapshot
+
+    Args:
+        fetch_fn: callable returning the full list of recipe rows
+        refresh_seconds: full background reload interval (0 disables it)
+        fetch_changes_fn: optional callable (updated_since, after_id) returning
+            the rows with updated_at >= updated_since, or with id > after_id
+            when updated_since is None
+        fetch_ids_fn: optional callable returning every recipe id, used to
+            detect deletions
+        sync_seconds: change polling interval (0 disables it)
+        delete_check_seconds: minimum seconds between id listings
+        shared: optional SharedCatalogDir (see shared_catalog.py). Snapshots
+            are then published there and memory-mapped; only the process
+            holding the leader lock fetches, the others follow CURRENT.
+    """
+
+    def __init__(self, fetch_fn, refresh_seconds=CATALOG_REFRESH_SECONDS, fetch_changes_fn=None,
+                 fetch_ids_fn=None, sync_seconds=CATALOG_SYNC_SECONDS,
+                 delete_check_seconds=CATALOG_DELETE_CHECK_SECONDS, shared=None):
+        self._fetch_fn = fetch_fn
+        self.refresh_seconds = refresh_seconds
+        self._fetch_changes_fn = fetch_changes_fn
+        self._fetch_ids_fn = fetch_ids_fn
+        self.sync_seconds = sync_seconds if fetch_changes_fn is not None else 0
+        self.delete_check_seconds = delete_check_seconds
+        self.shared = shared
+        self._snapshot = None
+        self._version = 0
+        self._last_delete_check = None
+        self._load_lock = threading.Lock()
+        self._refresher_lock = threading.Lock()
+        self._refresher = None
+        self._refresher_pid = None
+        self.syncs = 0
+        self.rows_synced = 0
+        self.last_sync_at = None
+        self.follows = 0
+
+    def get_snapshot(self):
+        """Current snapshot, loading it synchronously on first use"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self._load(reuse_shared=True)
+                snapshot = self._snapshot
+        self._ensure_refresher()
+        return snapshot
+
+    def preload(self):
+        """
+        Load the snapshot without starting the refresh thread
+
+        Used in the gunicorn master before it forks (see gunicorn.conf.py):
+        workers inherit the snapshot, and each starts its own thread in
+        after_fork().
+        """
+        with self._load_lock:
+            if self._snapshot is None:
+                self._load(reuse_shared=True)
+            return self._snapshot
+
+    def after_fork(self):
+        """Fresh locks and refresh thread in a forked worker (the parent's may be held or gone)"""
+        self._load_lock = threading.Lock()
+        self._refresher_lock = threading.Lock()
+        self._refresher = None
+        self._refresher_pid = None
+        if self._snapshot is not None:
+            self._ensure_refresher()
+
+    def refresh(self):
+        """Reload the catalog now and swap in the new snapshot"""
+        with self._load_lock:
+            return self._load()
+
+    def sync(self, check_deletes=None):
+        """
+        Apply rows changed since the snapshot's high-water mark
+
+        Deletions are checked when check_deletes is True, or (by default)
+        when delete_check_seconds have passed since the last id listing.
+        Installs and returns a new snapshot with the next version when
+        anything changed, otherwise returns the current snapshot.
+        """
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return self._load(reuse_shared=True)
+
+            rows = self._fetch_changes_fn(snapshot.updated_at_max,
+                                          snapshot.max_id if snapshot.updated_at_max is None else None)
+            # Rows stamped exactly at the mark come back on every poll; only
+            # rows that differ from the snapshot are changes
+            upserts = [r for r in rows if snapshot.get(r['id']) != r]
+
+            deleted = []
+            now = time.monotonic()
+            if check_deletes is None:
+                check_deletes = (self._fetch_ids_fn is not None and
+                                 (self._last_delete_check is None or
+                                  now - self._last_delete_check >= self.delete_check_seconds))
+            if check_deletes and self._fetch_ids_fn is not None:
+                live_ids = set(self._fetch_ids_fn())
+                deleted = [recipe_id for recipe_id in snapshot.ids.tolist() if recipe_id not in live_ids]
+                self._last_delete_check = now
+            self.last_sync_at = time.time()
+
+            if not upserts and not deleted:
+                return snapshot
+            if self.shared is None:
+                new = snapshot.apply_changes(upserts, deleted, self._next_version())
+            else:
+                with self.shared.publish_lock():
+                    new = self.shared.publish(snapshot.apply_changes(upserts, deleted, self._next_version()))
+            self._snapshot = new
+            self.syncs += 1
+            self.rows_synced += len(upserts) + len(deleted)
+            print(f"✓ Recipe catalog synced: {len(upserts)} changed, {len(deleted)} deleted "
+                  f"(version {new.version})")
+            return new
+
+    def follow(self):
+        """Switch to the shared snapshot if another process published a different version"""
+        version = self.shared.current() if self.shared is not None else None
+        snapshot = self._snapshot
+        if version is None or (snapshot is not None and snapshot.version == version):
+            return snapshot
+        with self._load_lock:
+            snapshot = self.shared.load(version)
+            self._snapshot = snapshot
+            self._version = max(self._version, snapshot.version)
+            self.follows += 1
+        return snapshot
+
+    def reset(self):
+        """Drop the cached snapshot so the next access reloads it"""
+        with self._load_lock:
+            self._snapshot = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'recipes': len(snapshot) if snapshot else 0,
+            'loaded_at': snapshot.loaded_at if snapshot else None,
+            'last_sync_at': self.last_sync_at,
+            'syncs': self.syncs,
+            'rows_synced': self.rows_synced,
+            'follows': self.follows,
+            'shared': self.shared.stats() if self.shared is not None else None,
+        }
+
+    def _next_version(self):
+        """Version for a new snapshot, above any version already published"""
+        if self.shared is not None:
+            self._version = max(self._version, self.shared.current() or 0)
+        self._version += 1
+        return self._version
+
+    def _load(self, reuse_shared=False):
+        """
+        Fetch the catalog and install it as a new snapshot
+
+        With a shared directory, reuse_shared maps the published snapshot
+        instead when there is one (worker boot). Otherwise the fetched
+        snapshot is published first and the mapped copy installed.
+        """
+        if self.shared is None:
+            snapshot = CatalogSnapshot(self._fetch_fn(), version=self._next_version())
+            source = 'loaded'
+        else:
+            with self.shared.publish_lock():
+                # Checked under the lock: another worker may have published while this one waited
+                snapshot = self.shared.load() if reuse_shared else None
+                source = 'mapped'
+                if snapshot is None:
+                    snapshot = self.shared.publish(
+                        CatalogSnapshot(self._fetch_fn(), version=self._next_version()))
+                    source = 'loaded and published'
+            self._version = max(self._version, snapshot.version)
+        # Readers holding the old snapshot keep a consistent view
+        self._snapshot = snapshot
+        print(f"✓ Recipe catalog {source}: {len(snapshot)} recipes (version {snapshot.version})")
+        if self.sync_seconds > 0 and snapshot.updated_at_max is None and len(snapshot):
+            print("⚠️ Recipes have no updated_at; catalog sync only picks up new ids and deletions")
+        return snapshot
+
+    def _ensure_refresher(self):
+        """Start the refresh thread once per process (threads do not survive fork)"""
+        if (self.refresh_seconds <= 0 and self.sync_seconds <= 0) or self._refresher_pid == os.getpid():
+            return
+        with self._refresher_lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name='recipe-catalog-refresh', daemon=True
+            )
+            self._refresher.start()
+            self._refresher_pid = os.getpid()
+
+    def _refresh_loop(self):
+        """
+        Incremental syncs every sync_seconds, full reloads every refresh_seconds
+
+        With a shared directory only the leader does either; every other
+        process switches to the leader's latest published snapshot.
+        """
+        last_full = time.monotonic()
+        interval = self.sync_seconds if self.sync_seconds > 0 else self.refresh_seconds
+        while True:
+            time.sleep(interval)
+            if self.shared is not None:
+                try:
+                    self.follow()
+                    if not self.shared.try_lead():
+                        continue
+                except Exception as e:
+                    print(f"Shared recipe catalog update failed, keeping version {self._version}: {e}")
+                    continue
+            full = self.sync_seconds <= 0 or (
+                self.refresh_seconds > 0 and time.monotonic() - last_full >= self.refresh_seconds)
+            try:
+                if full:
+                    self.refresh()
+                    last_full = time.monotonic()
+                else:
+                    self.sync()
+            except Exception as e:
+                print(f"Recipe catalog {'refresh' if full else 'sync'} failed, keeping version {self._version}: {e}")
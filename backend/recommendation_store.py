@@ -0,0 +1,201 @@
+"""
+Precomputed recommendations for common request presets
+
+precompute_recommendations.py scores every user for a set of presets: each
+preferred-cuisine option crossed with each cook-time bucket, with no
+ingredient search. It writes the payloads to a SQLite file.
+recommend() serves a request from this store when the request exactly
+matches a preset and the stored entry is still valid. Otherwise it scores
+live.
+
+An entry is valid when:
+- the user's profile fingerprint is the same as when it was computed
+- the catalog content fingerprint is the same
+- the model fingerprint is the same
+- it is younger than PRECOMPUTE_MAX_AGE_SECONDS
+
+Payloads are stored with PRECOMPUTE_TOP_K recipes. A smaller top_k is served
+as a prefix of that ranking.
+
+The job's progress is checkpointed in the same transaction as each batch of
+users, so an interrupted run resumes after the last user it stored.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from scoring import DEFAULT_TOP_K
+
+# SQLite file of precomputed recommendations (empty disables the store)
+PRECOMPUTED_STORE_PATH = os.getenv('PRECOMPUTED_STORE_PATH', '')
+# Preset cuisines ('any' = no cuisine preference) and max cooking times,
+# matching the RecipeRequest page's options
+PRECOMPUTE_CUISINES = os.getenv(
+    'PRECOMPUTE_CUISINES',
+    'any,american,mexican,italian,mediterranean,asian,indian,french,german,caribbean,british')
+PRECOMPUTE_COOK_TIMES = os.getenv('PRECOMPUTE_COOK_TIMES', '30,60,90,120')
+# Recipes stored per preset; requests with top_k up to this are served
+PRECOMPUTE_TOP_K = int(os.getenv('PRECOMPUTE_TOP_K', DEFAULT_TOP_K))
+# Entries older than this are not served, even if nothing else changed
+PRECOMPUTE_MAX_AGE_SECONDS = float(os.getenv('PRECOMPUTE_MAX_AGE_SECONDS', 86400))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recommendations (
+    user_id TEXT NOT NULL,
+    preset TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    catalog TEXT NOT NULL,
+    model TEXT,
+    top_k INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    computed_at REAL NOT NULL,
+    PRIMARY KEY (user_id, preset)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job TEXT PRIMARY KEY,
+    last_user_id TEXT,
+    users_done INTEGER NOT NULL,
+    finished INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def preset_key(cuisines, max_cooking_time):
+    """Canonical preset of normalized cuisines and a max cooking time, or None"""
+    try:
+        minutes = float(max_cooking_time)
+    except (TypeError, ValueError):
+        return None
+    return f"{','.join(sorted(cuisines))}|{minutes:g}"
+
+
+def default_presets():
+    """(cuisines, max_cooking_time) presets from PRECOMPUTE_CUISINES x PRECOMPUTE_COOK_TIMES"""
+    cuisines = [c.strip().lower() for c in PRECOMPUTE_CUISINES.split(',') if c.strip()]
+    times = [int(t) for t in PRECOMPUTE_COOK_TIMES.split(',') if t.strip()]
+    return [([] if cuisine == 'any' else [cuisine], minutes) for cuisine in cuisines for minutes in times]
+
+
+def model_fingerprint(model):
+    """MLflow model UUID of a loaded model, or None when it has none"""
+    uuid = getattr(getattr(model, 'metadata', None), 'model_uuid', None)
+    return uuid if isinstance(uuid, str) else None
+
+
+class RecommendationStore:
+    """SQLite key-value store of precomputed payloads, keyed by (user, preset)"""
+
+    def __init__(self, path, max_age=PRECOMPUTE_MAX_AGE_SECONDS, clock=time.time):
+        self.path = path
+        self.max_age = max_age
+        self._clock = clock
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _connection(self):
+        """Connection for this process (SQLite connections must not cross a fork)"""
+        if self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get(self, user_id, cuisines, max_cooking_time, top_k, profile, catalog, model):
+        """Stored payload for an exact preset match that is still valid, else None"""
+        key = preset_key(cuisines, max_cooking_time)
+        if key is None:
+            return None
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT profile, catalog, model, top_k, payload, computed_at FROM recommendations '
+                'WHERE user_id = ? AND preset = ?', (str(user_id), key)).fetchone()
+            if row is None or row[3] < top_k:
+                self.misses += 1
+                return None
+            if (row[0], row[1], row[2]) != (profile, catalog, model) or self._clock() - row[5] > self.max_age:
+                self.stale += 1
+                return None
+            self.hits += 1
+
+        payload = json.loads(row[4])
+        if top_k < row[3]:
+            payload['recipes'] = payload['recipes'][:top_k]
+        if 'top_k' in payload:
+            payload['top_k'] = top_k
+        if 'stage_sizes' in payload:
+            payload['stage_sizes']['returned'] = len(payload['recipes'])
+        return payload
+
+    def put_many(self, entries, checkpoint=None):
+        """
+        Store (user_id, cuisines, max_cooking_time, top_k, profile, catalog, model, payload) entries
+
+        checkpoint: optional (job, last_user_id, users_done), saved in the
+        same transaction
+        """
+        now = self._clock()
+        rows = [(str(user_id), preset_key(cuisines, max_time), profile, catalog, model, top_k,
+                 json.dumps(payload, separators=(',', ':')), now)
+                for user_id, cuisines, max_time, top_k, profile, catalog, model, payload in entries]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO recommendations VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                if checkpoint is not None:
+                    job, last_user_id, users_done = checkpoint
+                    conn.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, 0, ?)',
+                                 (job, str(last_user_id), users_done, now))
+
+    def checkpoint(self, job):
+        """(last_user_id, users_done, finished) of a job, or (None, 0, False)"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT last_user_id, users_done, finished FROM checkpoints WHERE job = ?', (job,)).fetchone()
+        if row is None:
+            return None, 0, False
+        return row[0], row[1], bool(row[2])
+
+    def finish(self, job, users_done):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('UPDATE checkpoints SET finished = 1, users_done = ?, updated_at = ? WHERE job = ?',
+                             (users_done, self._clock(), job))
+                if conn.execute('SELECT changes()').fetchone()[0] == 0:
+                    conn.execute('INSERT INTO checkpoints VALUES (?, NULL, ?, 1, ?)', (job, users_done, self._clock()))
+
+    def reset_job(self, job):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM checkpoints WHERE job = ?', (job,))
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+        }
+
+
+def open_store():
+    """RecommendationStore at PRECOMPUTED_STORE_PATH, or None when it is not configured"""
+    if not PRECOMPUTED_STORE_PATH:
+        return None
+    try:
+        store = RecommendationStore(PRECOMPUTED_STORE_PATH)
+        store._connection()
+    except Exception as e:
+        print(f"⚠️ Precomputed recommendation store disabled: {e}")
+        return None
+    print(f"✓ Precomputed recommendation store: {PRECOMPUTED_STORE_PATH}")
+    return store
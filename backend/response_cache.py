@@ -0,0 +1,144 @@
+"""
+Cache of /api/recommend responses
+
+Entries are keyed by a canonical hash of the normalized request (user,
+cuisines, max cooking time, search terms, top_k) plus a fingerprint of the
+user's profile row. Each entry is valid for one model and one catalog
+version: when either changes, the whole cache is dropped. Profile edits and
+like/dislike calls drop the user's entries through invalidate_user(). The
+profile fingerprint also catches edits made through another worker
+process. Entries expire after a TTL and are evicted least recently used
+first.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Cached responses kept (0 disables the cache) and their lifetime in seconds
+RESPONSE_CACHE_SIZE = int(os.getenv('RECOMMEND_CACHE_SIZE', 1024))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RECOMMEND_CACHE_TTL_SECONDS', 300))
+
+
+def _digest(value):
+    """Stable SHA-256 of a JSON-serializable value (sets must be sorted first)"""
+    payload = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def profile_fingerprint(user):
+    """Hash of the profile fields a recommendation depends on"""
+    return _digest({
+        'allergies': sorted(str(a).lower().strip() for a in user.get('allergies') or []),
+        'disliked': sorted(str(d).lower().strip() for d in user.get('disliked_ingredients') or []),
+        'diet': user.get('diet', 'regular'),
+        'updated_at': user.get('updated_at'),
+    })
+
+
+def request_key(user_id, profile_version, cuisines, max_cooking_time, search_ingredients, top_k, **extra):
+    """Canonical cache key of a normalized recommendation request"""
+    return _digest({
+        'user_id': str(user_id),
+        'profile': profile_version,
+        'cuisines': sorted(cuisines),
+        'max_cooking_time': max_cooking_time,
+        'search': sorted(search_ingredients),
+        'top_k': top_k,
+        **extra,
+    })
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL cache of recommendation response payloads"""
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (expires_at, user_id, payload)
+        self._user_keys = {}            # user_id -> set of keys
+        self._model = None
+        self._catalog_version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _use_versions(self, model, catalog_version):
+        """Drop everything when the model or the catalog changed"""
+        if model is not self._model or catalog_version != self._catalog_version:
+            if self._entries:
+                self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._user_keys.clear()
+            self._model = model
+            self._catalog_version = catalog_version
+
+    def _remove(self, key):
+        _, user_id, _ = self._entries.pop(key)
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    def get(self, key, model, catalog_version):
+        """Cached payload for key, or None"""
+        with self._lock:
+            self._use_versions(model, catalog_version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, user_id, payload, model, catalog_version):
+        """Store a response payload computed with the given model and catalog version"""
+        if self.max_size <= 0:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            self._use_versions(model, catalog_version)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + self.ttl, user_id, payload)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        """Drop every cached response for one user (profile or feedback changed)"""
+        with self._lock:
+            keys = self._user_keys.pop(str(user_id), set())
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,79 @@
+"""
+First stage of the two-stage recommendation pipeline
+
+The hard filters can leave most of the catalog as candidates. When
+RECOMMEND_SHORTLIST_SIZE is set, a cheap vectorized prior ranks all of them
+and only the best M go on to feature computation and the ML model (the
+second stage). The prior is built from the parts of the final score that
+need no model:
+- the ingredient, cook-time and cuisine boosts
+- a small term for the recipe's rating
+- a small penalty for the distance from the user's max cooking time
+
+benchmarks/bench_two_stage.py measures how much of the full-scoring top-K
+the shortlist keeps (recall@K).
+
+The same prior orders deadline-bound scoring (see parallel_scoring.py). There,
+heuristic_scores stands in for the model on candidates that were not scored.
+"""
+import os
+import numpy as np
+
+from scoring import select_top_k, INGREDIENT_MATCH_BOOST, COOK_TIME_BOOSTS, CUISINE_MATCH_BOOST
+
+# Candidates kept by the first stage (0 scores every filtered recipe)
+RECOMMEND_SHORTLIST_SIZE = int(os.getenv('RECOMMEND_SHORTLIST_SIZE', 0))
+
+# Prior terms besides the boosts
+PRIOR_RATING_WEIGHT = 0.02       # per rating star (missing ratings count as 4.0)
+PRIOR_TIME_PENALTY = 0.001       # per minute away from the user's maximum
+
+# Heuristic base score, used in place of the model's for candidates it did
+# not score (deadline reached, model missing or failing)
+HEURISTIC_OVERLAP_WEIGHT = 0.4   # times the usable-ingredient ratio
+HEURISTIC_RATING_WEIGHT = 0.02   # per rating star
+
+
+def prior_scores(catalog, rows, match_counts, time_diffs, cuisine_matches):
+    """Cheap first-stage score of each candidate row (higher is better)"""
+    # The boosts of apply_boosts, without its 1.0 cap so the prior keeps ranking above it
+    time_diffs = np.asarray(time_diffs, dtype=np.float64)
+    prior = np.asarray(match_counts, dtype=np.float64) * INGREDIENT_MATCH_BOOST
+    prior += np.select([time_diffs <= minutes for minutes, _ in COOK_TIME_BOOSTS],
+                       [boost for _, boost in COOK_TIME_BOOSTS], default=0.0)
+    prior += np.where(cuisine_matches, CUISINE_MATCH_BOOST, 0.0)
+
+    ratings = catalog.rating[np.asarray(rows, dtype=np.int64)]
+    ratings = np.where(np.isnan(ratings), 4.0, ratings)
+    return prior + PRIOR_RATING_WEIGHT * ratings - PRIOR_TIME_PENALTY * time_diffs
+
+
+def heuristic_scores(catalog, rows, features):
+    """Model-free base score of each candidate from its overlap ratio and rating (0 to 0.5)"""
+    ratings = catalog.rating[np.asarray(rows, dtype=np.int64)]
+    ratings = np.where(np.isnan(ratings), 4.0, ratings)
+    overlap = np.asarray(features, dtype=np.float64)[:, 3] if len(rows) else np.zeros(0)
+    return HEURISTIC_OVERLAP_WEIGHT * overlap + HEURISTIC_RATING_WEIGHT * ratings
+
+
+def shortlist(catalog, rows, match_counts, time_diffs, cuisine_matches, size=None):
+    """
+    Positions (into rows) of the `size` best candidates by prior, in row order
+
+    Returns all positions when size is 0 or not smaller than len(rows).
+    Keeping row order means ties in the second stage break exactly as they
+    would without a shortlist.
+    """
+    size = RECOMMEND_SHORTLIST_SIZE if size is None else size
+    if size <= 0 or size >= len(rows):
+        return np.arange(len(rows))
+    prior = prior_scores(catalog, rows, match_counts, time_diffs, cuisine_matches)
+    return np.sort(select_top_k(prior, size))
+
+
+def recall_at_k(reference, candidate):
+    """Fraction of the reference top-K (e.g. full scoring) also present in candidate"""
+    reference = set(np.asarray(reference).tolist())
+    if not reference:
+        return 1.0
+    return len(reference & set(np.asarray(candidate).tolist())) / len(reference)
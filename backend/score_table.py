@@ -0,0 +1,212 @@
+"""
+Precomputed model scores over the discretized feature space
+
+Four of the five model inputs take few distinct values: max_cooking_time and
+recipe_cook_time are whole minutes, cook_time_diff follows from them and
+cuisine_similarity is 0 or 1. The fifth, ingredient_overlap_ratio, is
+usable / total ingredients, so it can only be a fraction k/n. The overlap
+axis is quantized to every such fraction with n up to `max_ingredients`.
+
+Rounding to a uniform step would not work for a tree model: one split
+between a value and its grid point shifts the score by the full leaf
+difference. With the fractions above, every looked-up row is exactly a grid
+point. The error is measured on sampled rows at build time, so it is
+reported and checked against the bound. Anything else is scored by the
+model: fractional or out-of-range times, or recipes with more than
+max_ingredients ingredients.
+
+When a model loads, ScoreTable.build evaluates it once over the whole grid
+and candidates are then scored with an index lookup.
+"""
+import os
+import time
+import numpy as np
+
+from model_loader import FEATURE_COLUMNS
+from scoring import predict_scores, predict_scores_cached
+
+# Overlap ratio grid: all k/n for recipes with up to this many ingredients
+# (0 disables the table)
+SCORE_TABLE_MAX_INGREDIENTS = int(os.getenv('ML_SCORE_TABLE_MAX_INGREDIENTS', 0))
+# Grid of user max cooking times (the frontend slider is 15..180 by 15)
+SCORE_TABLE_MIN_TIME = int(os.getenv('ML_SCORE_TABLE_MIN_TIME', 15))
+SCORE_TABLE_MAX_TIME = int(os.getenv('ML_SCORE_TABLE_MAX_TIME', 180))
+SCORE_TABLE_TIME_STEP = int(os.getenv('ML_SCORE_TABLE_TIME_STEP', 15))
+# Recipe cook times covered, in whole minutes from 0
+SCORE_TABLE_MAX_COOK_TIME = int(os.getenv('ML_SCORE_TABLE_MAX_COOK_TIME', 240))
+# Largest quantization error accepted, measured on sampled rows
+SCORE_TABLE_MAX_ERROR = float(os.getenv('ML_SCORE_TABLE_MAX_ERROR', 0.01))
+SCORE_TABLE_CHECK_ROWS = 20000
+
+# Rows per predict call while filling the table
+BUILD_BATCH_SIZE = 65536
+
+
+class ScoreTable:
+    """Dense (max_time, cook_time, overlap, cuisine) -> score array for one model"""
+
+    def __init__(self, model, scores, max_times, max_ingredients, max_cook_time):
+        self.model = model
+        self.scores = scores
+        self.max_times = np.asarray(max_times, dtype=np.float64)
+        self.max_ingredients = max_ingredients
+        self.overlaps = overlap_values(max_ingredients)
+        self.max_cook_time = max_cook_time
+        self.max_error = None
+        self.mean_error = None
+        self.build_seconds = None
+
+    @classmethod
+    def build(cls, model, max_ingredients=None, max_times=None, max_cook_time=None, max_error=None,
+              check_rows=SCORE_TABLE_CHECK_ROWS, seed=0):
+        """
+        Evaluate the model over the full grid
+
+        Raises:
+            ValueError: a grid row could not be scored, or the measured
+                quantization error is above max_error
+        """
+        started = time.time()
+        max_ingredients = SCORE_TABLE_MAX_INGREDIENTS if max_ingredients is None else max_ingredients
+        if max_times is None:
+            max_times = np.arange(SCORE_TABLE_MIN_TIME, SCORE_TABLE_MAX_TIME + 1, SCORE_TABLE_TIME_STEP)
+        max_cook_time = SCORE_TABLE_MAX_COOK_TIME if max_cook_time is None else max_cook_time
+        max_error = SCORE_TABLE_MAX_ERROR if max_error is None else max_error
+        if max_ingredients <= 0:
+            raise ValueError("max_ingredients must be positive")
+
+        grid = np.meshgrid(np.asarray(max_times, dtype=np.float64),
+                           np.arange(max_cook_time + 1, dtype=np.float64),
+                           overlap_values(max_ingredients).astype(np.float64),
+                           np.array([0.0, 1.0]), indexing='ij')
+        shape = grid[0].shape
+        matrix = _feature_rows(*(axis.reshape(-1) for axis in grid))
+
+        scores, errors = predict_scores(model, matrix, batch_size=BUILD_BATCH_SIZE)
+        if errors:
+            raise ValueError(f"{len(errors)} grid rows could not be scored, e.g. {next(iter(errors.values()))}")
+        # Model outputs are float32 (XGBoost), so float32 storage is exact
+        table = cls(model, np.array(scores, dtype=np.float32).reshape(shape), max_times,
+                    max_ingredients, max_cook_time)
+
+        table._measure_error(check_rows, seed)
+        table.build_seconds = time.time() - started
+        if table.max_error > max_error:
+            raise ValueError(f"Quantization error {table.max_error:.4g} exceeds {max_error}")
+        return table
+
+    def _measure_error(self, rows, seed):
+        """Largest and mean |table - model| on random recipes of up to max_ingredients ingredients"""
+        rng = np.random.default_rng(seed)
+        totals = rng.integers(1, self.max_ingredients + 1, rows)
+        usable = np.floor(rng.random(rows) * (totals + 1))
+        matrix = _feature_rows(rng.choice(self.max_times, rows),
+                               rng.integers(0, self.max_cook_time + 1, rows).astype(np.float64),
+                               usable / totals,
+                               rng.integers(0, 2, rows).astype(np.float64))
+        expected, _ = predict_scores(self.model, matrix, batch_size=BUILD_BATCH_SIZE)
+        expected = np.array([np.nan if score is None else score for score in expected])
+        looked_up, in_grid = self.lookup(matrix)
+        ok = in_grid & ~np.isnan(expected)
+        diff = np.abs(looked_up[ok] - expected[ok])
+        self.max_error = float(diff.max()) if len(diff) else 0.0
+        self.mean_error = float(diff.mean()) if len(diff) else 0.0
+
+    def lookup(self, features):
+        """
+        Table scores for a feature matrix
+
+        Returns:
+            (scores, in_grid): float64 scores (NaN off the grid) and the mask
+            of rows that were looked up
+        """
+        features = np.asarray(features, dtype=np.float32)
+        # Overlap is matched exactly against the float32 grid values
+        overlap = features[:, 3]
+        overlap_index = np.minimum(np.searchsorted(self.overlaps, overlap), len(self.overlaps) - 1)
+        max_time, cook_time, diff, _, cuisine = features.astype(np.float64).T
+
+        time_index = np.searchsorted(self.max_times, max_time)
+        time_index = np.minimum(time_index, len(self.max_times) - 1)
+        in_grid = self.max_times[time_index] == max_time
+        in_grid &= (cook_time == np.round(cook_time)) & (cook_time >= 0) & (cook_time <= self.max_cook_time)
+        in_grid &= diff == np.abs(cook_time - max_time)
+        in_grid &= self.overlaps[overlap_index] == overlap
+        in_grid &= (cuisine == 0) | (cuisine == 1)
+
+        scores = np.full(len(features), np.nan)
+        rows = np.flatnonzero(in_grid)
+        if len(rows):
+            scores[rows] = self.scores[
+                time_index[rows],
+                cook_time[rows].astype(np.int64),
+                overlap_index[rows],
+                cuisine[rows].astype(np.int64),
+            ]
+        return scores, in_grid
+
+    def stats(self):
+        return {
+            'cells': int(self.scores.size),
+            'max_ingredients': self.max_ingredients,
+            'max_error': self.max_error,
+            'mean_error': self.mean_error,
+            'build_seconds': round(self.build_seconds, 3) if self.build_seconds else None,
+        }
+
+
+def overlap_values(max_ingredients):
+    """Sorted distinct float32 values of k/n for 0 <= k <= n <= max_ingredients"""
+    fractions = [k / n for n in range(1, max_ingredients + 1) for k in range(n + 1)]
+    return np.unique(np.array(fractions, dtype=np.float32))
+
+
+def _feature_rows(max_time, cook_time, overlap, cuisine):
+    """float32 feature matrix in FEATURE_COLUMNS order from per-feature arrays"""
+    matrix = np.empty((len(max_time), len(FEATURE_COLUMNS)), dtype=np.float32)
+    matrix[:, 0] = max_time
+    matrix[:, 1] = cook_time
+    matrix[:, 2] = np.abs(cook_time - max_time)
+    matrix[:, 3] = overlap
+    matrix[:, 4] = cuisine
+    return matrix
+
+
+def build_score_table(model):
+    """ScoreTable for the model when ML_SCORE_TABLE_MAX_INGREDIENTS is set, else None"""
+    if model is None or SCORE_TABLE_MAX_INGREDIENTS <= 0:
+        return None
+    try:
+        table = ScoreTable.build(model)
+    except Exception as e:
+        print(f"⚠️ Score lookup table disabled: {e}")
+        return None
+    print(f"✓ Score lookup table built: {table.scores.size} cells in {table.build_seconds:.2f}s, "
+          f"max quantization error {table.max_error:.2e} (mean {table.mean_error:.2e})")
+    return table
+
+
+def score_candidates(model, features, table=None):
+    """
+    Base scores for a candidate feature matrix
+
+    Rows on the table's grid are looked up; the rest (and every row when
+    there is no table for this model) go through predict_scores_cached.
+
+    Returns:
+        (scores, errors) like predict_scores
+    """
+    if table is None or table.model is not model:
+        return predict_scores_cached(model, features)
+
+    looked_up, in_grid = table.lookup(features)
+    scores = looked_up.tolist()
+    errors = {}
+    off_grid = np.flatnonzero(~in_grid)
+    if len(off_grid):
+        model_scores, model_errors = predict_scores_cached(model, np.asarray(features)[off_grid])
+        for position, row in enumerate(off_grid.tolist()):
+            scores[row] = model_scores[position]
+            if position in model_errors:
+                errors[row] = model_errors[position]
+    return scores, errors
@@ -0,0 +1,315 @@
+"""
+Batched ML scoring helpers for the recommendation endpoint
+"""
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from model_loader import FEATURE_COLUMNS, MatrixScorer
+from recipe_catalog import normalize_ingredients
+
+# Number of candidate rows sent to the model in a single predict call
+PREDICT_BATCH_SIZE = int(os.getenv('ML_PREDICT_BATCH_SIZE', 512))
+
+# Single-row retries of a failed chunk that must also fail before the model
+# itself is considered broken and the remaining rows are not sent to it
+PREDICT_PROBE_ROWS = int(os.getenv('ML_PREDICT_PROBE_ROWS', 2))
+
+# Predictions remembered per exact feature row (0 disables the cache)
+PREDICTION_CACHE_SIZE = int(os.getenv('ML_PREDICTION_CACHE_SIZE', 100000))
+
+# Recipes returned by /api/recommend when the request does not set top_k,
+# and the largest top_k a request may ask for
+DEFAULT_TOP_K = int(os.getenv('RECOMMEND_DEFAULT_TOP_K', 50))
+MAX_TOP_K = int(os.getenv('RECOMMEND_MAX_TOP_K', 500))
+
+# Boosts added to the base model score (see apply_boosts)
+INGREDIENT_MATCH_BOOST = 0.2   # per searched ingredient found in the recipe
+COOK_TIME_BOOSTS = ((5, 0.15), (15, 0.10), (30, 0.05))   # (max minutes off, boost)
+CUISINE_MATCH_BOOST = 0.1
+
+
+def compute_features_matrix(user_prefs, catalog, rows):
+    """
+    Vectorized compute_recipe_features over many catalog rows
+
+    The user's preferences are resolved once, then every feature is computed
+    from the catalog's column arrays. Each row of the result is exactly
+    the scalar function's output cast to float32.
+
+    Args:
+        user_prefs: dict with user preferences
+        catalog: CatalogSnapshot holding the recipes
+        rows: catalog row indices of the candidates
+
+    Returns:
+        (len(rows), 5) float32 matrix in FEATURE_COLUMNS order
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+
+    # Feature 1: User preference - max cooking time
+    max_cooking_time = np.float64(user_prefs.get('max_cooking_time', 60))
+
+    # Feature 2: Recipe attribute - cook time (30 when missing)
+    recipe_cook_time = catalog.cook_time_minutes[rows]
+    recipe_cook_time = np.where(np.isnan(recipe_cook_time), 30.0, recipe_cook_time)
+
+    # Feature 3: Difference in cooking time
+    cook_time_diff = np.abs(recipe_cook_time - max_cooking_time)
+
+    # Feature 4: Ingredient overlap ratio (usable / total ingredients)
+    blocked = (normalize_ingredients(user_prefs.get('allergies', [])) |
+               normalize_ingredients(user_prefs.get('disliked_ingredients', [])))
+    totals = catalog.ingredient_counts[rows]
+    usable = totals - catalog.count_ingredients(catalog.lookup_ingredient_ids(blocked), rows)
+    ingredient_overlap_ratio = np.divide(usable, totals, out=np.zeros(len(rows)), where=totals > 0)
+
+    # Feature 5: Cuisine similarity (1.0 if the recipe cuisine is preferred)
+    user_cuisines = user_prefs.get('preferred_cuisine', [])
+    if isinstance(user_cuisines, str):
+        user_cuisines = [user_cuisines]
+    user_cuisines = set([c.lower().strip() for c in user_cuisines])
+    cuisine_similarity = catalog.cuisine_mask(user_cuisines)[rows]
+
+    matrix = np.empty((len(rows), len(FEATURE_COLUMNS)), dtype=np.float32)
+    matrix[:, 0] = max_cooking_time
+    matrix[:, 1] = recipe_cook_time
+    matrix[:, 2] = cook_time_diff
+    matrix[:, 3] = ingredient_overlap_ratio
+    matrix[:, 4] = cuisine_similarity
+    return matrix
+
+
+def model_input_dtypes(model):
+    """Column -> dtype from the model's input signature, or None if it has none"""
+    try:
+        schema = model.metadata.get_input_schema()
+        dtypes = dict(zip(schema.input_names(), schema.numpy_types()))
+    except Exception:
+        return None
+    return {c: dtypes[c] for c in FEATURE_COLUMNS if c in dtypes} or None
+
+
+def _features_frame(rows, dtypes):
+    """DataFrame for model.predict from feature dicts or a feature matrix"""
+    frame = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    # float32 matrices are cast so pyfunc schema enforcement accepts them
+    return frame.astype(dtypes) if dtypes else frame
+
+
+def _model_input(model, rows, dtypes):
+    """What model.predict takes: a float32 matrix for MatrixScorers, else a DataFrame"""
+    if isinstance(model, MatrixScorer):
+        return model.as_matrix(rows)
+    return _features_frame(rows, dtypes)
+
+
+class PredictionCache:
+    """
+    Bounded LRU of model scores keyed by the exact float32 feature row
+
+    The cache belongs to one model: looking it up with a different model
+    object (e.g. after a reload) clears it first.
+    """
+
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._model = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _use_model(self, model):
+        if model is not self._model:
+            self._entries.clear()
+            self._model = model
+
+    def get_many(self, model, keys):
+        """Cached score (or None) for each key, marking hits as recently used"""
+        with self._lock:
+            self._use_model(model)
+            found = []
+            for key in keys:
+                score = self._entries.get(key)
+                if score is not None:
+                    self._entries.move_to_end(key)
+                found.append(score)
+            hit_count = sum(score is not None for score in found)
+            self.hits += hit_count
+            self.misses += len(found) - hit_count
+            return found
+
+    def put_many(self, model, items):
+        """Store (key, score) pairs, evicting the least recently used"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._use_model(model)
+            for key, score in items:
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'size': len(self._entries), 'max_size': self.max_size,
+                'hits': self.hits, 'misses': self.misses}
+
+
+prediction_cache = PredictionCache()
+
+
+def predict_scores_cached(model, features, cache=None, batch_size=None):
+    """
+    predict_scores for a feature matrix, scoring each distinct row once
+
+    Identical rows are collapsed with np.unique, rows already in the cache
+    are not sent to the model, and the scores are scattered back to every
+    original row. Failed predictions are not cached.
+
+    Returns:
+        (scores, errors) exactly like predict_scores
+    """
+    cache = prediction_cache if cache is None else cache
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    if len(features) == 0:
+        return [], {}
+
+    unique_rows, inverse = np.unique(features, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    keys = [row.tobytes() for row in unique_rows]
+    unique_scores = cache.get_many(model, keys)
+
+    missing = [i for i, score in enumerate(unique_scores) if score is None]
+    unique_errors = {}
+    if missing:
+        new_scores, new_errors = predict_scores(model, unique_rows[missing], batch_size)
+        for position, unique_index in enumerate(missing):
+            unique_scores[unique_index] = new_scores[position]
+            if position in new_errors:
+                unique_errors[unique_index] = new_errors[position]
+        cache.put_many(model, [(keys[i], unique_scores[i]) for i in missing
+                               if unique_scores[i] is not None])
+
+    scores = [unique_scores[i] for i in inverse.tolist()]
+    errors = {row: unique_errors[i] for row, i in enumerate(inverse.tolist()) if i in unique_errors}
+    return scores, errors
+
+
+class ModelFailure(RuntimeError):
+    """The model failed on a whole chunk and on its first single-row retries"""
+
+
+def predict_scores(model, feature_rows, batch_size=None):
+    """
+    Score feature rows with one model.predict call per chunk
+
+    Args:
+        model: loaded model exposing predict(DataFrame), or a MatrixScorer
+        feature_rows: list of feature dicts (see compute_recipe_features) or
+            an (n, 5) matrix from compute_features_matrix
+        batch_size: rows per predict call (defaults to PREDICT_BATCH_SIZE)
+
+    Returns:
+        (scores, errors): scores is a list aligned with feature_rows holding a
+        float, or None when that row could not be scored; errors maps the
+        index of every failed row to its exception. When a failed chunk's
+        first PREDICT_PROBE_ROWS single-row retries fail too, every row not
+        yet scored maps to one shared ModelFailure.
+    """
+    batch_size = max(1, int(batch_size or PREDICT_BATCH_SIZE))
+    dtypes = None if isinstance(model, MatrixScorer) else model_input_dtypes(model)
+    scores = [None] * len(feature_rows)
+    errors = {}
+
+    for start in range(0, len(feature_rows), batch_size):
+        chunk = feature_rows[start:start + batch_size]
+        try:
+            predictions = model.predict(_model_input(model, chunk, dtypes))
+            if len(predictions) != len(chunk):
+                raise ValueError(
+                    f"model returned {len(predictions)} predictions for {len(chunk)} rows"
+                )
+            for offset, prediction in enumerate(predictions):
+                scores[start + offset] = float(prediction)
+        except Exception as chunk_error:
+            print(f"Batch prediction failed for rows {start}-{start + len(chunk) - 1}, "
+                  f"falling back to per-row scoring: {chunk_error}")
+            # Isolate the bad rows: only this chunk is re-scored one row at a time
+            probe = min(PREDICT_PROBE_ROWS, len(chunk))
+            for offset in range(len(chunk)):
+                try:
+                    row_input = _model_input(model, chunk[offset:offset + 1], dtypes)
+                    scores[start + offset] = float(model.predict(row_input)[0])
+                except Exception as row_error:
+                    errors[start + offset] = row_error
+                # A lone failing row is just a bad row, not evidence of a broken model
+                if len(chunk) > 1 and offset == probe - 1 and all(start + i in errors for i in range(probe)):
+                    failure = ModelFailure(f"model failed on rows {start}-{start + len(chunk) - 1} and on "
+                                           f"{probe} single-row retries: {chunk_error}")
+                    print(f"✗ {failure}; not scoring the remaining {len(feature_rows) - start - probe} rows")
+                    for row in range(start + probe, len(feature_rows)):
+                        errors[row] = failure
+                    return scores, errors
+
+    return scores, errors
+
+
+def apply_boosts(base_scores, match_counts, time_diffs, cuisine_matches):
+    """
+    Add the recommendation boosts to a batch of base model scores
+
+    Same rules as applying them one recipe at a time: 0.2 per matching search
+    ingredient, 0.15 / 0.10 / 0.05 when the cook time is within 5 / 15 / 30
+    minutes of the user's maximum, 0.1 for a requested cuisine, then a cap
+    at 1.0. The additions happen in the same order, so results are identical.
+
+    Returns:
+        (final_scores, ingredient_boosts) as float64 arrays
+    """
+    time_diffs = np.asarray(time_diffs, dtype=np.float64)
+
+    ingredient_boosts = np.asarray(match_counts) * INGREDIENT_MATCH_BOOST
+    boosted = np.asarray(base_scores, dtype=np.float64) + ingredient_boosts
+
+    conditions = [time_diffs <= minutes for minutes, _ in COOK_TIME_BOOSTS]
+    boosted += np.select(conditions, [boost for _, boost in COOK_TIME_BOOSTS], default=0.0)
+
+    boosted += np.where(cuisine_matches, CUISINE_MATCH_BOOST, 0.0)
+
+    # fmin (unlike minimum) ignores NaN like the builtin min(1.0, score)
+    return np.fmin(1.0, boosted), ingredient_boosts
+
+
+def select_top_k(scores, k):
+    """
+    Indices of the k highest scores, best first
+
+    Uses a partial selection (np.partition) instead of a full sort. Ties
+    keep their original order, exactly like a stable descending sort.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    k = min(max(int(k), 0), n)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if k < n:
+        # Everything strictly above the k-th best value is in; fill the rest
+        # with the earliest rows tied at that value
+        threshold = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > threshold)
+        tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+        selected = np.concatenate([above, tied])
+    else:
+        selected = np.arange(n)
+
+    order = np.lexsort((selected, -scores[selected]))
+    return selected[order]
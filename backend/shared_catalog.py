@@ -0,0 +1,155 @@
+"""
+On-disk catalog snapshots shared by every worker process
+
+Each gunicorn worker otherwise holds its own copy of the catalog arrays and
+ingredient bitmaps, and has to download and parse the recipes table before
+it can serve a request. With RECIPE_CATALOG_SHARED_DIR set, the catalog is
+kept in a directory instead:
+
+    CURRENT            version number of the live snapshot
+    v00000012/         CatalogSnapshot.save() output (.npy arrays + meta.json)
+    publish.lock       held while a snapshot is fetched and written
+    leader.lock        held by the one worker that syncs with the database
+
+Workers map the live snapshot read-only (CatalogSnapshot.load), so the
+arrays live once in the page cache whatever the worker count, and a new
+worker only reads meta.json before serving. A new version is written to a
+temporary directory and renamed into place, then CURRENT is replaced with
+os.replace. Readers therefore see either the old snapshot or the complete
+new one. Old version directories are removed once SHARED_KEEP_VERSIONS newer
+ones exist; a worker still mapping a removed one keeps reading it until it
+switches.
+
+Locks use fcntl.flock and are released by the kernel when the holder exits,
+so another worker takes over as leader. Without fcntl (Windows) the locks
+are no-ops, which is fine for a single process.
+"""
+import os
+import shutil
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from recipe_catalog import CatalogSnapshot
+
+# Directory of the shared catalog snapshot (empty keeps the catalog in each
+# process's memory)
+CATALOG_SHARED_DIR = os.getenv('RECIPE_CATALOG_SHARED_DIR', '')
+# Published versions kept on disk, including the live one
+SHARED_KEEP_VERSIONS = 3
+
+
+class SharedCatalogDir:
+    """Versioned CatalogSnapshot directories with an atomically replaced CURRENT file"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._leader_fd = None
+        self._leader_pid = None
+        self.published = 0
+
+    def _version_path(self, version):
+        return os.path.join(self.path, f"v{version:08d}")
+
+    def current(self):
+        """Version number in CURRENT, or None before the first publish"""
+        try:
+            with open(os.path.join(self.path, 'CURRENT'), encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load(self, version=None):
+        """Memory-mapped snapshot of a version (the current one by default), or None"""
+        version = self.current() if version is None else version
+        if version is None:
+            return None
+        return CatalogSnapshot.load(self._version_path(version))
+
+    @contextlib.contextmanager
+    def publish_lock(self):
+        """Exclusive lock around fetching and publishing a snapshot (blocks)"""
+        with open(os.path.join(self.path, 'publish.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def publish(self, snapshot):
+        """
+        Save snapshot as its version and make it current; call under publish_lock
+
+        Returns:
+            the published snapshot, memory-mapped from disk
+        """
+        # Leftovers of a writer that died mid-save (no other writer can be active)
+        for name in os.listdir(self.path):
+            if name.startswith('tmp-'):
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+        target = self._version_path(snapshot.version)
+        if not os.path.exists(target):
+            staging = os.path.join(self.path, f"tmp-{os.getpid()}-{snapshot.version}")
+            snapshot.save(staging)
+            os.rename(staging, target)
+        pointer = os.path.join(self.path, f"CURRENT.tmp-{os.getpid()}")
+        with open(pointer, 'w', encoding='utf-8') as f:
+            f.write(f"{snapshot.version}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(self.path, 'CURRENT'))
+        self.published += 1
+        self._remove_old_versions(snapshot.version)
+        return CatalogSnapshot.load(target)
+
+    def _remove_old_versions(self, current):
+        versions = sorted(int(name[1:]) for name in os.listdir(self.path)
+                          if name.startswith('v') and name[1:].isdigit())
+        for version in [v for v in versions if v != current][:-(SHARED_KEEP_VERSIONS - 1) or None]:
+            shutil.rmtree(self._version_path(version), ignore_errors=True)
+
+    def try_lead(self):
+        """
+        Whether this process holds the leader lock, taking it if it is free
+
+        The lock is kept until the process exits. A forked child does not
+        inherit leadership; it has to take the lock itself.
+        """
+        if self._leader_pid == os.getpid():
+            return True
+        if fcntl is None:
+            self._leader_pid = os.getpid()
+            return True
+        fd = os.open(os.path.join(self.path, 'leader.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        self._leader_pid = os.getpid()
+        return True
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'current_version': self.current(),
+            'leader': self._leader_pid == os.getpid(),
+            'published': self.published,
+        }
+
+
+def open_shared_catalog():
+    """SharedCatalogDir at RECIPE_CATALOG_SHARED_DIR, or None when it is not configured"""
+    if not CATALOG_SHARED_DIR:
+        return None
+    try:
+        shared = SharedCatalogDir(CATALOG_SHARED_DIR)
+    except OSError as e:
+        print(f"⚠️ Shared recipe catalog disabled: {e}")
+        return None
+    print(f"✓ Shared recipe catalog: {CATALOG_SHARED_DIR}")
+    return shared
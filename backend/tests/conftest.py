@@ -4,6 +4,8 @@ Shared pytest configuration and fixtures
 import pytest
 import sys
 import os
+from types import SimpleNamespace
+from unittest.mock import Mock, MagicMock, patch
 
 # Add project root to Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -115,4 +117,84 @@ def mock_env_vars(monkeypatch):
     for key, value in env_vars.items():
         monkeypatch.setenv(key, value)
     
-    return env_vars
\ No newline at end of file
+    return env_vars
+
+@pytest.fixture
+def backend_recipes():
+    """Recipe rows served by the patched_backend catalog (override in a module to change them)"""
+    return [
+        {'id': 1, 'recipe_name': 'Chicken Pasta', 'cuisine': 'Italian', 'diet': 'regular',
+         'cook_time_minutes': 30, 'rating': 4.5,
+         'ingredients_list': "['chicken breast', 'pasta', 'garlic']"},
+        {'id': 2, 'recipe_name': 'Peanut Noodles', 'cuisine': 'Thai', 'diet': 'regular',
+         'cook_time_minutes': 20, 'rating': 4.2,
+         'ingredients_list': "['noodles', 'peanuts', 'soy sauce']"},
+        {'id': 3, 'recipe_name': 'Greek Chicken', 'cuisine': 'Greek', 'diet': 'regular',
+         'cook_time_minutes': 55, 'rating': 4.8,
+         'ingredients_list': "['chicken thighs', 'lemon', 'oregano']"},
+        {'id': 4, 'recipe_name': 'Tofu Stir Fry', 'cuisine': 'Chinese', 'diet': 'vegan',
+         'cook_time_minutes': 15, 'rating': 4.0,
+         'ingredients_list': "['tofu', 'broccoli', 'soy sauce']"},
+        {'id': 5, 'recipe_name': 'Mushroom Risotto', 'cuisine': 'Italian', 'diet': 'regular',
+         'cook_time_minutes': 100, 'rating': 4.1,
+         'ingredients_list': "['rice', 'mushrooms', 'parmesan']"},
+    ]
+
+
+@pytest.fixture
+def backend_user():
+    """User profile returned by the patched_backend users query"""
+    return {
+        'id': 1,
+        'allergies': ['peanuts'],
+        'disliked_ingredients': ['mushrooms'],
+        'diet': 'regular',
+    }
+
+
+@pytest.fixture
+def backend_users(backend_user):
+    """Three users for batch and precompute tests: backend_user, one without restrictions, one vegan"""
+    return [backend_user, dict(backend_user, id=2, allergies=[], disliked_ingredients=[]),
+            dict(backend_user, id=3, diet='vegan')]
+
+
+@pytest.fixture
+def backend_store():
+    """Precomputed recommendation store of patched_backend (None scores every request live)"""
+    return None
+
+
+@pytest.fixture
+def patched_backend(backend_recipes, backend_user, backend_store):
+    """
+    Patch the app globals used by the recommendation endpoints
+
+    Supabase returns backend_user, the catalog serves backend_recipes, the
+    model scores every row 0.5, telemetry is a mock, and the response cache
+    starts empty. Override backend_recipes, backend_user or backend_store in
+    a test module to change what is served.
+
+    Yields:
+        SimpleNamespace with the patched supabase, catalog, model and store
+    """
+    import app as app_module
+    from recipe_catalog import RecipeCatalog
+    from response_cache import ResponseCache
+
+    users_table = MagicMock()
+    users_table.select.return_value.eq.return_value.execute.return_value = Mock(data=[backend_user])
+    mock_supabase = MagicMock()
+    mock_supabase.table.return_value = users_table
+
+    model = Mock()
+    model.predict = Mock(side_effect=lambda df: [0.5] * len(df))
+    catalog = RecipeCatalog(lambda: backend_recipes, refresh_seconds=0)
+
+    with patch.object(app_module, 'supabase', mock_supabase), \
+         patch.object(app_module, 'recipe_catalog', catalog), \
+         patch.object(app_module, 'ml_model', model), \
+         patch.object(app_module, 'inference_telemetry'), \
+         patch.object(app_module, 'response_cache', ResponseCache()), \
+         patch.object(app_module, 'precomputed_store', backend_store):
+        yield SimpleNamespace(supabase=mock_supabase, catalog=catalog, model=model, store=backend_store)
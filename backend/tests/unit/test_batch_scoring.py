@@ -0,0 +1,317 @@
+"""
+Unit Test: Batched Model Scoring
+Tests chunked predict calls and per-chunk error isolation with a mocked model
+"""
+import pytest
+import numpy as np
+from unittest.mock import Mock
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import (predict_scores, predict_scores_cached, PredictionCache, ModelFailure, apply_boosts,
+                     select_top_k)
+
+
+def make_rows(count):
+    """Build simple feature rows whose overlap ratio identifies the row"""
+    return [{
+        'max_cooking_time': 60,
+        'recipe_cook_time': 30,
+        'cook_time_diff': 30,
+        'ingredient_overlap_ratio': i / 100,
+        'cuisine_similarity': 1.0
+    } for i in range(count)]
+
+
+class TestPredictScores:
+    """Test suite for predict_scores"""
+
+    def test_one_predict_call_per_chunk(self):
+        """Test that rows are scored in chunks of batch_size"""
+        # Arrange
+        model = Mock()
+        model.predict = Mock(side_effect=lambda df: list(df['ingredient_overlap_ratio']))
+        rows = make_rows(10)
+
+        # Act
+        scores, errors = predict_scores(model, rows, batch_size=4)
+
+        # Assert
+        assert model.predict.call_count == 3
+        assert [len(call.args[0]) for call in model.predict.call_args_list] == [4, 4, 2]
+        assert scores == [i / 100 for i in range(10)]
+        assert errors == {}
+
+    def test_feature_column_order(self):
+        """Test that the model receives columns in training order"""
+        # Arrange
+        model = Mock()
+        model.predict = Mock(side_effect=lambda df: [0.5] * len(df))
+
+        # Act
+        predict_scores(model, make_rows(2), batch_size=8)
+
+        # Assert
+        frame = model.predict.call_args.args[0]
+        assert list(frame.columns) == [
+            'max_cooking_time', 'recipe_cook_time', 'cook_time_diff',
+            'ingredient_overlap_ratio', 'cuisine_similarity'
+        ]
+
+    def test_failed_chunk_falls_back_to_per_row(self):
+        """Test that only the failing chunk is re-scored row by row"""
+        # Arrange
+        def predict(df):
+            if len(df) > 1 and (df['ingredient_overlap_ratio'] == 0.05).any():
+                raise ValueError('bad chunk')
+            if len(df) == 1 and df['ingredient_overlap_ratio'].iloc[0] == 0.05:
+                raise ValueError('bad row')
+            return [0.9] * len(df)
+
+        model = Mock()
+        model.predict = Mock(side_effect=predict)
+
+        # Act
+        scores, errors = predict_scores(model, make_rows(8), batch_size=4)
+
+        # Assert - chunk 0..3 in one call, chunk 4..7 fails then 4 single calls
+        assert model.predict.call_count == 1 + 1 + 4
+        assert scores[:5] == [0.9] * 5
+        assert scores[5] is None
+        assert scores[6:] == [0.9, 0.9]
+        assert list(errors.keys()) == [5]
+        assert isinstance(errors[5], ValueError)
+
+    def test_broken_model_stops_after_probe_rows(self):
+        """Test that a model failing on a chunk and its first single rows is not called again"""
+        # Arrange
+        model = Mock()
+        model.predict = Mock(side_effect=ValueError('schema mismatch'))
+
+        # Act
+        scores, errors = predict_scores(model, make_rows(10), batch_size=4)
+
+        # Assert - the first chunk, then two single-row retries
+        assert model.predict.call_count == 1 + 2
+        assert scores == [None] * 10
+        assert sorted(errors) == list(range(10))
+        assert isinstance(errors[0], ValueError)
+        assert all(isinstance(errors[row], ModelFailure) for row in range(2, 10))
+
+    def test_single_row_chunks_not_probed(self):
+        """Test that with one row per call a failing row does not stop the others"""
+        # Arrange
+        model = Mock()
+        model.predict = Mock(side_effect=[ValueError('bad row'), ValueError('bad row'), [0.5], [0.6]])
+
+        # Act
+        scores, errors = predict_scores(model, make_rows(3), batch_size=1)
+
+        # Assert
+        assert scores == [None, 0.5, 0.6]
+        assert list(errors) == [0]
+
+    def test_prediction_count_mismatch_is_isolated(self):
+        """Test that a short prediction array triggers the per-row fallback"""
+        # Arrange
+        model = Mock()
+        model.predict = Mock(side_effect=lambda df: [0.4])
+
+        # Act
+        scores, errors = predict_scores(model, make_rows(3), batch_size=3)
+
+        # Assert
+        assert scores == [0.4, 0.4, 0.4]
+        assert errors == {}
+
+    def test_empty_input(self):
+        """Test that no predict call is made for an empty candidate set"""
+        # Arrange
+        model = Mock()
+
+        # Act
+        scores, errors = predict_scores(model, [])
+
+        # Assert
+        assert scores == []
+        assert errors == {}
+        model.predict.assert_not_called()
+
+
+def overlap_model():
+    """Mock model scoring each row by its overlap ratio"""
+    model = Mock()
+    model.metadata.get_input_schema.return_value = None
+    model.predict = Mock(side_effect=lambda df: list(df['ingredient_overlap_ratio']))
+    return model
+
+
+def matrix_with_duplicates():
+    """Six rows, three distinct (overlap 0.25, 0.5, 0.75)"""
+    return np.array([[60, 30, 30, overlap, 1.0] for overlap in [0.25, 0.5, 0.25, 0.75, 0.5, 0.25]],
+                    dtype=np.float32)
+
+
+class TestPredictionCache:
+    """Test suite for predict_scores_cached and PredictionCache"""
+
+    def test_duplicate_rows_scored_once(self):
+        """Test that each distinct row is predicted once and scattered back"""
+        # Arrange
+        model = overlap_model()
+
+        # Act
+        scores, errors = predict_scores_cached(model, matrix_with_duplicates(), cache=PredictionCache())
+
+        # Assert
+        assert len(model.predict.call_args.args[0]) == 3
+        assert scores == [0.25, 0.5, 0.25, 0.75, 0.5, 0.25]
+        assert errors == {}
+
+    def test_cached_rows_not_rescored(self):
+        """Test that a second request only predicts rows not seen before"""
+        # Arrange
+        model = overlap_model()
+        cache = PredictionCache()
+        predict_scores_cached(model, matrix_with_duplicates(), cache=cache)
+        second = np.array([[60, 30, 30, 0.5, 1.0], [60, 30, 30, 0.9, 1.0]], dtype=np.float32)
+
+        # Act
+        scores, _ = predict_scores_cached(model, second, cache=cache)
+
+        # Assert
+        assert model.predict.call_count == 2
+        assert model.predict.call_args.args[0]['ingredient_overlap_ratio'].tolist() == [
+            pytest.approx(0.9)
+        ]
+        assert scores == [0.5, pytest.approx(0.9)]
+        assert cache.stats()['hits'] == 1
+
+    def test_new_model_clears_cache(self):
+        """Test that switching model objects drops the cached scores"""
+        # Arrange
+        cache = PredictionCache()
+        predict_scores_cached(overlap_model(), matrix_with_duplicates(), cache=cache)
+        reloaded = Mock()
+        reloaded.metadata.get_input_schema.return_value = None
+        reloaded.predict = Mock(side_effect=lambda df: [0.1] * len(df))
+
+        # Act
+        scores, _ = predict_scores_cached(reloaded, matrix_with_duplicates(), cache=cache)
+
+        # Assert
+        assert scores == [0.1] * 6
+        assert cache.stats()['size'] == 3
+
+    def test_lru_eviction(self):
+        """Test that the least recently used rows are evicted at max_size"""
+        # Arrange
+        model = overlap_model()
+        cache = PredictionCache(max_size=2)
+
+        # Act
+        predict_scores_cached(model, matrix_with_duplicates(), cache=cache)
+
+        # Assert
+        assert cache.stats()['size'] == 2
+
+    def test_failed_rows_not_cached(self):
+        """Test that prediction errors reach every duplicate and are retried later"""
+        # Arrange
+        model = Mock()
+        model.metadata.get_input_schema.return_value = None
+        model.predict = Mock(side_effect=RuntimeError('model down'))
+        cache = PredictionCache()
+
+        # Act
+        scores, errors = predict_scores_cached(model, matrix_with_duplicates(), cache=cache)
+
+        # Assert
+        assert scores == [None] * 6
+        assert sorted(errors) == [0, 1, 2, 3, 4, 5]
+        assert cache.stats()['size'] == 0
+
+
+def reference_boost(base_score, matches, time_diff, cuisine_match):
+    """The per-recipe boosting rules as originally written in recommend()"""
+    boosted_score = base_score
+    if matches > 0:
+        boosted_score += matches * 0.2
+    if time_diff <= 5:
+        boosted_score += 0.15
+    elif time_diff <= 15:
+        boosted_score += 0.10
+    elif time_diff <= 30:
+        boosted_score += 0.05
+    if cuisine_match:
+        boosted_score += 0.1
+    return min(1.0, boosted_score)
+
+
+class TestApplyBoosts:
+    """Test suite for the vectorized boost stage"""
+
+    def test_identical_to_per_recipe_rules(self):
+        """Test that array boosts equal the scalar rules bit for bit"""
+        # Arrange
+        rng = np.random.default_rng(42)
+        n = 5000
+        base = rng.random(n)
+        matches = rng.integers(0, 4, size=n)
+        time_diffs = rng.integers(0, 60, size=n).astype(float)
+        cuisine = rng.random(n) < 0.3
+
+        # Act
+        final, ingredient_boosts = apply_boosts(base, matches, time_diffs, cuisine)
+
+        # Assert
+        expected = [reference_boost(*args) for args in zip(base.tolist(), matches.tolist(),
+                                                           time_diffs.tolist(), cuisine.tolist())]
+        assert final.tolist() == expected
+        assert ingredient_boosts.tolist() == [m * 0.2 for m in matches.tolist()]
+
+    def test_tier_boundaries(self):
+        """Test cook time tiers at their inclusive boundaries"""
+        # Act
+        final, _ = apply_boosts([0.0] * 5, [0] * 5, [5, 5.5, 15, 30, 30.5], [False] * 5)
+
+        # Assert
+        assert final.tolist() == [0.15, 0.10, 0.10, 0.05, 0.0]
+
+    def test_cap_at_one(self):
+        """Test that boosted scores are capped at 1.0"""
+        # Act
+        final, _ = apply_boosts([0.9], [3], [0], [True])
+
+        # Assert
+        assert final.tolist() == [1.0]
+
+
+class TestSelectTopK:
+    """Test suite for partial top-K selection"""
+
+    def test_matches_stable_sort(self):
+        """Test that selection equals the first k of a stable descending sort"""
+        # Arrange - few distinct values so ties are common
+        rng = np.random.default_rng(7)
+        scores = rng.integers(0, 5, size=200) / 4
+
+        for k in [1, 5, 37, 199, 200, 500]:
+            # Act
+            top = select_top_k(scores, k)
+
+            # Assert
+            expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+            assert top.tolist() == expected
+
+    def test_empty_scores(self):
+        """Test that no candidates give an empty selection"""
+        # Act & Assert
+        assert select_top_k([], 10).tolist() == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
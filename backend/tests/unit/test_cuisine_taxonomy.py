@@ -0,0 +1,67 @@
+"""
+Unit Test: Cuisine Taxonomy
+Tests umbrella category expansion and loading the taxonomy from a file
+"""
+import pytest
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cuisine_taxonomy
+from cuisine_taxonomy import CuisineTaxonomy, DEFAULT_TAXONOMY_PATH
+
+
+class TestCuisineTaxonomy:
+    """Test suite for CuisineTaxonomy"""
+
+    def test_umbrella_category_expands(self):
+        """Test that an umbrella category expands to its cuisines"""
+        # Arrange
+        taxonomy = CuisineTaxonomy.from_file(DEFAULT_TAXONOMY_PATH)
+
+        # Act
+        expanded = taxonomy.expand({'mediterranean'})
+
+        # Assert
+        assert expanded == {'greek', 'moroccan', 'spanish', 'middle eastern', 'turkish', 'lebanese'}
+
+    def test_plain_cuisine_kept(self):
+        """Test that a non-category preference is kept as-is (normalized)"""
+        # Arrange
+        taxonomy = CuisineTaxonomy({'asian': ['Chinese', 'Thai']})
+
+        # Act
+        expanded = taxonomy.expand([' Italian', 'ASIAN'])
+
+        # Assert
+        assert expanded == {'italian', 'chinese', 'thai'}
+
+    def test_empty_preferences(self):
+        """Test that no preference means no cuisine filter"""
+        # Arrange
+        taxonomy = CuisineTaxonomy({'asian': ['chinese']})
+
+        # Act & Assert
+        assert taxonomy.expand([]) == set()
+
+    def test_taxonomy_path_from_env(self, tmp_path, monkeypatch):
+        """Test that CUISINE_TAXONOMY_PATH selects the taxonomy file"""
+        # Arrange
+        path = tmp_path / 'taxonomy.json'
+        path.write_text(json.dumps({'nordic': ['swedish', 'danish']}))
+        monkeypatch.setenv('CUISINE_TAXONOMY_PATH', str(path))
+        monkeypatch.setattr(cuisine_taxonomy, '_taxonomy', None)
+
+        # Act
+        taxonomy = cuisine_taxonomy.get_taxonomy()
+
+        # Assert
+        assert taxonomy.expand(['nordic']) == {'swedish', 'danish'}
+        assert cuisine_taxonomy.get_taxonomy() is taxonomy
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
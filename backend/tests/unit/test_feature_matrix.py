@@ -0,0 +1,134 @@
+"""
+Unit Test: Vectorized Feature Computation
+Cross-checks compute_features_matrix against the scalar compute_recipe_features
+"""
+import pytest
+import random
+import numpy as np
+import pandas as pd
+from unittest.mock import Mock
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import compute_recipe_features
+from model_loader import FEATURE_COLUMNS
+from recipe_catalog import CatalogSnapshot
+from scoring import compute_features_matrix, predict_scores
+
+INGREDIENTS = ['Chicken', 'garlic', 'Peanuts', 'rice', 'soy sauce', 'Basil ', 'tofu', 'milk']
+CUISINES = ['Italian', 'greek', 'Thai', ' Chinese', None, 'Mexican']
+
+
+def random_recipes(count, seed):
+    """Random recipes, including missing cook times and empty ingredient lists"""
+    rng = random.Random(seed)
+    recipes = []
+    for i in range(count):
+        ingredients = rng.sample(INGREDIENTS, rng.randint(0, 5))
+        recipes.append({
+            'id': i + 1,
+            'cuisine': rng.choice(CUISINES),
+            'cook_time_minutes': rng.choice([None, 5, 15, 30, 45, 60, 90, 120]),
+            'ingredients_list': str(ingredients) if rng.random() < 0.5 else ingredients,
+        })
+    return recipes
+
+
+def scalar_matrix(user_prefs, recipes):
+    rows = [compute_recipe_features(user_prefs, recipe) for recipe in recipes]
+    return np.array([[row[c] for c in FEATURE_COLUMNS] for row in rows], dtype=np.float32)
+
+
+class TestComputeFeaturesMatrix:
+    """Test suite for compute_features_matrix"""
+
+    @pytest.mark.parametrize('user_prefs', [
+        {'max_cooking_time': 30, 'allergies': ['peanuts'], 'disliked_ingredients': ['Milk'],
+         'preferred_cuisine': ['italian', 'THAI']},
+        {'max_cooking_time': 45.5, 'allergies': [], 'disliked_ingredients': [],
+         'preferred_cuisine': 'Chinese'},
+        {'allergies': ['chicken', 'garlic', 'rice'], 'preferred_cuisine': []},
+        {},
+    ])
+    def test_exactly_equals_scalar(self, user_prefs):
+        """Test that every row equals the scalar features cast to float32"""
+        # Arrange
+        recipes = random_recipes(300, seed=11)
+        snapshot = CatalogSnapshot(recipes)
+
+        # Act
+        matrix = compute_features_matrix(user_prefs, snapshot, np.arange(len(recipes)))
+
+        # Assert
+        assert matrix.dtype == np.float32
+        assert matrix.shape == (300, 5)
+        np.testing.assert_array_equal(matrix, scalar_matrix(user_prefs, recipes))
+
+    def test_row_subset_order(self):
+        """Test that output rows follow the requested row order"""
+        # Arrange
+        recipes = random_recipes(50, seed=3)
+        snapshot = CatalogSnapshot(recipes)
+        prefs = {'max_cooking_time': 20, 'allergies': ['tofu']}
+        rows = [40, 2, 17]
+
+        # Act
+        matrix = compute_features_matrix(prefs, snapshot, rows)
+
+        # Assert
+        np.testing.assert_array_equal(matrix, scalar_matrix(prefs, [recipes[r] for r in rows]))
+
+    def test_empty_rows(self):
+        """Test an empty candidate set"""
+        # Arrange
+        snapshot = CatalogSnapshot(random_recipes(5, seed=1))
+
+        # Act & Assert
+        assert compute_features_matrix({}, snapshot, []).shape == (0, 5)
+
+
+class TestModelInputFrame:
+    """Test suite for feeding the feature matrix to the model"""
+
+    def test_matrix_cast_to_signature_types(self):
+        """Test that columns are cast to the dtypes of the model signature"""
+        # Arrange
+        model = Mock()
+        model.metadata.get_input_schema.return_value.input_names.return_value = FEATURE_COLUMNS
+        model.metadata.get_input_schema.return_value.numpy_types.return_value = [
+            np.dtype('int64'), np.dtype('int64'), np.dtype('int64'),
+            np.dtype('float64'), np.dtype('float64')
+        ]
+        model.predict = Mock(side_effect=lambda df: [0.5] * len(df))
+        matrix = np.array([[60, 30, 30, 0.5, 1.0]], dtype=np.float32)
+
+        # Act
+        predict_scores(model, matrix)
+
+        # Assert
+        frame = model.predict.call_args.args[0]
+        assert isinstance(frame, pd.DataFrame)
+        assert list(frame.dtypes.astype(str)) == ['int64', 'int64', 'int64', 'float64', 'float64']
+        assert frame.iloc[0].tolist() == [60, 30, 30, 0.5, 1.0]
+
+    def test_matrix_without_signature(self):
+        """Test that a model without a signature receives the float32 matrix as-is"""
+        # Arrange
+        model = Mock()
+        model.metadata.get_input_schema.return_value = None
+        model.predict = Mock(side_effect=lambda df: [0.5] * len(df))
+        matrix = np.zeros((3, 5), dtype=np.float32)
+
+        # Act
+        scores, _ = predict_scores(model, matrix)
+
+        # Assert
+        assert scores == [0.5, 0.5, 0.5]
+        assert list(model.predict.call_args.args[0].columns) == FEATURE_COLUMNS
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
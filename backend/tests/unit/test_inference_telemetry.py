@@ -0,0 +1,270 @@
+"""
+Unit Test: Inference Telemetry
+Tests the bounded queue and batched MLflow writes with a mocked MlflowClient
+"""
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_telemetry import InferenceTelemetry, summarize_inference
+
+
+@pytest.fixture
+def mlflow_client():
+    """Mock MlflowClient with an existing experiment"""
+    client = Mock()
+    client.get_experiment_by_name.return_value = Mock(experiment_id='7')
+    client.create_run.return_value = Mock(info=Mock(run_id='run-1'))
+    return client
+
+
+def make_telemetry(client, **kwargs):
+    telemetry = InferenceTelemetry('test-experiment', client_factory=lambda: client, **kwargs)
+    # Keep the writer thread out of the tests; flush() is called directly
+    telemetry._ensure_writer = Mock()
+    return telemetry
+
+
+class TestInferenceTelemetry:
+    """Test suite for InferenceTelemetry"""
+
+    def test_record_does_not_touch_mlflow(self, mlflow_client):
+        """Test that recording only queues the event"""
+        # Arrange
+        telemetry = make_telemetry(mlflow_client)
+
+        # Act
+        queued = telemetry.record('user_1_inference', {'user_id': 1}, {'top_score': 0.9})
+
+        # Assert
+        assert queued is True
+        assert telemetry.stats()['queued'] == 1
+        mlflow_client.create_run.assert_not_called()
+
+    def test_full_queue_drops_and_counts(self, mlflow_client):
+        """Test that events beyond the queue size are dropped, not blocked on"""
+        # Arrange
+        telemetry = make_telemetry(mlflow_client, queue_size=2)
+
+        # Act
+        results = [telemetry.record(f'run_{i}') for i in range(5)]
+
+        # Assert
+        assert results == [True, True, False, False, False]
+        assert telemetry.stats()['dropped'] == 3
+        assert telemetry.stats()['queued'] == 2
+
+    def test_flush_writes_one_run_per_event(self, mlflow_client):
+        """Test that flush logs params and metrics with log_batch and ends each run"""
+        # Arrange
+        telemetry = make_telemetry(mlflow_client)
+        telemetry.record('user_1_inference', {'user_id': 1, 'num_candidates': 3},
+                         {'recipe_3_final_score': 0.65, 'top_score': 0.65})
+        telemetry.record('user_2_inference', {'user_id': 2}, {'top_score': 0.5})
+
+        # Act
+        telemetry.flush()
+
+        # Assert
+        assert mlflow_client.create_run.call_count == 2
+        assert mlflow_client.create_run.call_args_list[0].args == ('7',)
+        assert mlflow_client.create_run.call_args_list[0].kwargs['run_name'] == 'user_1_inference'
+        first_batch = mlflow_client.log_batch.call_args_list[0].kwargs
+        assert {p.key: p.value for p in first_batch['params']} == {'user_id': '1', 'num_candidates': '3'}
+        assert {m.key: m.value for m in first_batch['metrics']} == {
+            'recipe_3_final_score': 0.65, 'top_score': 0.65
+        }
+        assert mlflow_client.set_terminated.call_count == 2
+        assert telemetry.stats()['written'] == 2
+        assert telemetry.stats()['queued'] == 0
+
+    def test_log_batch_respects_batch_size(self, mlflow_client):
+        """Test that large events are split into log_batch calls of batch_size entries"""
+        # Arrange
+        telemetry = make_telemetry(mlflow_client, batch_size=4)
+        metrics = {f'recipe_{i}_final_score': i / 10 for i in range(9)}
+        telemetry.record('user_1_inference', {'user_id': 1}, metrics)
+
+        # Act
+        telemetry.flush()
+
+        # Assert
+        sizes = [len(c.kwargs['params']) + len(c.kwargs['metrics'])
+                 for c in mlflow_client.log_batch.call_args_list]
+        assert sizes == [4, 4, 2]
+        logged = [m.key for c in mlflow_client.log_batch.call_args_list for m in c.kwargs['metrics']]
+        assert logged == list(metrics)
+
+    def test_missing_experiment_is_created(self, mlflow_client):
+        """Test that the experiment is created on first write if it does not exist"""
+        # Arrange
+        mlflow_client.get_experiment_by_name.return_value = None
+        mlflow_client.create_experiment.return_value = '9'
+        telemetry = make_telemetry(mlflow_client)
+        telemetry.record('user_1_inference')
+
+        # Act
+        telemetry.flush()
+
+        # Assert
+        mlflow_client.create_experiment.assert_called_once_with('test-experiment')
+        assert mlflow_client.create_run.call_args.args == ('9',)
+
+    def test_write_failure_is_counted(self, mlflow_client):
+        """Test that a tracking server error loses only that event"""
+        # Arrange
+        mlflow_client.create_run.side_effect = [ConnectionError('server down'),
+                                                Mock(info=Mock(run_id='run-2'))]
+        telemetry = make_telemetry(mlflow_client)
+        telemetry.record('user_1_inference')
+        telemetry.record('user_2_inference')
+
+        # Act
+        telemetry.flush()
+
+        # Assert
+        assert telemetry.stats()['failed'] == 1
+        assert telemetry.stats()['written'] == 1
+
+    def test_writer_started_once_per_process(self, mlflow_client):
+        """Test that only one background writer thread is started"""
+        # Arrange
+        telemetry = InferenceTelemetry('test-experiment', client_factory=lambda: mlflow_client)
+
+        # Act
+        with patch('inference_telemetry.threading.Thread') as thread:
+            telemetry.record('user_1_inference')
+            telemetry.record('user_2_inference')
+
+        # Assert
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+    def test_after_fork_starts_fresh(self, mlflow_client):
+        """Test that a forked worker gets an empty queue, a new client and its own writer"""
+        # Arrange
+        telemetry = make_telemetry(mlflow_client)
+        telemetry.record('queued_in_master')
+        telemetry._get_client()
+
+        # Act
+        telemetry.after_fork()
+
+        # Assert
+        assert telemetry.stats()['queued'] == 0
+        assert telemetry._client is None
+        telemetry._ensure_writer.assert_called()
+
+
+class TestScoreSamples:
+    """Test suite for the windowed .npz score sample artifacts"""
+
+    def test_samples_written_as_one_artifact_per_window(self, mlflow_client):
+        """Test that sampled score vectors from several requests share one artifact"""
+        # Arrange
+        saved = {}
+        mlflow_client.log_artifact.side_effect = lambda run_id, path: saved.update(np.load(path))
+        telemetry = make_telemetry(mlflow_client, sample_rate=1.0, sample_window=3600)
+        telemetry.record('user_1_inference', scores={'recipe_ids': [1, 3], 'final_scores': [0.5, 0.6]})
+        telemetry.record('user_2_inference', scores={'recipe_ids': [4], 'final_scores': [0.7]})
+
+        # Act
+        telemetry.flush()
+        written_before_window_closed = mlflow_client.log_artifact.call_count
+        telemetry.flush(close_window=True)
+
+        # Assert
+        assert written_before_window_closed == 0
+        assert mlflow_client.log_artifact.call_count == 1
+        assert saved['recipe_ids'].tolist() == [1, 3, 4]
+        assert saved['offsets'].tolist() == [0, 2, 3]
+        assert saved['run_names'].tolist() == ['user_1_inference', 'user_2_inference']
+        assert telemetry.stats()['samples_written'] == 2
+
+    def test_zero_sample_rate_keeps_no_vectors(self, mlflow_client):
+        """Test that no artifact is written when sampling is off"""
+        # Arrange
+        telemetry = make_telemetry(mlflow_client, sample_rate=0.0)
+        telemetry.record('user_1_inference', scores={'recipe_ids': [1]})
+
+        # Act
+        telemetry.flush(close_window=True)
+
+        # Assert
+        mlflow_client.log_artifact.assert_not_called()
+
+    def test_unknown_mode_rejected(self, mlflow_client):
+        """Test that a misspelled TELEMETRY_MODE fails loudly"""
+        # Act & Assert
+        with pytest.raises(ValueError):
+            make_telemetry(mlflow_client, mode='verbose')
+
+
+class TestSummarizeInference:
+    """Test suite for summarize_inference"""
+
+    def test_key_count_independent_of_catalog_size(self):
+        """Test that 10 and 100000 candidates produce the same metric keys"""
+        # Arrange
+        rng = np.random.default_rng(0)
+
+        def summary(n):
+            base = rng.random(n)
+            return summarize_inference(base, np.minimum(base + 0.1, 1.0), np.zeros(n, dtype=bool),
+                                       rng.integers(0, 2, n) * 0.2, rng.integers(0, 60, n),
+                                       rng.random(n) < 0.5)
+
+        # Act & Assert
+        assert summary(10).keys() == summary(100000).keys()
+
+    def test_counts_and_histogram(self):
+        """Test candidate counts, boost counts and histogram bins"""
+        # Act
+        metrics = summarize_inference(
+            base_scores=[0.05, 0.55, np.nan, 0.95],
+            final_scores=[0.05, 0.75, 0.0, 1.0],
+            failed=[False, False, True, False],
+            ingredient_boosts=[0.0, 0.2, 0.2, 0.0],
+            time_diffs=[40, 10, 0, 30],
+            cuisine_matches=[True, False, True, False],
+        )
+
+        # Assert - the failed candidate is left out of every score statistic
+        assert metrics['num_candidates'] == 4
+        assert metrics['num_scored'] == 3
+        assert metrics['num_failed'] == 1
+        assert metrics['ingredient_boost_count'] == 1
+        assert metrics['cook_time_boost_count'] == 2
+        assert metrics['cuisine_boost_count'] == 1
+        assert metrics['final_score_hist_00'] == 1
+        assert metrics['final_score_hist_07'] == 1
+        assert metrics['final_score_hist_09'] == 1
+        assert metrics['base_score_max'] == pytest.approx(0.95)
+        assert metrics['final_score_p50'] == pytest.approx(0.75)
+
+    def test_unscored_left_out(self):
+        """Test that candidates the model never scored are not counted as scored"""
+        # Act
+        metrics = summarize_inference(
+            base_scores=[np.nan, 0.5, np.nan],
+            final_scores=[0.3, 0.5, 0.2],
+            failed=[False, False, False],
+            ingredient_boosts=[0.0, 0.0, 0.0],
+            time_diffs=[10, 10, 10],
+            cuisine_matches=[False, False, False],
+            unscored=[True, False, True],
+        )
+
+        # Assert
+        assert metrics['num_scored'] == 1
+        assert metrics['num_unscored'] == 2
+        assert metrics['base_score_mean'] == 0.5
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
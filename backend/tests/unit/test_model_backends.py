@@ -0,0 +1,158 @@
+"""
+Unit Test: Model Scoring Backends
+Tests the native XGBoost scoring handle and its load-time parity check
+against a small model trained in the test
+"""
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+xgb = pytest.importorskip('xgboost')
+
+import mlflow.pyfunc
+import mlflow.xgboost
+import model_loader
+from model_loader import (MatrixScorer, NativeXGBoostScorer, check_parity, load_native_xgboost,
+                          load_scoring_model, parity_probe_matrix)
+from scoring import predict_scores
+
+
+@pytest.fixture(scope='module')
+def regressor():
+    """Tiny XGBoost regressor on synthetic feature rows"""
+    X = parity_probe_matrix(rows=400, seed=1)
+    y = np.clip(0.3 * X[:, 4] + 0.5 * X[:, 3] - X[:, 2] / 400, 0, 1)
+    model = xgb.XGBRegressor(n_estimators=20, max_depth=3, learning_rate=0.3)
+    model.fit(X, y)
+    return model
+
+
+@pytest.fixture(scope='module')
+def saved_model(regressor, tmp_path_factory):
+    """The regressor saved and reloaded through the MLflow xgboost flavor"""
+    path = str(tmp_path_factory.mktemp('model') / 'xgb')
+    mlflow.xgboost.save_model(regressor, path)
+    return path, mlflow.pyfunc.load_model(path)
+
+
+class TestNativeXGBoostScorer:
+    """Test suite for NativeXGBoostScorer"""
+
+    def test_flavor_detected_and_parity_passes(self, saved_model):
+        """Test that an xgboost-flavored model gets a native handle matching pyfunc"""
+        # Arrange
+        path, pyfunc_model = saved_model
+
+        # Act
+        scorer = load_native_xgboost(path, pyfunc_model)
+        passed, max_diff = check_parity(scorer, pyfunc_model)
+
+        # Assert
+        assert isinstance(scorer, NativeXGBoostScorer)
+        assert passed
+        assert max_diff <= 1e-6
+
+    def test_non_xgboost_flavor_ignored(self):
+        """Test that models without an xgboost flavor get no native handle"""
+        # Arrange
+        pyfunc_model = Mock()
+        pyfunc_model.metadata.flavors = {'python_function': {}, 'sklearn': {}}
+
+        # Act & Assert
+        assert load_native_xgboost('models:/m/1', pyfunc_model) is None
+
+    def test_scores_float32_matrix_directly(self, regressor):
+        """Test that predict_scores hands the scorer a float32 matrix in chunks"""
+        # Arrange
+        scorer = NativeXGBoostScorer(regressor, fallback=Mock())
+        matrix = parity_probe_matrix(rows=10, seed=5)
+
+        # Act
+        with patch.object(scorer.booster, 'inplace_predict',
+                          wraps=scorer.booster.inplace_predict) as inplace:
+            scores, errors = predict_scores(scorer, matrix, batch_size=4)
+
+        # Assert
+        assert errors == {}
+        assert inplace.call_count == 3
+        assert inplace.call_args_list[0].args[0].dtype == np.float32
+        np.testing.assert_allclose(scores, regressor.predict(matrix), atol=1e-6)
+
+    def test_accepts_feature_dicts(self, regressor):
+        """Test that feature dict rows are converted in FEATURE_COLUMNS order"""
+        # Arrange
+        scorer = NativeXGBoostScorer(regressor, fallback=Mock())
+        row = dict(zip(model_loader.FEATURE_COLUMNS, [60.0, 45.0, 15.0, 0.5, 1.0]))
+
+        # Act
+        scores, _ = predict_scores(scorer, [row])
+
+        # Assert
+        expected = regressor.predict(np.array([[60.0, 45.0, 15.0, 0.5, 1.0]], dtype=np.float32))
+        assert scores[0] == pytest.approx(float(expected[0]), abs=1e-6)
+
+
+    def test_incomplete_scorer_rejected(self):
+        """Test that a MatrixScorer without predict_matrix fails when it is built"""
+        # Arrange
+        class Incomplete(MatrixScorer):
+            backend = 'incomplete'
+
+        # Act & Assert
+        with pytest.raises(TypeError):
+            Incomplete(fallback=Mock())
+
+
+class TestLoadScoringModel:
+    """Test suite for backend selection in load_scoring_model"""
+
+    def test_native_backend_selected(self, saved_model):
+        """Test that the native handle is returned when parity passes"""
+        # Arrange
+        path, pyfunc_model = saved_model
+
+        # Act
+        with patch.object(model_loader, 'load_production_model', return_value=pyfunc_model), \
+             patch.object(model_loader, '_model_uri', path):
+            model = load_scoring_model(backend='auto')
+
+        # Assert
+        assert isinstance(model, NativeXGBoostScorer)
+        assert model.fallback is pyfunc_model
+
+    def test_parity_failure_falls_back_to_pyfunc(self, saved_model):
+        """Test that a native handle disagreeing with pyfunc is not used"""
+        # Arrange
+        path, pyfunc_model = saved_model
+        broken = Mock(predict_matrix=Mock(side_effect=lambda m: np.zeros(len(m))))
+
+        # Act
+        with patch.object(model_loader, 'load_production_model', return_value=pyfunc_model), \
+             patch.object(model_loader, 'load_native_xgboost', return_value=broken):
+            model = load_scoring_model(backend='auto')
+
+        # Assert
+        assert model is pyfunc_model
+
+    def test_pyfunc_backend_forced(self, saved_model):
+        """Test that ML_MODEL_BACKEND=pyfunc skips the native handle"""
+        # Arrange
+        _, pyfunc_model = saved_model
+
+        # Act
+        with patch.object(model_loader, 'load_production_model', return_value=pyfunc_model), \
+             patch.object(model_loader, 'load_native_xgboost') as load_native:
+            model = load_scoring_model(backend='pyfunc')
+
+        # Assert
+        assert model is pyfunc_model
+        load_native.assert_not_called()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
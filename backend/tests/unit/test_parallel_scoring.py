@@ -0,0 +1,270 @@
+"""
+Unit Test: Parallel Scoring Executor
+Tests that sharded thread/process scoring equals serial scoring, including
+the merged top-K and failed-row bookkeeping
+"""
+import pickle
+import pytest
+import numpy as np
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parallel_scoring
+from parallel_scoring import ScoringExecutor, score_and_select
+
+
+class OverlapModel:
+    """Picklable stand-in model: scores rows by overlap ratio, fails on overlap 0.13"""
+
+    class metadata:
+        @staticmethod
+        def get_input_schema():
+            return None
+
+    def predict(self, df):
+        overlap = df['ingredient_overlap_ratio'].to_numpy()
+        if len(df) == 1 and np.isclose(overlap[0], 0.13):
+            raise ValueError('bad row')
+        if np.isclose(overlap, 0.13).any():
+            raise ValueError('bad chunk')
+        return (overlap / 2).tolist()
+
+
+class DyingModel(OverlapModel):
+    """OverlapModel that kills any pool worker process that scores with it"""
+
+    def __init__(self):
+        self.parent_pid = os.getpid()
+
+    def predict(self, df):
+        if os.getpid() != self.parent_pid:
+            os._exit(1)
+        return super().predict(df)
+
+
+def candidates(n, seed=0):
+    """Random candidate matrix and boost inputs with many tied scores"""
+    rng = np.random.default_rng(seed)
+    features = np.zeros((n, 5), dtype=np.float32)
+    features[:, 0] = 60
+    features[:, 1] = rng.integers(0, 120, n)
+    features[:, 2] = np.abs(features[:, 1] - 60)
+    features[:, 3] = rng.integers(0, 20, n) / 20
+    features[:, 4] = rng.random(n) < 0.5
+    features[7, 3] = 0.13
+    return (features, rng.integers(0, 3, n), features[:, 2].astype(np.float64),
+            features[:, 4].astype(bool))
+
+
+def assert_same(parallel, serial):
+    np.testing.assert_array_equal(parallel.final_scores, serial.final_scores)
+    np.testing.assert_array_equal(parallel.base_scores, serial.base_scores)
+    np.testing.assert_array_equal(parallel.failed, serial.failed)
+    assert parallel.top.tolist() == serial.top.tolist()
+    assert sorted(parallel.errors) == sorted(serial.errors)
+
+
+class TestScoringExecutor:
+    """Test suite for ScoringExecutor"""
+
+    @pytest.mark.parametrize('k', [1, 10, 333, 5000])
+    def test_thread_backend_matches_serial(self, k):
+        """Test that sharded thread scoring gives the serial result"""
+        # Arrange
+        model = OverlapModel()
+        features, matches, diffs, cuisine = candidates(3001)
+        executor = ScoringExecutor(backend='thread', workers=4, min_candidates=100)
+
+        # Act
+        parallel = executor.score(model, None, features, matches, diffs, cuisine, k)
+        serial = score_and_select(model, None, features, matches, diffs, cuisine, k)
+
+        # Assert
+        assert_same(parallel, serial)
+        assert parallel.failed[7]
+        assert isinstance(parallel.errors[7], ValueError)
+        executor.shutdown()
+
+    def test_process_backend_matches_serial(self):
+        """Test that the process pool scores with its preloaded model"""
+        # Arrange
+        model = OverlapModel()
+        features, matches, diffs, cuisine = candidates(2000, seed=1)
+        executor = ScoringExecutor(backend='process', workers=2, min_candidates=100)
+
+        # Act
+        parallel = executor.score(model, None, features, matches, diffs, cuisine, 50)
+        serial = score_and_select(model, None, features, matches, diffs, cuisine, 50)
+
+        # Assert
+        assert_same(parallel, serial)
+        executor.shutdown()
+
+    def test_dead_worker_falls_back_to_serial(self, capsys):
+        """Test that a killed pool worker leads to serial scoring, not a partial ranking"""
+        # Arrange
+        model = DyingModel()
+        features, matches, diffs, cuisine = candidates(2000, seed=3)
+        executor = ScoringExecutor(backend='process', workers=2, min_candidates=100)
+
+        # Act
+        parallel = executor.score(model, None, features, matches, diffs, cuisine, 50)
+        serial = score_and_select(model, None, features, matches, diffs, cuisine, 50)
+
+        # Assert
+        assert_same(parallel, serial)
+        assert not parallel.unscored.any()
+        assert executor._pool is None
+        assert 'BrokenProcessPool' in capsys.readouterr().out
+
+    def test_unpicklable_shards_fall_back_to_serial(self):
+        """Test that a pickling error discards the pool and scores serially"""
+        # Arrange
+        model = OverlapModel()
+        features, matches, diffs, cuisine = candidates(500, seed=4)
+        executor = ScoringExecutor(backend='process', workers=2, min_candidates=100)
+        pool = MagicMock()
+        pool.map.side_effect = pickle.PicklingError('cannot pickle')
+        executor._pool = pool
+
+        # Act
+        with patch.object(executor, '_get_pool', return_value=pool):
+            result = executor.score(model, None, features, matches, diffs, cuisine, 10)
+
+        # Assert
+        assert_same(result, score_and_select(model, None, features, matches, diffs, cuisine, 10))
+        pool.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        assert executor._pool is None
+
+    def test_below_threshold_is_serial(self):
+        """Test that small candidate pools never start a pool"""
+        # Arrange
+        features, matches, diffs, cuisine = candidates(50)
+        executor = ScoringExecutor(backend='thread', workers=4, min_candidates=100)
+
+        # Act
+        executor.score(OverlapModel(), None, features, matches, diffs, cuisine, 10)
+
+        # Assert
+        assert executor._pool is None
+
+    @pytest.mark.parametrize('min_candidates', [100, 10 ** 6])
+    def test_score_many_matches_per_segment(self, min_candidates):
+        """Test that stacked scoring splits back into each segment's own result"""
+        # Arrange
+        model = OverlapModel()
+        features, matches, diffs, cuisine = candidates(1500, seed=2)
+        bounds = [(0, 400), (400, 400), (400, 1500)]
+        segments = [(features[a:b], matches[a:b], diffs[a:b], cuisine[a:b], k, None)
+                    for (a, b), k in zip(bounds, [5, 3, 50])]
+        executor = ScoringExecutor(backend='thread', workers=3, min_candidates=min_candidates)
+
+        # Act
+        results = executor.score_many(model, None, segments)
+
+        # Assert
+        for result, segment in zip(results, segments):
+            assert_same(result, score_and_select(model, None, *segment))
+        assert results[1].top.tolist() == []
+        executor.shutdown()
+
+    def test_unknown_backend_rejected(self):
+        """Test that a misspelled PARALLEL_SCORING_BACKEND fails loudly"""
+        # Act & Assert
+        with pytest.raises(ValueError):
+            ScoringExecutor(backend='gpu')
+
+
+class TestDeadlineScoring:
+    """Test suite for deadline-bound chunked scoring"""
+
+    def test_chunks_scored_in_priority_order(self):
+        """Test that the highest-priority chunk is scored before the deadline passes"""
+        # Arrange - the deadline passes after the first chunk of 4
+        features, matches, diffs, cuisine = candidates(12)
+        priority = np.arange(12) % 6
+        fallback = np.full(12, 0.01)
+        clock = iter([0.0, 2.0])
+
+        # Act
+        with patch.object(parallel_scoring, 'DEADLINE_CHUNK_SIZE', 4), \
+             patch.object(parallel_scoring.time, 'monotonic', side_effect=lambda: next(clock)):
+            result = score_and_select(OverlapModel(), None, features, matches, diffs, cuisine, 12,
+                                      fallback_scores=fallback, deadline=1.0, priority=priority)
+
+        # Assert
+        scored_rows = np.argsort(-priority, kind='stable')[:4]
+        assert np.flatnonzero(~result.unscored).tolist() == sorted(scored_rows.tolist())
+        assert not np.isnan(result.base_scores[scored_rows]).any()
+        assert np.isnan(result.base_scores[result.unscored]).all()
+
+    def test_broken_model_stops_chunking(self):
+        """Test that chunks after a model failure are not sent to the model but keep the fallback"""
+        # Arrange
+        class BrokenModel(OverlapModel):
+            calls = 0
+
+            def predict(self, df):
+                BrokenModel.calls += 1
+                raise ValueError('schema mismatch')
+
+        features, matches, diffs, cuisine = candidates(12)
+        fallback = np.full(12, 0.01)
+
+        # Act
+        with patch.object(parallel_scoring, 'DEADLINE_CHUNK_SIZE', 4):
+            result = score_and_select(BrokenModel(), None, features, matches, diffs, cuisine, 12,
+                                      fallback_scores=fallback, deadline=float('inf'))
+
+        # Assert - the first chunk and two single-row retries
+        assert BrokenModel.calls == 3
+        assert result.failed[:4].all()
+        assert result.unscored[4:].all()
+        expected, _ = parallel_scoring.apply_boosts(fallback, matches, diffs, cuisine)
+        np.testing.assert_array_equal(result.final_scores, expected)
+
+    def test_fallback_scores_boosted(self):
+        """Test that unscored rows take the fallback base score plus the usual boosts"""
+        # Arrange
+        features, matches, diffs, cuisine = candidates(20)
+        fallback = np.linspace(0, 0.5, 20)
+
+        # Act
+        heuristic = score_and_select(None, None, features, matches, diffs, cuisine, 5, fallback_scores=fallback)
+        without = score_and_select(None, None, features, matches, diffs, cuisine, 5)
+
+        # Assert
+        expected, _ = parallel_scoring.apply_boosts(fallback, matches, diffs, cuisine)
+        np.testing.assert_array_equal(heuristic.final_scores, expected)
+        assert heuristic.unscored.all()
+        assert (without.final_scores == 0.0).all()
+
+    def test_score_many_passes_fallback(self):
+        """Test that stacked scoring gives each segment its own fallback on failed rows"""
+        # Arrange - row 7 of the first segment fails in the model
+        features, matches, diffs, cuisine = candidates(20)
+        fallback = np.linspace(0, 0.5, 20)
+        segments = [(features[a:b], matches[a:b], diffs[a:b], cuisine[a:b], 5, fallback[a:b])
+                    for a, b in [(0, 12), (12, 20)]]
+
+        # Act
+        results = ScoringExecutor(backend='off').score_many(OverlapModel(), None, segments)
+        no_model = ScoringExecutor(backend='off').score_many(None, None, segments)
+
+        # Assert
+        for result, segment in zip(results, segments):
+            assert_same(result, score_and_select(OverlapModel(), None, *segment))
+        assert results[0].failed[7]
+        expected, _ = parallel_scoring.apply_boosts(fallback[:12], matches[:12], diffs[:12], cuisine[:12])
+        assert results[0].final_scores[7] == expected[7] > 0
+        np.testing.assert_array_equal(no_model[1].final_scores,
+                                      parallel_scoring.apply_boosts(fallback[12:], matches[12:],
+                                                                    diffs[12:], cuisine[12:])[0])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,448 @@
+"""
+Unit Test: In-Memory Recipe Catalog
+Tests the columnar snapshot and the process-level catalog holder
+"""
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta, timezone
+from recipe_catalog import (CatalogSnapshot, RecipeCatalog, TrigramIndex, _parse_timestamp, pack_mask,
+                            unpack_bitmap)
+
+
+class TestCatalogSnapshot:
+    """Test suite for CatalogSnapshot columns"""
+
+    def test_columns_align_with_records(self, test_recipes_data):
+        """Test that every column row describes the matching record"""
+        # Act
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Assert
+        assert len(snapshot) == 3
+        assert snapshot.ids.tolist() == [1, 2, 3]
+        assert snapshot.cook_time_minutes.tolist() == [25.0, 15.0, 30.0]
+        assert snapshot.rating.tolist() == [4.5, 4.8, 4.6]
+        assert [snapshot.cuisine_vocab[c] for c in snapshot.cuisine_codes] == [
+            'italian', 'greek', 'mediterranean'
+        ]
+        assert [snapshot.diet_vocab[c] for c in snapshot.diet_codes] == [
+            'vegetarian', 'vegetarian', 'vegan'
+        ]
+
+    def test_ingredients_parsed_and_interned(self, test_recipes_data):
+        """Test that ingredient strings are parsed once and share IDs"""
+        # Act
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Assert - 'tomatoes' appears in recipes 1 and 2 with one ID
+        tomatoes = snapshot.ingredient_index['tomatoes']
+        assert tomatoes in snapshot.row_ingredient_ids(0)
+        assert tomatoes in snapshot.row_ingredient_ids(1)
+        assert tomatoes not in snapshot.row_ingredient_ids(2)
+        assert [snapshot.ingredient_vocab[i] for i in snapshot.row_ingredient_ids(2)] == [
+            'quinoa', 'avocado', 'chickpeas', 'tahini'
+        ]
+
+    def test_ingredients_normalized_once(self):
+        """Test that ingredient names are lowercased, stripped and deduplicated"""
+        # Act
+        snapshot = CatalogSnapshot([{
+            'id': 1, 'ingredients_list': "[' Chicken Breast', 'chicken breast', 'Salt ']"
+        }])
+
+        # Assert
+        assert snapshot.ingredient_sets[0] == {'chicken breast', 'salt'}
+        assert snapshot.ingredient_counts.tolist() == [2]
+        assert snapshot.ingredient_lists[0] == [' Chicken Breast', 'chicken breast', 'Salt ']
+
+    def test_missing_numeric_values_are_nan(self):
+        """Test that missing numbers are kept as NaN for caller defaults"""
+        # Act
+        snapshot = CatalogSnapshot([{'id': 7, 'cook_time_minutes': None}])
+
+        # Assert
+        assert np.isnan(snapshot.cook_time_minutes[0])
+        assert np.isnan(snapshot.calories[0])
+
+    def test_get_by_id(self, test_recipes_data):
+        """Test recipe lookup by ID"""
+        # Arrange
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Act & Assert
+        assert snapshot.get(2)['recipe_name'] == 'Greek Salad'
+        assert snapshot.get(99) is None
+
+    def test_filter_rows(self, test_recipes_data):
+        """Test cuisine and max time filtering"""
+        # Arrange
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Act & Assert
+        assert snapshot.filter_rows().tolist() == [0, 1, 2]
+        assert snapshot.filter_rows(cuisine='Greek').tolist() == [1]
+        assert snapshot.filter_rows(max_time=25).tolist() == [0, 1]
+        assert snapshot.filter_rows(cuisine='Thai').tolist() == []
+
+
+class TestIngredientBitmaps:
+    """Test suite for the ingredient -> recipe bitmap index"""
+
+    def test_pack_round_trip(self):
+        """Test that packing and unpacking preserves a row mask"""
+        # Arrange
+        mask = np.array([True, False, True] + [False] * 8 + [True])
+
+        # Act & Assert
+        assert unpack_bitmap(pack_mask(mask), len(mask)).tolist() == mask.tolist()
+
+    def test_bitmap_rows_per_ingredient(self, test_recipes_data):
+        """Test that each ingredient bitmap marks exactly the recipes using it"""
+        # Arrange
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Act
+        tomatoes = snapshot.ingredients_bitmap(snapshot.lookup_ingredient_ids(['tomatoes']))
+        tahini = snapshot.ingredients_bitmap(snapshot.lookup_ingredient_ids(['Tahini']))
+
+        # Assert
+        assert unpack_bitmap(tomatoes, 3).tolist() == [True, True, False]
+        assert unpack_bitmap(tahini, 3).tolist() == [False, False, True]
+
+    def test_exclude_ingredients(self, test_recipes_data):
+        """Test that excluded recipes are the OR of the blocked ingredients"""
+        # Arrange
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Act
+        remaining = snapshot.exclude_ingredients(['basil', 'Feta', 'not-an-ingredient'])
+
+        # Assert
+        assert unpack_bitmap(remaining, 3).tolist() == [False, False, True]
+
+    def test_exclude_nothing(self, test_recipes_data):
+        """Test that an empty block list keeps every recipe"""
+        # Arrange
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Act
+        remaining = snapshot.exclude_ingredients([])
+
+        # Assert
+        assert unpack_bitmap(remaining, 3).all()
+
+    def test_bitmaps_across_byte_boundary(self):
+        """Test rows beyond the first byte of the bitmap"""
+        # Arrange
+        records = [{'id': i, 'ingredients_list': ['salt'] if i % 5 == 0 else ['sugar']}
+                   for i in range(20)]
+        snapshot = CatalogSnapshot(records)
+
+        # Act
+        remaining = unpack_bitmap(snapshot.exclude_ingredients(['salt']), 20)
+
+        # Assert
+        assert np.flatnonzero(~remaining).tolist() == [0, 5, 10, 15]
+
+
+    def test_cuisine_mask(self, test_recipes_data):
+        """Test cuisine lookups through the per-cuisine bitmaps"""
+        # Arrange
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Act & Assert
+        assert snapshot.cuisine_mask({'greek', 'mediterranean'}).tolist() == [False, True, True]
+        assert snapshot.cuisine_mask({'thai'}).tolist() == [False, False, False]
+        assert snapshot.cuisine_mask(set()).tolist() == [False, False, False]
+
+
+class TestTrigramIndex:
+    """Test suite for substring matching over the ingredient vocabulary"""
+
+    VOCAB = ['chicken breast', 'chicken', 'chickpeas', 'egg', 'eggplant', 'oil',
+             'olive oil', 'soy sauce', 'ice', 'rice', 'garlic']
+
+    def brute_force(self, term):
+        return [i for i, name in enumerate(self.VOCAB) if term in name]
+
+    @pytest.mark.parametrize('term', [
+        'chicken', 'chick', 'oil', 'ice', 'egg', 'gg', 'i', 'sauce', 'ive o',
+        'beef', 'chickens', '', 'e'
+    ])
+    def test_matches_substring_semantics(self, term):
+        """Test that match() returns exactly the names containing the term"""
+        # Arrange
+        index = TrigramIndex(self.VOCAB)
+
+        # Act & Assert
+        assert index.match(term).tolist() == self.brute_force(term)
+
+    def test_search_match_counts(self, test_recipes_data):
+        """Test per-recipe counts of matching search terms"""
+        # Arrange
+        snapshot = CatalogSnapshot(test_recipes_data)
+
+        # Act
+        counts = snapshot.search_match_counts({'tomato', 'oil', 'quinoa'})
+
+        # Assert - pasta has tomatoes + olive oil, salad tomatoes, bowl quinoa
+        assert counts.tolist() == [2, 1, 1]
+
+
+class TestRecipeCatalog:
+    """Test suite for RecipeCatalog loading and refresh"""
+
+    def test_loads_once_and_shares_snapshot(self, test_recipes_data):
+        """Test that repeated access does not re-fetch the table"""
+        # Arrange
+        fetch = Mock(return_value=test_recipes_data)
+        catalog = RecipeCatalog(fetch, refresh_seconds=0)
+
+        # Act
+        first = catalog.get_snapshot()
+        second = catalog.get_snapshot()
+
+        # Assert
+        assert fetch.call_count == 1
+        assert first is second
+
+    def test_refresh_swaps_snapshot(self, test_recipes_data):
+        """Test that refresh installs a new snapshot with a higher version"""
+        # Arrange
+        fetch = Mock(side_effect=[test_recipes_data, test_recipes_data[:1]])
+        catalog = RecipeCatalog(fetch, refresh_seconds=0)
+        old = catalog.get_snapshot()
+
+        # Act
+        catalog.refresh()
+        new = catalog.get_snapshot()
+
+        # Assert
+        assert new.version == old.version + 1
+        assert len(new) == 1
+        assert len(old) == 3  # readers of the old snapshot are unaffected
+
+    def test_failed_background_refresh_keeps_snapshot(self, test_recipes_data):
+        """Test that a refresh error leaves the current snapshot in place"""
+        # Arrange
+        fetch = Mock(side_effect=[test_recipes_data, RuntimeError('network down')])
+        catalog = RecipeCatalog(fetch, refresh_seconds=0)
+        snapshot = catalog.get_snapshot()
+
+        # Act
+        with pytest.raises(RuntimeError):
+            catalog.refresh()
+
+        # Assert
+        assert catalog.get_snapshot() is snapshot
+
+    def test_preload_then_fork(self, test_recipes_data):
+        """Test that preload starts no thread and after_fork starts the worker's own"""
+        # Arrange
+        fetch = Mock(return_value=test_recipes_data)
+        catalog = RecipeCatalog(fetch, refresh_seconds=3600)
+
+        # Act
+        with patch('recipe_catalog.threading.Thread') as thread:
+            snapshot = catalog.preload()
+            started_by_preload = thread.call_count
+            catalog.after_fork()
+
+        # Assert
+        assert started_by_preload == 0
+        thread.return_value.start.assert_called_once()
+        assert catalog.get_snapshot() is snapshot
+        assert fetch.call_count == 1
+
+
+def stamped(recipes, stamp='2026-10-01T00:00:00+00:00'):
+    return [dict(r, updated_at=stamp) for r in recipes]
+
+
+class TestCatalogSync:
+    """Test suite for incremental catalog sync"""
+
+    def test_update_applied_as_new_version(self, test_recipes_data):
+        """Test that a changed row replaces the old one in a new snapshot"""
+        # Arrange
+        rows = stamped(test_recipes_data)
+        edited = dict(rows[1], ingredients_list="['lettuce', 'halloumi']", updated_at='2026-10-02T08:00:00Z')
+        fetch_changes = Mock(return_value=[rows[0], edited])
+        catalog = RecipeCatalog(Mock(return_value=rows), refresh_seconds=0, fetch_changes_fn=fetch_changes)
+        old = catalog.get_snapshot()
+
+        # Act
+        new = catalog.sync(check_deletes=False)
+
+        # Assert
+        fetch_changes.assert_called_once_with('2026-10-01T00:00:00+00:00', None)
+        assert new.version == old.version + 1
+        assert new.get(2)['ingredients_list'] == "['lettuce', 'halloumi']"
+        assert new.search_match_counts({'halloumi'}).tolist() == [0, 1, 0]
+        assert old.search_match_counts({'halloumi'}).tolist() == [0, 0, 0]
+        assert new.updated_at_max == '2026-10-02T08:00:00Z'
+        # Unchanged rows reuse their parsed ingredients
+        assert new.ingredient_lists[0] is old.ingredient_lists[0]
+
+    def test_insert_and_delete(self, test_recipes_data):
+        """Test that new ids are added in id order and missing ids are removed"""
+        # Arrange
+        rows = stamped(test_recipes_data)
+        added = dict(rows[0], id=10, recipe_name='Tomato Soup', updated_at='2026-10-03T00:00:00+00:00')
+        catalog = RecipeCatalog(Mock(return_value=rows), refresh_seconds=0,
+                                fetch_changes_fn=Mock(return_value=[added]),
+                                fetch_ids_fn=Mock(return_value=[1, 3, 10]))
+        catalog.get_snapshot()
+
+        # Act
+        new = catalog.sync()
+
+        # Assert
+        assert new.ids.tolist() == [1, 3, 10]
+        assert new.get(2) is None
+        assert new.get(10)['recipe_name'] == 'Tomato Soup'
+        assert catalog.stats()['rows_synced'] == 2
+
+    def test_fingerprint_ready_after_delta(self, test_recipes_data):
+        """Test that a synced snapshot's fingerprint equals a full build of the same rows"""
+        # Arrange
+        old = CatalogSnapshot(test_recipes_data)
+        edited = dict(test_recipes_data[0], rating=3.9)
+
+        # Act
+        new = old.apply_changes([edited], [3], version=2)
+
+        # Assert
+        assert new._fingerprint == CatalogSnapshot([edited, test_recipes_data[1]]).fingerprint()
+        assert new.fingerprint() != old.fingerprint()
+
+    CUISINES = ['italian', 'greek', 'thai', 'mexican']
+    NAMES = ['tomato', 'olive oil', 'feta', 'rice', 'chicken breast', 'basil', 'egg', 'soy sauce', 'lime']
+
+    def catalog_rows(self, count=20):
+        return [{'id': i * 2, 'recipe_name': f"Recipe {i}", 'cuisine': self.CUISINES[i % 3],
+                 'diet': ['vegan', None][i % 2], 'cook_time_minutes': 10 + i, 'rating': 4.0,
+                 'ingredients_list': str([self.NAMES[(i + j) % 7] for j in range(1 + i % 4)])}
+                for i in range(1, count + 1)]
+
+    def assert_same_catalog(self, delta, full):
+        assert delta.records == full.records
+        assert delta.ids.tolist() == full.ids.tolist()
+        assert delta.fingerprint() == full.fingerprint()
+        assert np.array_equal(delta.cook_time_minutes, full.cook_time_minutes, equal_nan=True)
+        assert [delta.diet_vocab[c] for c in delta.diet_codes] == [full.diet_vocab[c] for c in full.diet_codes]
+        assert list(delta.ingredient_sets) == list(full.ingredient_sets)
+        assert delta.all_rows_bitmap.tolist() == full.all_rows_bitmap.tolist()
+        for cuisine in self.CUISINES:
+            assert delta.cuisine_mask([cuisine]).tolist() == full.cuisine_mask([cuisine]).tolist()
+        for name in self.NAMES + ['pepper']:
+            assert (delta.exclude_ingredients([name]) == full.exclude_ingredients([name])).all()
+            assert delta.count_ingredients(delta.lookup_ingredient_ids([name])).tolist() == \
+                full.count_ingredients(full.lookup_ingredient_ids([name])).tolist()
+        for term in ['oil', 'chicken', 'pep', 'e', 'ime']:
+            assert delta.search_match_counts({term}).tolist() == full.search_match_counts({term}).tolist()
+
+    @pytest.mark.parametrize('upsert_ids, deleted_ids', [
+        ([4, 10], []),             # rows replaced in place
+        ([4, 100], []),            # insert after the last row
+        ([4], [34, 36, 38, 40]),   # last rows deleted, one byte shorter
+        ([5, 11], [2, 20]),        # inserts and deletes move rows
+        ([], [2, 4, 6]),
+    ])
+    def test_delta_matches_full_build(self, upsert_ids, deleted_ids):
+        """Test that a patched snapshot answers every query like a full build of the same rows"""
+        # Arrange
+        rows = self.catalog_rows()
+        old = CatalogSnapshot(rows)
+        upserts = [{'id': recipe_id, 'recipe_name': f"Changed {recipe_id}", 'cuisine': 'mexican',
+                    'diet': 'vegan', 'cook_time_minutes': None,
+                    'ingredients_list': "['Pepper', 'tomato', 'lime']"} for recipe_id in upsert_ids]
+
+        # Act
+        new = old.apply_changes(upserts, deleted_ids, version=2)
+
+        # Assert
+        changed = {r['id']: r for r in upserts}
+        expected = sorted([changed.pop(r['id'], r) for r in rows if r['id'] not in deleted_ids]
+                          + list(changed.values()), key=lambda r: r['id'])
+        self.assert_same_catalog(new, CatalogSnapshot(expected))
+        self.assert_same_catalog(old, CatalogSnapshot(rows))
+
+    @pytest.mark.parametrize('value, expected', [
+        ('2026-10-01T08:00:00.12345+00:00', datetime(2026, 10, 1, 8, 0, 0, 123450, timezone.utc)),
+        ('2026-10-01T08:00:00.1+00:00', datetime(2026, 10, 1, 8, 0, 0, 100000, timezone.utc)),
+        ('2026-10-01 08:00:00.1234567+00', datetime(2026, 10, 1, 8, 0, 0, 123456, timezone.utc)),
+        ('2026-10-01T08:00:00-05', datetime(2026, 10, 1, 8, 0, 0, 0, timezone(timedelta(hours=-5)))),
+        ('2026-10-01T08:00:00Z', datetime(2026, 10, 1, 8, 0, 0, 0, timezone.utc)),
+        ('not a date', None),
+    ])
+    def test_postgres_timestamps_parsed(self, value, expected):
+        """Test that timestamptz strings with any fraction length count toward the mark"""
+        # Act & Assert
+        assert _parse_timestamp(value) == expected
+
+    def test_mark_with_short_fractions(self, test_recipes_data):
+        """Test that the latest updated_at wins when fractions have different lengths"""
+        # Arrange
+        stamps = ['2026-10-01T08:00:00.12345+00:00', '2026-10-01T08:00:00.5+00:00', '2026-10-01T08:00:00.49+00']
+        rows = [dict(r, updated_at=stamp) for r, stamp in zip(test_recipes_data, stamps)]
+
+        # Act
+        snapshot = CatalogSnapshot(rows)
+
+        # Assert
+        assert snapshot.updated_at_max == '2026-10-01T08:00:00.5+00:00'
+
+    def test_no_changes_keeps_snapshot(self, test_recipes_data):
+        """Test that rows re-read at the high-water mark do not bump the version"""
+        # Arrange
+        rows = stamped(test_recipes_data)
+        catalog = RecipeCatalog(Mock(return_value=rows), refresh_seconds=0,
+                                fetch_changes_fn=Mock(return_value=[rows[2]]),
+                                fetch_ids_fn=Mock(return_value=[1, 2, 3]))
+        snapshot = catalog.get_snapshot()
+
+        # Act & Assert
+        assert catalog.sync() is snapshot
+        assert catalog.get_snapshot().version == snapshot.version
+
+    def test_id_mark_without_updated_at(self, test_recipes_data):
+        """Test that rows without updated_at are polled by id"""
+        # Arrange
+        fetch_changes = Mock(return_value=[])
+        catalog = RecipeCatalog(Mock(return_value=test_recipes_data), refresh_seconds=0,
+                                fetch_changes_fn=fetch_changes)
+        catalog.get_snapshot()
+
+        # Act
+        catalog.sync()
+
+        # Assert
+        fetch_changes.assert_called_once_with(None, 3)
+
+    def test_delete_check_interval(self, test_recipes_data):
+        """Test that ids are listed at most once per delete_check_seconds"""
+        # Arrange
+        fetch_ids = Mock(return_value=[1, 2, 3])
+        catalog = RecipeCatalog(Mock(return_value=test_recipes_data), refresh_seconds=0,
+                                fetch_changes_fn=Mock(return_value=[]), fetch_ids_fn=fetch_ids,
+                                delete_check_seconds=3600)
+        catalog.get_snapshot()
+
+        # Act
+        catalog.sync()
+        catalog.sync()
+
+        # Assert
+        assert fetch_ids.call_count == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,556 @@
+"""
+Unit Test: Recommendation Endpoint
+Tests /api/recommend filtering, scoring and boosting with a mocked
+database, catalog and ML model
+"""
+import pytest
+import json
+import numpy as np
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from app import app
+
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def mock_backend(patched_backend):
+    """Model of the patched app globals (see patched_backend in conftest.py)"""
+    return patched_backend.model
+
+
+def post_recommend(client, **body):
+    body.setdefault('user_id', 1)
+    response = client.post('/api/recommend', data=json.dumps(body),
+                           content_type='application/json')
+    return response, json.loads(response.data)
+
+
+class TestRecommendEndpoint:
+    """Test suite for /api/recommend"""
+
+    def test_allergies_and_dislikes_excluded(self, client, mock_backend):
+        """Test that recipes with blocked ingredients are filtered out"""
+        # Act
+        response, data = post_recommend(client)
+
+        # Assert
+        assert response.status_code == 200
+        ids = {r['id'] for r in data['recipes']}
+        assert ids == {1, 3, 4}
+        assert data['total_candidates'] == 3
+
+    def test_allergy_match_ignores_case(self, client, mock_backend, backend_user):
+        """Test that a capitalized allergy still excludes the recipe"""
+        # Arrange
+        user = dict(backend_user, allergies=['Soy Sauce '])
+        app_module.supabase.table.return_value.select.return_value.eq.return_value \
+            .execute.return_value = Mock(data=[user])
+
+        # Act
+        _, data = post_recommend(client)
+
+        # Assert
+        assert {r['id'] for r in data['recipes']} == {1, 3}
+
+    def test_diet_filter(self, client, mock_backend, backend_user):
+        """Test that non-regular diets only keep recipes with the same diet"""
+        # Arrange
+        user = dict(backend_user, diet='vegan')
+        app_module.supabase.table.return_value.select.return_value.eq.return_value \
+            .execute.return_value = Mock(data=[user])
+
+        # Act
+        _, data = post_recommend(client)
+
+        # Assert
+        assert [r['id'] for r in data['recipes']] == [4]
+
+    def test_umbrella_cuisine_expands(self, client, mock_backend):
+        """Test that 'asian' matches Chinese and Thai recipes"""
+        # Act
+        _, data = post_recommend(client, preferred_cuisine=['Asian'])
+
+        # Assert - Thai recipe is excluded by the peanut allergy
+        assert [r['id'] for r in data['recipes']] == [4]
+
+    def test_search_ingredients_partial_match(self, client, mock_backend):
+        """Test that 'chicken' matches 'chicken breast' and 'chicken thighs'"""
+        # Act
+        _, data = post_recommend(client, search_ingredients=['Chicken'])
+
+        # Assert
+        assert {r['id'] for r in data['recipes']} == {1, 3}
+        assert data['search_ingredients'] == ['chicken']
+
+    def test_boosted_scores(self, client, mock_backend):
+        """Test ingredient, cook time and cuisine boosts on top of the base score"""
+        # Act
+        _, data = post_recommend(client, search_ingredients=['chicken'],
+                                 preferred_cuisine=['italian'], max_cooking_time=30)
+        scores = {r['id']: r['ml_score'] for r in data['recipes']}
+
+        # Assert - 1: 0.5 + 0.2 (chicken) + 0.15 (exact time) + 0.1 (italian)
+        assert scores == {1: 0.95}
+
+    def test_boosted_score_capped(self, client, mock_backend):
+        """Test that the final score never exceeds 1.0"""
+        # Arrange
+        mock_backend.predict = Mock(side_effect=lambda df: [0.8] * len(df))
+
+        # Act
+        _, data = post_recommend(client, search_ingredients=['chicken'],
+                                 preferred_cuisine=['italian'], max_cooking_time=30)
+
+        # Assert
+        assert [r['ml_score'] for r in data['recipes']] == [1.0]
+
+    def test_scores_sorted_descending(self, client, mock_backend):
+        """Test that results are ordered by final score"""
+        # Act
+        _, data = post_recommend(client, max_cooking_time=50)
+        scores = [r['ml_score'] for r in data['recipes']]
+
+        # Assert
+        # 3: |55-50|=5 -> +0.15, 1: 20 -> +0.05, 4: 35 -> no boost
+        assert [r['id'] for r in data['recipes']] == [3, 1, 4]
+        assert scores == [0.65, 0.55, 0.5]
+
+    def test_top_k_limits_results(self, client, mock_backend):
+        """Test that only the best top_k recipes are returned"""
+        # Act
+        _, data = post_recommend(client, max_cooking_time=50, top_k=2)
+
+        # Assert
+        assert [r['id'] for r in data['recipes']] == [3, 1]
+        assert data['top_k'] == 2
+        assert data['total_candidates'] == 3
+
+    @pytest.mark.parametrize('top_k', [0, -3, 'many'])
+    def test_invalid_top_k(self, client, mock_backend, top_k):
+        """Test that a non-positive or non-numeric top_k is rejected"""
+        # Act
+        response, data = post_recommend(client, top_k=top_k)
+
+        # Assert
+        assert response.status_code == 400
+        assert 'top_k' in data['error']
+
+    def test_top_k_capped(self, client, mock_backend):
+        """Test that top_k above the server maximum is capped"""
+        # Act
+        _, data = post_recommend(client, top_k=10 ** 6)
+
+        # Assert
+        assert data['top_k'] == app_module.MAX_TOP_K
+
+    def test_no_matches_message(self, client, mock_backend):
+        """Test the empty result message for an unmatched ingredient search"""
+        # Act
+        _, data = post_recommend(client, search_ingredients=['saffron'])
+
+        # Assert
+        assert data['recipes'] == []
+        assert data['message'] == 'No recipes found with these ingredients'
+
+    def test_model_failure_uses_heuristic(self, client, mock_backend):
+        """Test that recipes whose prediction fails are ranked by the heuristic score"""
+        # Arrange
+        mock_backend.predict = Mock(side_effect=RuntimeError('model down'))
+
+        # Act
+        response, data = post_recommend(client)
+
+        # Assert - 0.4 * overlap + 0.02 * rating, then the usual boosts
+        assert response.status_code == 200
+        assert [r['id'] for r in data['recipes']] == [3, 1, 4]
+        assert [r['ml_score'] for r in data['recipes']] == [0.646, 0.54, 0.48]
+        assert data['partial'] is True
+        assert data['heuristic_scored'] == 3
+        # One chunk and two single-row retries, then the model is given up on
+        assert mock_backend.predict.call_count == 3
+
+    def test_failed_prediction_logs_capped(self, client, mock_backend, capsys):
+        """Test that only the first failed predictions are logged one by one"""
+        # Arrange
+        mock_backend.predict = Mock(side_effect=RuntimeError('model down'))
+
+        # Act
+        with patch.object(app_module, 'LOG_FAILED_PREDICTIONS_MAX', 1):
+            post_recommend(client)
+
+        # Assert
+        output = capsys.readouterr().out
+        assert output.count('ML prediction error for recipe') == 1
+        assert 'ML prediction failed for 2 more recipes' in output
+
+    def test_missing_model_serves_heuristic(self, client, mock_backend):
+        """Test that recommendations are served without a loaded model"""
+        # Act
+        with patch.object(app_module, 'ml_model', None):
+            response, data = post_recommend(client)
+
+        # Assert
+        assert response.status_code == 200
+        assert [r['id'] for r in data['recipes']] == [3, 1, 4]
+        assert data['partial'] is True
+        assert app_module.response_cache.stats()['size'] == 0
+
+    def test_deadline_passed_ranks_by_heuristic(self, client, mock_backend):
+        """Test that candidates not reached before the deadline get the heuristic score"""
+        # Arrange - the clock jumps past the 50 ms budget after the request starts
+        clock = iter([0.0] + [10.0] * 100)
+        with patch.object(app_module.time, 'monotonic', side_effect=lambda: next(clock)):
+            # Act
+            response, data = post_recommend(client, deadline_ms=50)
+
+        # Assert
+        assert response.status_code == 200
+        mock_backend.predict.assert_not_called()
+        assert data['partial'] is True
+        assert data['heuristic_scored'] == 3
+
+    def test_deadline_met_is_complete(self, client, mock_backend):
+        """Test that a generous deadline scores every candidate with the model"""
+        # Act
+        _, data = post_recommend(client, deadline_ms=60000, max_cooking_time=50)
+
+        # Assert
+        assert data['partial'] is False
+        assert [r['ml_score'] for r in data['recipes']] == [0.65, 0.55, 0.5]
+
+    @pytest.mark.parametrize('deadline_ms', [-5, 'soon'])
+    def test_invalid_deadline(self, client, mock_backend, deadline_ms):
+        """Test that a non-positive or non-numeric deadline_ms is rejected"""
+        # Act
+        response, data = post_recommend(client, deadline_ms=deadline_ms)
+
+        # Assert
+        assert response.status_code == 400
+        assert 'deadline_ms' in data['error']
+
+    def test_inference_queued_for_telemetry(self, client, mock_backend):
+        """Test that the inference is handed to the telemetry queue, not MLflow"""
+        # Act
+        post_recommend(client, max_cooking_time=50)
+
+        # Assert
+        app_module.inference_telemetry.record.assert_called_once()
+        run_name, params, metrics = app_module.inference_telemetry.record.call_args.args
+        assert run_name == 'user_1_inference'
+        assert params['num_candidates'] == 3
+        assert params['top_recipe'] == 'Greek Chicken'
+        assert metrics['top_score'] == pytest.approx(0.65)
+
+    def test_aggregate_telemetry_keys_fixed(self, client, mock_backend):
+        """Test that aggregate mode logs summaries instead of per-recipe keys"""
+        # Arrange
+        app_module.inference_telemetry.mode = 'aggregate'
+
+        # Act
+        post_recommend(client, max_cooking_time=50)
+
+        # Assert
+        call = app_module.inference_telemetry.record.call_args
+        metrics = call.args[2]
+        assert not any(key.startswith('recipe_') for key in metrics)
+        assert metrics['num_scored'] == 3
+        assert metrics['cook_time_boost_count'] == 2
+        assert metrics['final_score_max'] == pytest.approx(0.65)
+        assert call.kwargs['scores']['recipe_ids'].tolist() == [1, 3, 4]
+
+    def test_per_recipe_telemetry_mode(self, client, mock_backend):
+        """Test that per_recipe mode keeps one metric key per scored recipe"""
+        # Arrange
+        app_module.inference_telemetry.mode = 'per_recipe'
+
+        # Act
+        post_recommend(client, max_cooking_time=50)
+
+        # Assert
+        metrics = app_module.inference_telemetry.record.call_args.args[2]
+        assert metrics['recipe_3_final_score'] == pytest.approx(0.65)
+        assert metrics['recipe_4_base_score'] == pytest.approx(0.5)
+
+    @pytest.mark.parametrize('mode', ['aggregate', 'per_recipe'])
+    @pytest.mark.parametrize('degraded', ['no_model', 'deadline'])
+    def test_unscored_telemetry(self, client, mock_backend, mode, degraded):
+        """Test that rows the model never scored are not logged as scored or as NaN scores"""
+        # Arrange
+        app_module.inference_telemetry.mode = mode
+        clock = iter([0.0] + [10.0] * 100)
+
+        # Act
+        with patch.object(app_module, 'ml_model', None if degraded == 'no_model' else mock_backend), \
+             patch.object(app_module.time, 'monotonic', side_effect=lambda: next(clock)):
+            post_recommend(client, deadline_ms=50)
+
+        # Assert
+        metrics = app_module.inference_telemetry.record.call_args.args[2]
+        assert not any(np.isnan(value) for value in metrics.values())
+        assert not any(key.endswith('_base_score') for key in metrics)
+        if mode == 'aggregate':
+            assert metrics['num_scored'] == 0
+            assert metrics['num_unscored'] == 3
+
+    def test_repeated_request_served_from_cache(self, client, mock_backend):
+        """Test that an identical request is answered without scoring again"""
+        # Act
+        _, first = post_recommend(client, search_ingredients=['Chicken'], max_cooking_time=50)
+        _, second = post_recommend(client, search_ingredients=[' chicken'], max_cooking_time=50)
+
+        # Assert
+        assert second == first
+        assert app_module.inference_telemetry.record.call_count == 1
+        assert app_module.response_cache.stats()['hits'] == 1
+
+    def test_profile_change_bypasses_cache(self, client, mock_backend, backend_user):
+        """Test that a changed profile row is not answered from the cache"""
+        # Arrange
+        post_recommend(client)
+        user = dict(backend_user, allergies=['soy sauce'])
+        app_module.supabase.table.return_value.select.return_value.eq.return_value \
+            .execute.return_value = Mock(data=[user])
+
+        # Act
+        _, data = post_recommend(client)
+
+        # Assert
+        assert {r['id'] for r in data['recipes']} == {1, 3}
+        assert app_module.inference_telemetry.record.call_count == 2
+
+    def test_like_invalidates_cached_responses(self, client, mock_backend):
+        """Test that liking a recipe drops the user's cached recommendations"""
+        # Arrange
+        post_recommend(client)
+        token = app_module.generate_token(1, 'user@example.com')
+
+        # Act
+        client.post('/api/recipes/3/like', headers={'Authorization': f'Bearer {token}'})
+        post_recommend(client)
+
+        # Assert
+        assert app_module.inference_telemetry.record.call_count == 2
+        assert app_module.response_cache.stats()['invalidations'] == 1
+
+    def test_recipe_served_from_catalog(self, client, mock_backend):
+        """Test that /api/recipes/<id> does not query the database"""
+        # Act
+        response = client.get('/api/recipes/3')
+        data = json.loads(response.data)
+
+        # Assert
+        assert response.status_code == 200
+        assert data['recipe']['recipe_name'] == 'Greek Chicken'
+        app_module.supabase.table.assert_not_called()
+
+
+def post_stream(client, query='', headers=None, **body):
+    body.setdefault('user_id', 1)
+    response = client.post('/api/recommend' + query, data=json.dumps(body),
+                           content_type='application/json', headers=headers or {})
+    return response, response.get_data(as_text=True)
+
+
+class TestRecommendStreaming:
+    """Test suite for streamed /api/recommend responses"""
+
+    def test_ndjson_records(self, client, mock_backend):
+        """Test the header, ranked recipe and end records of an NDJSON stream"""
+        # Act
+        response, body = post_stream(client, '?stream=ndjson', max_cooking_time=50)
+        records = [json.loads(line) for line in body.splitlines()]
+
+        # Assert
+        assert response.mimetype == 'application/x-ndjson'
+        assert records[0]['type'] == 'header'
+        assert records[0]['total_candidates'] == 3
+        assert [(r['rank'], r['recipe']['id']) for r in records[1:-1]] == [(1, 3), (2, 1), (3, 4)]
+        assert records[-1] == {'type': 'end', 'count': 3}
+
+    def test_stream_matches_json_response(self, client, mock_backend):
+        """Test that a streamed result carries the same data as the JSON document"""
+        # Act
+        _, body = post_stream(client, headers={'Accept': 'application/x-ndjson'}, top_k=2)
+        app_module.response_cache.clear()
+        _, data = post_recommend(client, top_k=2)
+        records = [json.loads(line) for line in body.splitlines()]
+
+        # Assert
+        header = {k: v for k, v in records[0].items() if k != 'type'}
+        assert header == {k: v for k, v in data.items() if k != 'recipes'}
+        assert [r['recipe'] for r in records[1:-1]] == data['recipes']
+
+    def test_sse_events(self, client, mock_backend):
+        """Test that Accept: text/event-stream sends one event per record"""
+        # Act
+        response, body = post_stream(client, headers={'Accept': 'text/event-stream'})
+        events = [event.split('\n') for event in body.strip().split('\n\n')]
+
+        # Assert
+        assert response.mimetype == 'text/event-stream'
+        assert [lines[0] for lines in events] == ['event: header'] + ['event: recipe'] * 3 + ['event: end']
+        assert json.loads(events[1][1][len('data: '):])['rank'] == 1
+
+    def test_default_is_single_document(self, client, mock_backend):
+        """Test that browsers' default Accept still get one JSON document"""
+        # Act
+        response, _ = post_stream(client, headers={'Accept': '*/*'})
+
+        # Assert
+        assert response.mimetype == 'application/json'
+
+    def test_streamed_result_cached(self, client, mock_backend):
+        """Test that a finished stream is cached and cached results can be streamed"""
+        # Act
+        _, first = post_stream(client, '?stream=1')
+        _, second = post_stream(client, '?stream=1')
+
+        # Assert
+        assert second == first
+        assert app_module.response_cache.stats()['hits'] == 1
+        assert app_module.inference_telemetry.record.call_count == 1
+
+
+def post_batch(client, batch):
+    response = client.post('/api/recommend/batch', data=json.dumps({'requests': batch}),
+                           content_type='application/json')
+    return response, json.loads(response.data)
+
+
+class TestRecommendBatch:
+    """Test suite for /api/recommend/batch"""
+
+    @pytest.fixture
+    def users(self, mock_backend, backend_users):
+        """Three users fetched by the batch's single users query"""
+        app_module.supabase.table.return_value.select.return_value.in_.return_value \
+            .execute.return_value = Mock(data=backend_users)
+        return backend_users
+
+    def test_matches_single_requests(self, client, users):
+        """Test that each user's result equals their /api/recommend response"""
+        # Arrange
+        batch = [{'user_id': 1, 'max_cooking_time': 50},
+                 {'user_id': 2, 'search_ingredients': ['chicken'], 'top_k': 1},
+                 {'user_id': 3}]
+
+        # Act
+        response, data = post_batch(client, batch)
+        app_module.response_cache.clear()
+        singles = []
+        for item, row in zip(batch, users):
+            app_module.supabase.table.return_value.select.return_value.eq.return_value \
+                .execute.return_value = Mock(data=[row])
+            singles.append(post_recommend(client, **item)[1])
+
+        # Assert
+        assert response.status_code == 200
+        assert data['num_users'] == 3
+        for item, result, single in zip(batch, data['results'], singles):
+            assert result.pop('user_id') == item['user_id']
+            assert result == single
+        assert [r['id'] for r in data['results'][0]['recipes']] == [3, 1, 4]
+
+    def test_one_users_query_and_shared_scoring(self, client, users):
+        """Test that users are fetched together and scored in shared predict calls"""
+        # Act
+        _, data = post_batch(client, [{'user_id': 1}, {'user_id': 2}, {'user_id': 3}])
+
+        # Assert
+        select = app_module.supabase.table.return_value.select.return_value
+        select.in_.assert_called_once()
+        select.eq.assert_not_called()
+        # Identical rows across users are scored once, in one predict call
+        assert app_module.ml_model.predict.call_count == 1
+        app_module.inference_telemetry.record.assert_called_once()
+        run_name, params, metrics = app_module.inference_telemetry.record.call_args.args
+        assert run_name == 'batch_inference'
+        assert params['num_users'] == 3
+        assert metrics['users_per_second'] > 0
+        assert data['users_per_second'] > 0
+
+    def test_unknown_user_reported(self, client, users):
+        """Test that a missing user gets an error entry without failing the batch"""
+        # Act
+        response, data = post_batch(client, [{'user_id': 1}, {'user_id': 99}])
+
+        # Assert
+        assert response.status_code == 200
+        assert data['results'][1] == {'user_id': 99, 'error': 'User not found'}
+        assert len(data['results'][0]['recipes']) == 3
+
+    def test_results_cached_for_single_requests(self, client, users, backend_user):
+        """Test that a batch warms the cache used by /api/recommend"""
+        # Arrange
+        post_batch(client, [{'user_id': 1}])
+        app_module.supabase.table.return_value.select.return_value.eq.return_value \
+            .execute.return_value = Mock(data=[backend_user])
+
+        # Act
+        post_recommend(client)
+
+        # Assert
+        assert app_module.response_cache.stats()['hits'] == 1
+
+    def test_model_failure_uses_heuristic(self, client, users):
+        """Test that a failing model degrades to the heuristic ranking of /api/recommend"""
+        # Arrange
+        app_module.ml_model.predict = Mock(side_effect=RuntimeError('model down'))
+
+        # Act
+        response, data = post_batch(client, [{'user_id': 1}])
+
+        # Assert - same ranking and scores as test_model_failure_uses_heuristic
+        result = data['results'][0]
+        assert response.status_code == 200
+        assert [r['ml_score'] for r in result['recipes']] == [0.646, 0.54, 0.48]
+        assert result['partial'] is True
+        assert app_module.response_cache.stats()['size'] == 0
+
+    def test_missing_model_serves_heuristic(self, client, users):
+        """Test that a batch is answered without a loaded model"""
+        # Act
+        with patch.object(app_module, 'ml_model', None):
+            response, data = post_batch(client, [{'user_id': 1}, {'user_id': 2}])
+
+        # Assert
+        assert response.status_code == 200
+        assert [r['id'] for r in data['results'][0]['recipes']] == [3, 1, 4]
+        assert all(r['ml_score'] > 0 for r in data['results'][1]['recipes'])
+        assert data['results'][1]['partial'] is True
+
+    @pytest.mark.parametrize('batch', [[], [{'top_k': 3}], [{'user_id': 1, 'top_k': 0}]])
+    def test_invalid_batch(self, client, users, batch):
+        """Test that an empty batch, a missing user_id or a bad option is rejected"""
+        # Act
+        response, _ = post_batch(client, batch)
+
+        # Assert
+        assert response.status_code == 400
+
+    def test_batch_size_limit(self, client, users):
+        """Test that batches above RECOMMEND_BATCH_MAX_USERS are rejected"""
+        # Arrange
+        with patch.object(app_module, 'RECOMMEND_BATCH_MAX_USERS', 2):
+            # Act
+            response, _ = post_batch(client, [{'user_id': 1}, {'user_id': 2}, {'user_id': 3}])
+
+        # Assert
+        assert response.status_code == 400
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,221 @@
+"""
+Unit Test: Precomputed Recommendation Store
+Tests preset matching, staleness checks, checkpoint/resume of the
+precompute job and serving from the store in /api/recommend
+"""
+import pytest
+import json
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from app import app
+from recommendation_store import RecommendationStore, preset_key
+from precompute_recommendations import precompute
+
+
+def payload(ids):
+    return {'recipes': [{'id': i} for i in ids], 'total_candidates': len(ids), 'top_k': len(ids),
+            'stage_sizes': {'filtered': len(ids), 'shortlisted': len(ids), 'returned': len(ids)}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    clock = Mock(return_value=1000.0)
+    store = RecommendationStore(str(tmp_path / 'store.db'), max_age=100, clock=clock)
+    store.put_many([(1, {'italian'}, 60, 3, 'profile-1', 'catalog-1', None, payload([5, 2, 9]))])
+    return store
+
+
+class TestRecommendationStore:
+    """Test suite for RecommendationStore"""
+
+    def test_exact_preset_served(self, store):
+        """Test that a matching preset with equal versions is served"""
+        # Act
+        result = store.get('1', {'italian'}, 60.0, 3, 'profile-1', 'catalog-1', None)
+
+        # Assert
+        assert result == payload([5, 2, 9])
+        assert store.stats()['hits'] == 1
+
+    def test_smaller_top_k_is_prefix(self, store):
+        """Test that a smaller top_k gets the best recipes of the stored ranking"""
+        # Act
+        result = store.get(1, {'italian'}, 60, 2, 'profile-1', 'catalog-1', None)
+
+        # Assert
+        assert [r['id'] for r in result['recipes']] == [5, 2]
+        assert result['top_k'] == 2
+        assert result['stage_sizes'] == {'filtered': 3, 'shortlisted': 3, 'returned': 2}
+
+    @pytest.mark.parametrize('cuisines, minutes, top_k', [
+        ({'italian'}, 45, 3), (set(), 60, 3), ({'italian', 'greek'}, 60, 3), ({'italian'}, 60, 4),
+        ({'italian'}, 'soon', 3)])
+    def test_non_matching_requests_missed(self, store, cuisines, minutes, top_k):
+        """Test that other presets and larger top_k values fall back to live scoring"""
+        # Act & Assert
+        assert store.get(1, cuisines, minutes, top_k, 'profile-1', 'catalog-1', None) is None
+
+    @pytest.mark.parametrize('profile, catalog, model', [
+        ('profile-2', 'catalog-1', None), ('profile-1', 'catalog-2', None), ('profile-1', 'catalog-1', 'm2')])
+    def test_changed_versions_stale(self, store, profile, catalog, model):
+        """Test that a changed profile, catalog or model invalidates the entry"""
+        # Act & Assert
+        assert store.get(1, {'italian'}, 60, 3, profile, catalog, model) is None
+        assert store.stats()['stale'] == 1
+
+    def test_max_age(self, store):
+        """Test that entries older than max_age are not served"""
+        # Arrange
+        store._clock.return_value = 1101.0
+
+        # Act & Assert
+        assert store.get(1, {'italian'}, 60, 3, 'profile-1', 'catalog-1', None) is None
+
+    def test_checkpoint(self, store):
+        """Test that a checkpoint saved with a page is read back"""
+        # Act
+        store.put_many([], checkpoint=('job', 42, 7))
+        before = store.checkpoint('job')
+        store.finish('job', 9)
+
+        # Assert
+        assert before == ('42', 7, False)
+        assert store.checkpoint('job') == ('42', 9, True)
+        assert store.checkpoint('other') == (None, 0, False)
+
+    def test_preset_key(self):
+        """Test that cuisine order and numeric type do not change the key"""
+        # Act & Assert
+        assert preset_key({'thai', 'greek'}, 60) == preset_key(['greek', 'thai'], '60.0')
+
+
+PRESETS = [([], 50), (['italian'], 30)]
+
+
+def fetch_from(users):
+    """Fake users pager recording the `after` value of every call"""
+    calls = []
+
+    def fetch(after, limit):
+        calls.append(after)
+        rest = [u for u in users if after is None or u['id'] > int(after)]
+        return rest[:limit]
+    fetch.calls = calls
+    return fetch
+
+
+@pytest.fixture
+def backend_store(tmp_path):
+    """Empty store patched in as the app's precomputed_store"""
+    return RecommendationStore(str(tmp_path / 'store.db'))
+
+
+@pytest.fixture
+def backend(patched_backend):
+    """Store of the patched app globals (see patched_backend in conftest.py)"""
+    return patched_backend.store
+
+
+class TestPrecomputeJob:
+    """Test suite for the precompute job and serving its results"""
+
+    def test_job_fills_store(self, backend, backend_users):
+        """Test that every user x preset is stored with the live payload"""
+        # Act
+        stored = precompute(backend, presets=PRESETS, top_k=10, users_per_batch=2,
+                            fetch_users=fetch_from(backend_users))
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            response = client.post('/api/recommend', data=json.dumps(
+                {'user_id': 1, 'max_cooking_time': 50, 'top_k': 2}), content_type='application/json')
+        data = json.loads(response.data)
+
+        # Assert
+        assert stored == 3
+        assert [r['id'] for r in data['recipes']] == [3, 1]
+        assert data['top_k'] == 2
+        assert data['stage_sizes']['returned'] == 2
+        assert backend.stats()['hits'] == 1
+        app_module.inference_telemetry.record.assert_not_called()
+
+    def test_stored_payload_matches_live(self, backend, backend_users):
+        """Test that a stored payload equals the one live scoring returns"""
+        # Arrange
+        precompute(backend, presets=PRESETS, top_k=10, fetch_users=fetch_from(backend_users))
+        catalog = app_module.recipe_catalog.get_snapshot()
+
+        # Act
+        stored = backend.get(2, {'italian'}, 30, 10, app_module.profile_fingerprint(backend_users[1]),
+                             catalog.fingerprint(), None)
+        with patch.object(app_module, 'precomputed_store', None):
+            app_module.supabase.table.return_value.select.return_value.eq.return_value \
+                .execute.return_value = Mock(data=[backend_users[1]])
+            with app.test_client() as client:
+                live = json.loads(client.post('/api/recommend', data=json.dumps(
+                    {'user_id': 2, 'preferred_cuisine': ['Italian'], 'max_cooking_time': 30, 'top_k': 10}),
+                    content_type='application/json').data)
+
+        # Assert
+        assert stored == live
+
+    def test_failed_scores_not_stored(self, backend, backend_users, backend_user):
+        """Test that heuristic (partial) payloads from a failing model are left to live scoring"""
+        # Arrange
+        app_module.ml_model.predict = Mock(side_effect=RuntimeError('model down'))
+
+        # Act
+        precompute(backend, presets=PRESETS, top_k=10, fetch_users=fetch_from(backend_users))
+
+        # Assert
+        catalog = app_module.recipe_catalog.get_snapshot()
+        assert backend.get(1, set(), 50, 10, app_module.profile_fingerprint(backend_user),
+                           catalog.fingerprint(), None) is None
+
+    def test_resume_after_interruption(self, backend, backend_users):
+        """Test that a second run continues after the last stored page"""
+        # Arrange
+        failing = fetch_from(backend_users)
+
+        def interrupted(after, limit):
+            if after is not None:
+                raise RuntimeError('connection lost')
+            return failing(after, limit)
+
+        with pytest.raises(RuntimeError):
+            precompute(backend, presets=PRESETS, users_per_batch=2, fetch_users=interrupted)
+        resumed = fetch_from(backend_users)
+
+        # Act
+        stored = precompute(backend, presets=PRESETS, users_per_batch=2, fetch_users=resumed)
+        again = precompute(backend, presets=PRESETS, users_per_batch=2, fetch_users=fetch_from(backend_users))
+
+        # Assert
+        assert resumed.calls[0] == '2'
+        assert stored == 1
+        assert again == 0
+
+    def test_changed_profile_scored_live(self, backend, backend_users, backend_user):
+        """Test that a user whose profile changed after the job is scored live"""
+        # Arrange
+        precompute(backend, presets=PRESETS, fetch_users=fetch_from(backend_users))
+        app_module.supabase.table.return_value.select.return_value.eq.return_value \
+            .execute.return_value = Mock(data=[dict(backend_user, updated_at='2026-10-17T00:00:00')])
+
+        # Act
+        with app.test_client() as client:
+            client.post('/api/recommend', data=json.dumps({'user_id': 1, 'max_cooking_time': 50}),
+                        content_type='application/json')
+
+        # Assert
+        assert backend.stats()['stale'] == 1
+        app_module.inference_telemetry.record.assert_called_once()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
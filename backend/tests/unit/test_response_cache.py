@@ -0,0 +1,152 @@
+"""
+Unit Test: Recommendation Response Cache
+Tests keying, TTL, LRU eviction and invalidation of cached responses
+"""
+import pytest
+from unittest.mock import Mock
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import ResponseCache, request_key, profile_fingerprint
+
+MODEL = Mock()
+USER = {'id': 1, 'allergies': ['Peanuts'], 'disliked_ingredients': [], 'diet': 'regular'}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def key(user_id=1, **overrides):
+    args = dict(cuisines={'italian', 'thai'}, max_cooking_time=30, search_ingredients={'chicken'}, top_k=10)
+    args.update(overrides)
+    return request_key(user_id, profile_fingerprint(USER), **args)
+
+
+class TestRequestKey:
+    """Test suite for request_key and profile_fingerprint"""
+
+    def test_set_order_does_not_matter(self):
+        """Test that the key is canonical for equal sets"""
+        # Act & Assert
+        assert key(cuisines={'thai', 'italian'}) == key(cuisines={'italian', 'thai'})
+
+    def test_every_field_changes_key(self):
+        """Test that each request field is part of the key"""
+        # Arrange
+        base = key()
+
+        # Act
+        variants = [key(user_id=2), key(cuisines={'thai'}), key(max_cooking_time=45),
+                    key(search_ingredients=set()), key(top_k=5)]
+
+        # Assert
+        assert all(variant != base for variant in variants)
+
+    def test_profile_fingerprint(self):
+        """Test that only recommendation-relevant profile fields are fingerprinted"""
+        # Act & Assert
+        assert profile_fingerprint(USER) == profile_fingerprint(dict(USER, name='Renamed'))
+        assert profile_fingerprint(USER) == profile_fingerprint(dict(USER, allergies=[' peanuts']))
+        assert profile_fingerprint(USER) != profile_fingerprint(dict(USER, diet='vegan'))
+
+
+class TestResponseCache:
+    """Test suite for ResponseCache"""
+
+    def test_hit_and_miss_counters(self):
+        """Test get/put round trip and counters"""
+        # Arrange
+        cache = ResponseCache(max_size=4, ttl=60)
+
+        # Act
+        first = cache.get('k', MODEL, 1)
+        cache.put('k', 1, {'recipes': []}, MODEL, 1)
+        second = cache.get('k', MODEL, 1)
+
+        # Assert
+        assert first is None
+        assert second == {'recipes': []}
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL"""
+        # Arrange
+        clock = FakeClock()
+        cache = ResponseCache(max_size=4, ttl=60, clock=clock)
+        cache.put('k', 1, {'recipes': []}, MODEL, 1)
+
+        # Act
+        clock.now = 61
+        result = cache.get('k', MODEL, 1)
+
+        # Assert
+        assert result is None
+        assert cache.stats()['expirations'] == 1
+        assert cache.stats()['size'] == 0
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted"""
+        # Arrange
+        cache = ResponseCache(max_size=2, ttl=60)
+        cache.put('a', 1, 'A', MODEL, 1)
+        cache.put('b', 1, 'B', MODEL, 1)
+        cache.get('a', MODEL, 1)
+
+        # Act
+        cache.put('c', 1, 'C', MODEL, 1)
+
+        # Assert
+        assert cache.get('b', MODEL, 1) is None
+        assert cache.get('a', MODEL, 1) == 'A'
+        assert cache.stats()['evictions'] == 1
+
+    def test_invalidate_user(self):
+        """Test that only the given user's entries are dropped"""
+        # Arrange
+        cache = ResponseCache(max_size=8, ttl=60)
+        cache.put('a', 1, 'A', MODEL, 1)
+        cache.put('b', '1', 'B', MODEL, 1)
+        cache.put('c', 2, 'C', MODEL, 1)
+
+        # Act
+        cache.invalidate_user(1)
+
+        # Assert
+        assert cache.get('a', MODEL, 1) is None
+        assert cache.get('b', MODEL, 1) is None
+        assert cache.get('c', MODEL, 1) == 'C'
+
+    def test_catalog_or_model_change_clears(self):
+        """Test that a new catalog version or model drops all entries"""
+        # Arrange
+        cache = ResponseCache(max_size=8, ttl=60)
+        cache.put('a', 1, 'A', MODEL, 1)
+
+        # Act & Assert
+        assert cache.get('a', MODEL, 2) is None
+        cache.put('a', 1, 'A', MODEL, 2)
+        assert cache.get('a', Mock(), 2) is None
+
+    def test_disabled_cache(self):
+        """Test that max_size=0 stores nothing"""
+        # Arrange
+        cache = ResponseCache(max_size=0, ttl=60)
+
+        # Act
+        cache.put('a', 1, 'A', MODEL, 1)
+
+        # Assert
+        assert cache.get('a', MODEL, 1) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,126 @@
+"""
+Unit Test: Two-Stage Retrieval
+Tests the first-stage prior, shortlist selection, recall@K and the stage
+sizes reported by /api/recommend
+"""
+import pytest
+import json
+import numpy as np
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import retrieval
+from app import app
+from recipe_catalog import CatalogSnapshot
+from retrieval import prior_scores, shortlist, recall_at_k
+
+
+RECIPES = [
+    {'id': 1, 'recipe_name': 'Chicken Pasta', 'cuisine': 'Italian', 'diet': 'regular',
+     'cook_time_minutes': 30, 'rating': 4.5, 'ingredients_list': "['chicken breast', 'pasta']"},
+    {'id': 2, 'recipe_name': 'Lasagna', 'cuisine': 'Italian', 'diet': 'regular',
+     'cook_time_minutes': 120, 'rating': 5.0, 'ingredients_list': "['pasta', 'beef']"},
+    {'id': 3, 'recipe_name': 'Greek Chicken', 'cuisine': 'Greek', 'diet': 'regular',
+     'cook_time_minutes': 55, 'ingredients_list': "['chicken thighs', 'lemon']"},
+    {'id': 4, 'recipe_name': 'Tofu Stir Fry', 'cuisine': 'Chinese', 'diet': 'regular',
+     'cook_time_minutes': 15, 'rating': 3.0, 'ingredients_list': "['tofu', 'broccoli']"},
+]
+
+
+class TestShortlist:
+    """Test suite for the first-stage prior and shortlist"""
+
+    def test_prior_terms(self):
+        """Test boosts, rating and time distance in the prior"""
+        # Arrange
+        catalog = CatalogSnapshot(RECIPES)
+
+        # Act
+        prior = prior_scores(catalog, [0, 1, 2, 3], np.array([1, 0, 6, 0]), np.array([0, 90, 25, 45]),
+                             np.array([True, True, False, False]))
+
+        # Assert - 3: 6 matches stay above apply_boosts' 1.0 cap; missing rating counts as 4.0
+        assert prior == pytest.approx([0.2 + 0.15 + 0.1 + 0.09, 0.1 + 0.1 - 0.09,
+                                       1.2 + 0.05 + 0.08 - 0.025, 0.06 - 0.045])
+
+    def test_best_candidates_kept_in_row_order(self):
+        """Test that the shortlist holds the best-prior rows, sorted by position"""
+        # Arrange
+        catalog = CatalogSnapshot(RECIPES)
+
+        # Act
+        keep = shortlist(catalog, [0, 1, 2, 3], np.zeros(4), np.array([50, 0, 3, 40]),
+                         np.zeros(4, dtype=bool), size=2)
+
+        # Assert
+        assert keep.tolist() == [1, 2]
+
+    @pytest.mark.parametrize('size', [0, 4, 10])
+    def test_disabled_or_larger_than_pool(self, size):
+        """Test that size 0 or >= the candidate count keeps everything"""
+        # Act
+        keep = shortlist(CatalogSnapshot(RECIPES), [0, 1, 2, 3], np.zeros(4), np.zeros(4),
+                         np.zeros(4, dtype=bool), size=size)
+
+        # Assert
+        assert keep.tolist() == [0, 1, 2, 3]
+
+    def test_recall_at_k(self):
+        """Test recall of a candidate top-K against the full top-K"""
+        # Act & Assert
+        assert recall_at_k([1, 2, 3, 4], [4, 9, 1, 7]) == 0.5
+        assert recall_at_k([], [1]) == 1.0
+
+
+class TestTwoStageEndpoint:
+    """Test suite for the two-stage pipeline in /api/recommend"""
+
+    @pytest.fixture
+    def backend_recipes(self):
+        return RECIPES
+
+    @pytest.fixture
+    def backend_user(self):
+        return {'id': 1, 'allergies': [], 'disliked_ingredients': [], 'diet': 'regular'}
+
+    @pytest.fixture
+    def client(self, patched_backend):
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+
+    def recommend(self, client, **body):
+        response = client.post('/api/recommend', data=json.dumps(dict(user_id=1, **body)),
+                               content_type='application/json')
+        return json.loads(response.data)
+
+    def test_only_shortlist_scored(self, client):
+        """Test that only the shortlisted candidates reach the model"""
+        # Arrange
+        with patch.object(retrieval, 'RECOMMEND_SHORTLIST_SIZE', 2):
+            # Act
+            data = self.recommend(client, max_cooking_time=120, top_k=1)
+
+        # Assert
+        assert data['stage_sizes'] == {'filtered': 4, 'shortlisted': 2, 'returned': 1}
+        assert data['total_candidates'] == 4
+        assert data['total_scored'] == 2
+        assert len(app_module.ml_model.predict.call_args.args[0]) == 2
+        assert [r['id'] for r in data['recipes']] == [2]
+
+    def test_stage_sizes_without_shortlist(self, client):
+        """Test that the default pipeline scores every filtered candidate"""
+        # Act
+        data = self.recommend(client, top_k=3)
+
+        # Assert
+        assert data['stage_sizes'] == {'filtered': 4, 'shortlisted': 4, 'returned': 3}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,131 @@
+"""
+Unit Test: Score Lookup Table
+Tests grid lookups, the measured quantization error and the model fallback
+for off-grid rows with a mocked model
+"""
+import pytest
+import numpy as np
+from unittest.mock import Mock
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from score_table import ScoreTable, score_candidates, overlap_values
+
+
+def step_model():
+    """Mock model that is piecewise constant in the overlap ratio, like a tree ensemble"""
+    def predict(df):
+        values = df.to_numpy(dtype=np.float64)
+        scores = 0.1 + 0.2 * (values[:, 3] >= 0.5) + 0.1 * values[:, 4] - 0.001 * values[:, 2]
+        # float32 outputs, like XGBoost
+        return scores.astype(np.float32).tolist()
+
+    model = Mock()
+    model.metadata.get_input_schema.return_value = None
+    model.predict = Mock(side_effect=predict)
+    return model
+
+
+def features(rows):
+    matrix = np.array(rows, dtype=np.float32)
+    return np.column_stack([matrix[:, 0], matrix[:, 1], np.abs(matrix[:, 1] - matrix[:, 0]),
+                            matrix[:, 2], matrix[:, 3]]).astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def table():
+    return ScoreTable.build(step_model(), max_ingredients=12, max_times=[15, 30, 60], max_cook_time=120)
+
+
+class TestScoreTable:
+    """Test suite for ScoreTable"""
+
+    def test_grid_rows_equal_model(self, table):
+        """Test that rows on the grid return exactly the model's score"""
+        # Arrange - (max_time, cook_time, overlap, cuisine)
+        matrix = features([[60, 45, 0.5, 1], [15, 0, 0.0, 0], [30, 120, 1.0, 1], [60, 55, 5 / 7, 0]])
+
+        # Act
+        scores, in_grid = table.lookup(matrix)
+
+        # Assert
+        expected, _ = score_candidates(step_model(), matrix)
+        assert in_grid.all()
+        assert scores.tolist() == expected
+
+    def test_quantization_error_measured(self, table):
+        """Test that the build reports the measured error, zero for reachable ratios"""
+        # Assert
+        assert table.max_error == 0.0
+        assert table.stats()['cells'] == 3 * 121 * len(overlap_values(12)) * 2
+
+    def test_error_bound_enforced(self):
+        """Test that a table that does not reproduce the model is rejected"""
+        # Arrange - a model whose scores change between calls
+        rng = np.random.default_rng(3)
+        model = Mock()
+        model.metadata.get_input_schema.return_value = None
+        model.predict = Mock(side_effect=lambda df: rng.random(len(df)).tolist())
+
+        # Act & Assert
+        with pytest.raises(ValueError, match='Quantization error'):
+            ScoreTable.build(model, max_ingredients=4, max_times=[60], max_cook_time=10,
+                             max_error=0.01, check_rows=200)
+
+    def test_overlap_values(self):
+        """Test the reachable usable / total ratios"""
+        # Act & Assert
+        assert overlap_values(3).tolist() == pytest.approx([0, 1 / 3, 0.5, 2 / 3, 1])
+
+    def test_off_grid_rows(self, table):
+        """Test that fractional or out-of-range times and unreachable ratios are not looked up"""
+        # Arrange
+        matrix = features([[47.5, 30, 0.5, 1], [60, 30.5, 0.5, 1], [60, 300, 0.5, 1], [90, 30, 0.5, 1],
+                           [60, 30, 6 / 13, 1]])
+
+        # Act
+        _, in_grid = table.lookup(matrix)
+
+        # Assert
+        assert not in_grid.any()
+
+
+class TestScoreCandidates:
+    """Test suite for score_candidates"""
+
+    def test_off_grid_rows_scored_by_model(self, table):
+        """Test that only off-grid rows reach the model"""
+        # Arrange
+        model = table.model
+        model.predict.reset_mock()
+        matrix = features([[60, 30, 0.5, 1], [47.5, 30, 0.5, 1]])
+
+        # Act
+        scores, errors = score_candidates(model, matrix, table)
+
+        # Assert
+        assert model.predict.call_count == 1
+        assert len(model.predict.call_args.args[0]) == 1
+        assert scores[0] == pytest.approx(0.1 + 0.2 + 0.1 - 0.03)
+        assert scores[1] == pytest.approx(0.1 + 0.2 + 0.1 - 0.0175)
+        assert errors == {}
+
+    def test_table_for_other_model_ignored(self, table):
+        """Test that a table built for a previous model is not used"""
+        # Arrange
+        reloaded = Mock()
+        reloaded.metadata.get_input_schema.return_value = None
+        reloaded.predict = Mock(side_effect=lambda df: [0.9] * len(df))
+
+        # Act
+        scores, _ = score_candidates(reloaded, features([[60, 30, 0.5, 1]]), table)
+
+        # Assert
+        assert scores == [0.9]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,226 @@
+"""
+Unit Test: Shared Memory-Mapped Recipe Catalog
+Tests saving and mapping catalog snapshots, atomic version switches, and
+leader/follower workers sharing one snapshot directory
+"""
+import pytest
+import numpy as np
+import json
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shared_catalog
+from recipe_catalog import CatalogSnapshot, RecipeCatalog
+from shared_catalog import SharedCatalogDir
+
+
+def stamped(recipes, stamp='2026-10-01T00:00:00+00:00'):
+    return [dict(r, updated_at=stamp) for r in recipes]
+
+
+class TestSnapshotFiles:
+    """Test suite for CatalogSnapshot.save and CatalogSnapshot.load"""
+
+    def test_round_trip(self, test_recipes_data, tmp_path):
+        """Test that a mapped snapshot answers every query like the original"""
+        # Arrange
+        original = CatalogSnapshot(stamped(test_recipes_data), version=4)
+        original.save(str(tmp_path / 'v4'))
+
+        # Act
+        mapped = CatalogSnapshot.load(str(tmp_path / 'v4'))
+
+        # Assert
+        assert isinstance(mapped.ingredient_bitmaps, np.memmap)
+        assert mapped.version == 4
+        assert mapped.fingerprint() == original.fingerprint()
+        assert list(mapped.records) == original.records
+        assert mapped.ingredient_lists[2] == original.ingredient_lists[2]
+        assert mapped.ingredient_sets[0] == original.ingredient_sets[0]
+        assert mapped.filter_rows('greek', 20).tolist() == original.filter_rows('greek', 20).tolist()
+        assert mapped.search_match_counts({'tom', 'ol'}).tolist() == \
+            original.search_match_counts({'tom', 'ol'}).tolist()
+        assert (mapped.exclude_ingredients(['feta']) == original.exclude_ingredients(['feta'])).all()
+        assert mapped.updated_at_max == original.updated_at_max
+
+    def test_id_lookup(self, test_recipes_data, tmp_path):
+        """Test that the array-backed id index behaves like the row_by_id dict"""
+        # Arrange
+        CatalogSnapshot(list(reversed(test_recipes_data))).save(str(tmp_path / 'v1'))
+
+        # Act
+        mapped = CatalogSnapshot.load(str(tmp_path / 'v1'))
+
+        # Assert
+        assert mapped.row_by_id.get(3) == 0
+        assert mapped.get(1)['recipe_name'] == 'Vegetarian Pasta'
+        assert mapped.row_by_id.get(99) is None
+        assert mapped.row_by_id.get('1') is None
+        assert dict(mapped.row_by_id.items()) == {3: 0, 2: 1, 1: 2}
+
+    def test_empty_catalog(self, tmp_path):
+        """Test that an empty snapshot can be saved and mapped"""
+        # Arrange
+        CatalogSnapshot([]).save(str(tmp_path / 'v1'))
+
+        # Act
+        mapped = CatalogSnapshot.load(str(tmp_path / 'v1'))
+
+        # Assert
+        assert len(mapped) == 0
+        assert mapped.filter_rows().tolist() == []
+
+    def test_changes_applied_to_mapped_snapshot(self, test_recipes_data, tmp_path):
+        """Test that a delta on a mapped snapshot gives the same rows as on the original"""
+        # Arrange
+        original = CatalogSnapshot(test_recipes_data)
+        original.save(str(tmp_path / 'v1'))
+        mapped = CatalogSnapshot.load(str(tmp_path / 'v1'))
+        edited = dict(test_recipes_data[0], ingredients_list="['rice']")
+
+        # Act
+        new = mapped.apply_changes([edited], [2], version=2)
+
+        # Assert
+        assert list(new.records) == original.apply_changes([edited], [2], version=2).records
+        assert new.search_match_counts({'rice'}).tolist() == [1, 0]
+
+    def test_mapped_delta_decodes_only_changed_rows(self, test_recipes_data, tmp_path):
+        """Test that a delta on a mapped snapshot copies the other rows without decoding them"""
+        # Arrange
+        CatalogSnapshot(test_recipes_data).save(str(tmp_path / 'v1'))
+        mapped = CatalogSnapshot.load(str(tmp_path / 'v1'))
+        edited = dict(test_recipes_data[2], ingredients_list="['rice', 'feta']")
+        inserted = dict(test_recipes_data[0], id=0, recipe_name='First')
+        expected = CatalogSnapshot([inserted, test_recipes_data[0], edited], version=2)
+
+        # Act
+        with patch('recipe_catalog.json.loads', wraps=json.loads) as loads:
+            new = mapped.apply_changes([edited, inserted], [2], version=2)
+            new.save(str(tmp_path / 'v2'))
+        reloaded = CatalogSnapshot.load(str(tmp_path / 'v2'))
+
+        # Assert
+        # Stored rows are decoded from bytes; the upserts' ingredient strings are str
+        assert not [call for call in loads.call_args_list if isinstance(call.args[0], bytes)]
+        for snapshot in (new, reloaded):
+            assert list(snapshot.records) == expected.records
+            assert list(snapshot.ingredient_lists) == expected.ingredient_lists
+            assert list(snapshot.ingredient_sets) == expected.ingredient_sets
+            assert snapshot.fingerprint() == expected.fingerprint()
+            assert snapshot.get(3) == edited
+            assert snapshot.search_match_counts({'feta'}).tolist() == \
+                expected.search_match_counts({'feta'}).tolist()
+
+
+class TestSharedCatalogDir:
+    """Test suite for publishing versions to a shared directory"""
+
+    def test_publish_switches_current(self, test_recipes_data, tmp_path):
+        """Test that publishing makes the new version current and returns it mapped"""
+        # Arrange
+        shared = SharedCatalogDir(str(tmp_path))
+
+        # Act
+        with shared.publish_lock():
+            mapped = shared.publish(CatalogSnapshot(test_recipes_data, version=7))
+
+        # Assert
+        assert shared.current() == 7
+        assert isinstance(mapped.ids, np.memmap)
+        assert shared.load().ids.tolist() == [1, 2, 3]
+        assert not [name for name in os.listdir(tmp_path) if 'tmp' in name]
+
+    def test_old_versions_removed(self, test_recipes_data, tmp_path):
+        """Test that only the newest SHARED_KEEP_VERSIONS versions stay on disk"""
+        # Arrange
+        shared = SharedCatalogDir(str(tmp_path))
+
+        # Act
+        for version in range(1, 6):
+            shared.publish(CatalogSnapshot(test_recipes_data, version=version))
+
+        # Assert
+        kept = sorted(name for name in os.listdir(tmp_path) if name.startswith('v'))
+        assert len(kept) == shared_catalog.SHARED_KEEP_VERSIONS
+        assert kept[-1] == 'v00000005'
+
+    @pytest.mark.skipif(shared_catalog.fcntl is None, reason='needs fcntl')
+    def test_single_leader(self, tmp_path):
+        """Test that only one holder of the directory can be leader"""
+        # Arrange
+        first = SharedCatalogDir(str(tmp_path))
+        second = SharedCatalogDir(str(tmp_path))
+
+        # Act & Assert
+        assert first.try_lead()
+        assert first.try_lead()
+        assert not second.try_lead()
+
+
+class TestSharedRecipeCatalog:
+    """Test suite for RecipeCatalog workers sharing one snapshot directory"""
+
+    def test_second_worker_maps_without_fetching(self, test_recipes_data, tmp_path):
+        """Test that only the first worker downloads the table"""
+        # Arrange
+        first_fetch = Mock(return_value=test_recipes_data)
+        second_fetch = Mock(return_value=test_recipes_data)
+        first = RecipeCatalog(first_fetch, refresh_seconds=0, shared=SharedCatalogDir(str(tmp_path)))
+        second = RecipeCatalog(second_fetch, refresh_seconds=0, shared=SharedCatalogDir(str(tmp_path)))
+
+        # Act
+        leader_snapshot = first.get_snapshot()
+        follower_snapshot = second.get_snapshot()
+
+        # Assert
+        first_fetch.assert_called_once()
+        second_fetch.assert_not_called()
+        assert follower_snapshot.version == leader_snapshot.version == 1
+        assert follower_snapshot.fingerprint() == CatalogSnapshot(test_recipes_data).fingerprint()
+
+    def test_follower_picks_up_leader_sync(self, test_recipes_data, tmp_path):
+        """Test that a delta synced by the leader reaches the follower under the same version"""
+        # Arrange
+        rows = stamped(test_recipes_data)
+        edited = dict(rows[1], recipe_name='Village Salad', updated_at='2026-10-02T00:00:00+00:00')
+        leader = RecipeCatalog(Mock(return_value=rows), refresh_seconds=0,
+                               fetch_changes_fn=Mock(return_value=[edited]),
+                               shared=SharedCatalogDir(str(tmp_path)))
+        follower = RecipeCatalog(Mock(), refresh_seconds=0, shared=SharedCatalogDir(str(tmp_path)))
+        leader.get_snapshot()
+        old = follower.get_snapshot()
+
+        # Act
+        synced = leader.sync(check_deletes=False)
+        new = follower.follow()
+
+        # Assert
+        assert synced.version == new.version == 2
+        assert new.get(2)['recipe_name'] == 'Village Salad'
+        assert old.get(2)['recipe_name'] == 'Greek Salad'
+        assert follower.follow() is new
+        assert follower.stats()['follows'] == 1
+
+    def test_refresh_publishes_next_version(self, test_recipes_data, tmp_path):
+        """Test that a full reload is published above the current version"""
+        # Arrange
+        fetch = Mock(side_effect=[test_recipes_data, test_recipes_data[:2]])
+        shared = SharedCatalogDir(str(tmp_path))
+        catalog = RecipeCatalog(fetch, refresh_seconds=0, shared=shared)
+        catalog.get_snapshot()
+
+        # Act
+        new = catalog.refresh()
+
+        # Assert
+        assert new.version == shared.current() == 2
+        assert len(shared.load()) == 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
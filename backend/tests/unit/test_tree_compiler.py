@@ -0,0 +1,166 @@
+"""
+Unit Test: Compiled Tree Evaluator
+Parity of the pure-NumPy tree ensemble with XGBoost on small trained models
+"""
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+xgb = pytest.importorskip('xgboost')
+
+import pandas as pd
+import model_loader
+from model_loader import (FEATURE_COLUMNS, CompiledTreeScorer, NativeXGBoostScorer,
+                          load_scoring_model, parity_probe_matrix)
+from tree_compiler import CompiledTreeEnsemble, compile_booster
+
+
+def training_data(rows=500, seed=2):
+    X = parity_probe_matrix(rows=rows, seed=seed)
+    y = np.clip(0.3 * X[:, 4] + 0.5 * X[:, 3] - X[:, 2] / 400, 0, 1)
+    return X, y
+
+
+class TestCompileBooster:
+    """Test suite for compile_booster and CompiledTreeEnsemble"""
+
+    @pytest.mark.parametrize('params', [
+        {'objective': 'reg:squarederror', 'max_depth': 4},
+        {'objective': 'reg:logistic', 'max_depth': 3},
+        {'objective': 'reg:squarederror', 'max_depth': 6, 'base_score': 0.25},
+    ])
+    def test_matches_xgboost(self, params):
+        """Test that compiled predictions equal Booster.predict"""
+        # Arrange
+        X, y = training_data()
+        model = xgb.XGBRegressor(n_estimators=30, learning_rate=0.3, **params).fit(X, y)
+        probe = parity_probe_matrix(rows=300, seed=9)
+
+        # Act
+        compiled = compile_booster(model)
+
+        # Assert
+        assert compiled.num_trees == 30
+        np.testing.assert_allclose(compiled.predict(probe), model.predict(probe), atol=1e-6)
+
+    def test_named_features_and_missing_values(self):
+        """Test named splits and the default direction for NaN inputs"""
+        # Arrange
+        X, y = training_data()
+        X[::7, 1] = np.nan
+        frame = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        model = xgb.XGBRegressor(n_estimators=15, max_depth=4).fit(frame, y)
+        probe = parity_probe_matrix(rows=100, seed=4)
+        probe[::3, 1] = np.nan
+
+        # Act
+        compiled = compile_booster(model, FEATURE_COLUMNS)
+
+        # Assert
+        np.testing.assert_allclose(compiled.predict(probe),
+                                   model.predict(pd.DataFrame(probe, columns=FEATURE_COLUMNS)),
+                                   atol=1e-6)
+
+    def test_save_and_load(self, tmp_path):
+        """Test that a compiled ensemble round-trips through .npz"""
+        # Arrange
+        X, y = training_data()
+        compiled = compile_booster(xgb.XGBRegressor(n_estimators=5, max_depth=3).fit(X, y))
+        path = str(tmp_path / 'model.npz')
+
+        # Act
+        compiled.save(path)
+        loaded = CompiledTreeEnsemble.load(path)
+
+        # Assert
+        np.testing.assert_array_equal(loaded.predict(X), compiled.predict(X))
+        assert loaded.objective == compiled.objective
+
+    def test_unsupported_model_rejected(self):
+        """Test that multi-class models are not compiled"""
+        # Arrange
+        X, _ = training_data()
+        labels = (X[:, 0] // 60).astype(int) % 3
+        model = xgb.XGBClassifier(n_estimators=3, max_depth=2).fit(X, labels)
+
+        # Act & Assert
+        with pytest.raises(ValueError):
+            compile_booster(model)
+
+    def test_empty_matrix(self):
+        """Test scoring zero rows"""
+        # Arrange
+        X, y = training_data()
+        compiled = compile_booster(xgb.XGBRegressor(n_estimators=3, max_depth=2).fit(X, y))
+
+        # Act & Assert
+        assert compiled.predict(np.empty((0, 5), dtype=np.float32)).shape == (0,)
+
+
+class TestCompiledBackend:
+    """Test suite for the 'compiled' model_loader backend"""
+
+    def test_compiled_backend_selected(self):
+        """Test that ML_MODEL_BACKEND=compiled returns the NumPy evaluator after parity"""
+        # Arrange
+        X, y = training_data()
+        model = xgb.XGBRegressor(n_estimators=20, max_depth=4).fit(X, y)
+        pyfunc_model = Mock()
+        pyfunc_model.metadata.get_input_schema.return_value = None
+        pyfunc_model.predict = Mock(side_effect=lambda df: model.predict(df.to_numpy(np.float32)))
+        native = NativeXGBoostScorer(model, pyfunc_model)
+
+        # Act
+        with patch.object(model_loader, 'load_production_model', return_value=pyfunc_model), \
+             patch.object(model_loader, 'load_native_xgboost', return_value=native):
+            scorer = load_scoring_model(backend='compiled')
+
+        # Assert
+        assert isinstance(scorer, CompiledTreeScorer)
+        np.testing.assert_allclose(scorer.predict(X), model.predict(X), atol=1e-6)
+
+    def test_compile_failure_falls_back_to_native(self):
+        """Test that the native booster is used when compilation fails"""
+        # Arrange
+        X, y = training_data()
+        model = xgb.XGBRegressor(n_estimators=5, max_depth=2).fit(X, y)
+        pyfunc_model = Mock()
+        pyfunc_model.metadata.get_input_schema.return_value = None
+        pyfunc_model.predict = Mock(side_effect=lambda df: model.predict(df.to_numpy(np.float32)))
+        native = NativeXGBoostScorer(model, pyfunc_model)
+
+        # Act
+        with patch.object(model_loader, 'load_production_model', return_value=pyfunc_model), \
+             patch.object(model_loader, 'load_native_xgboost', return_value=native), \
+             patch.object(model_loader, 'load_compiled_trees', side_effect=ValueError('gblinear')):
+            scorer = load_scoring_model(backend='compiled')
+
+        # Assert
+        assert scorer is native
+
+    def test_large_batches_use_native_booster(self):
+        """Test that batches above max_rows are delegated to the native booster"""
+        # Arrange
+        X, y = training_data()
+        model = xgb.XGBRegressor(n_estimators=5, max_depth=3).fit(X, y)
+        native = Mock(predict_matrix=Mock(side_effect=lambda m: np.ones(len(m))))
+        scorer = CompiledTreeScorer(compile_booster(model), Mock(), large_batch_scorer=native,
+                                    max_rows=10)
+
+        # Act
+        small = scorer.predict(X[:10])
+        large = scorer.predict(X[:11])
+
+        # Assert
+        np.testing.assert_allclose(small, model.predict(X[:10]), atol=1e-6)
+        assert large.tolist() == [1.0] * 11
+        native.predict_matrix.assert_called_once()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
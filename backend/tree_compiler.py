@@ -0,0 +1,224 @@
+"""
+Compile an XGBoost tree ensemble into flat NumPy arrays
+
+The booster's JSON tree dump is flattened into one node table shared by all
+trees (feature index, threshold, left/right/missing child, leaf value), and
+CompiledTreeEnsemble.predict walks every tree for every row at once with
+NumPy indexing. Scoring then needs no XGBoost runtime, which keeps latency
+low for the small per-user candidate matrices /api/recommend scores.
+
+Usage:
+    python tree_compiler.py models:/<name>/<version> compiled_model.npz
+"""
+import sys
+import json
+import numpy as np
+
+# Objectives whose prediction is the raw margin, or a transform of it
+IDENTITY_OBJECTIVES = {'reg:squarederror', 'reg:linear', 'reg:absoluteerror',
+                       'reg:pseudohubererror', 'reg:squaredlogerror', 'reg:quantileerror'}
+LOGISTIC_OBJECTIVES = {'reg:logistic', 'binary:logistic'}
+EXP_OBJECTIVES = {'count:poisson', 'reg:gamma', 'reg:tweedie'}
+
+
+class CompiledTreeEnsemble:
+    """
+    Flat-array tree ensemble
+
+    Node i of the shared table is a leaf when feature[i] < 0. Otherwise rows
+    with x[feature[i]] < threshold[i] go to left[i], NaN goes to missing[i],
+    and the rest go to right[i]. roots holds each tree's root node.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'missing', 'value', 'roots')
+
+    def __init__(self, feature, threshold, left, right, missing, value, roots,
+                 base_margin, objective, max_depth):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.missing = np.asarray(missing, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.base_margin = float(base_margin)
+        self.objective = objective
+        self.max_depth = int(max_depth)
+
+        # Leaves loop back to themselves on every branch (+inf threshold, own
+        # index as children), so the walk needs no per-level leaf test
+        leaf = self.feature < 0
+        self._split_feature = np.where(leaf, 0, self.feature).astype(np.intp)
+        self._split_threshold = np.where(leaf, np.inf, self.threshold).astype(np.float32)
+        # Children as one (nodes, 2) table: column 0 when x < threshold, else 1
+        self._children = np.stack([self.left, self.right], axis=1).astype(np.intp)
+
+    @property
+    def num_trees(self):
+        return len(self.roots)
+
+    def predict_margin(self, X):
+        """Raw ensemble output (before the objective's transform) for each row"""
+        X = np.asarray(X, dtype=np.float32)
+        n = len(X)
+        if n == 0 or self.num_trees == 0:
+            return np.full(n, self.base_margin, dtype=np.float32)
+
+        # Feature-major copy so X[row, f] is flat[f * n + row]
+        flat = np.ascontiguousarray(X.T).reshape(-1)
+        has_missing = np.isnan(flat).any()
+        # (n_rows, n_trees) current node; every level moves all rows one step down
+        nodes = np.broadcast_to(self.roots.astype(np.intp), (n, self.num_trees)).copy()
+        row_offset = np.arange(n, dtype=np.intp)[:, None]
+        for _ in range(self.max_depth):
+            x = flat[self._split_feature[nodes] * n + row_offset]
+            go_right = ~(x < self._split_threshold[nodes])
+            next_nodes = self._children[nodes, go_right.astype(np.intp)]
+            if has_missing:
+                next_nodes = np.where(np.isnan(x), self.missing[nodes], next_nodes)
+            nodes = next_nodes
+
+        # Accumulate in float32 in tree order, like XGBoost's CPU predictor
+        margin = np.zeros(n, dtype=np.float32)
+        leaf_values = self.value[nodes]
+        for t in range(self.num_trees):
+            margin += leaf_values[:, t]
+        return margin + np.float32(self.base_margin)
+
+    def predict(self, X):
+        """Predictions in the model's output space (same as Booster.predict)"""
+        margin = self.predict_margin(X)
+        if self.objective in LOGISTIC_OBJECTIVES:
+            return (1.0 / (1.0 + np.exp(-margin.astype(np.float64)))).astype(np.float32)
+        if self.objective in EXP_OBJECTIVES:
+            return np.exp(margin.astype(np.float64)).astype(np.float32)
+        return margin
+
+    def save(self, path):
+        np.savez(path, base_margin=self.base_margin, objective=self.objective,
+                 max_depth=self.max_depth, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(*(data[name] for name in cls.ARRAYS), base_margin=float(data['base_margin']),
+                   objective=str(data['objective']), max_depth=int(data['max_depth']))
+
+
+def _parse_base_score(value):
+    # XGBoost >= 3 stores it as a vector string like "[1.5E0]"
+    return float(str(value).strip('[]').split(',')[0])
+
+
+def compile_booster(model, feature_names=None):
+    """
+    Compile an XGBoost Booster (or sklearn XGBModel) into a CompiledTreeEnsemble
+
+    Args:
+        model: xgboost.Booster or an sklearn wrapper with get_booster()
+        feature_names: column order of the matrices that will be scored;
+            needed when the booster splits on named features
+
+    Raises:
+        ValueError: the model is not a single-output gbtree with a supported objective
+    """
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    config = json.loads(booster.save_config())
+    learner = config['learner']
+
+    booster_type = learner['gradient_booster']['name']
+    if booster_type != 'gbtree':
+        raise ValueError(f"Only gbtree models can be compiled, got {booster_type}")
+    model_param = learner['learner_model_param']
+    if int(model_param.get('num_class', 0)) > 1 or int(model_param.get('num_target', 1)) > 1:
+        raise ValueError("Only single-output models can be compiled")
+
+    objective = learner['objective']['name']
+    base_score = _parse_base_score(model_param['base_score'])
+    if objective in IDENTITY_OBJECTIVES:
+        base_margin = base_score
+    elif objective in LOGISTIC_OBJECTIVES:
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+    elif objective in EXP_OBJECTIVES:
+        base_margin = float(np.log(base_score))
+    else:
+        raise ValueError(f"Unsupported objective: {objective}")
+
+    # Match Booster.predict, which stops at the early-stopping iteration
+    dumps = booster.get_dump(dump_format='json')
+    best_iteration = booster.attr('best_iteration')
+    if best_iteration is not None:
+        trees_per_round = int(learner['gradient_booster'].get('gbtree_model_param', {})
+                              .get('num_parallel_tree', 1))
+        dumps = dumps[:(int(best_iteration) + 1) * trees_per_round]
+
+    names = list(feature_names or booster.feature_names or [])
+    feature_index = {name: i for i, name in enumerate(names)}
+
+    def split_feature(split):
+        if split in feature_index:
+            return feature_index[split]
+        if split.startswith('f') and split[1:].isdigit():
+            return int(split[1:])
+        raise ValueError(f"Unknown split feature {split!r}; pass feature_names")
+
+    feature, threshold, left, right, missing, value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    for dump in dumps:
+        tree = json.loads(dump)
+        offset = len(feature)
+        # Flatten depth-first; nodeids may have gaps after pruning, so map
+        # them to consecutive positions in the shared table
+        nodes = []
+        stack = [(tree, 0)]
+        while stack:
+            node, depth = stack.pop()
+            nodes.append(node)
+            max_depth = max(max_depth, depth)
+            for child in node.get('children', ()):
+                stack.append((child, depth + 1))
+        position = {node['nodeid']: offset + i for i, node in enumerate(nodes)}
+
+        for node in nodes:
+            if 'leaf' in node:
+                here = position[node['nodeid']]
+                feature.append(-1)
+                threshold.append(0.0)
+                left.append(here)
+                right.append(here)
+                missing.append(here)
+                value.append(node['leaf'])
+            else:
+                feature.append(split_feature(node['split']))
+                threshold.append(node['split_condition'])
+                left.append(position[node['yes']])
+                right.append(position[node['no']])
+                missing.append(position[node['missing']])
+                value.append(0.0)
+        roots.append(offset)
+
+    return CompiledTreeEnsemble(feature, threshold, left, right, missing, value, roots,
+                                base_margin=base_margin, objective=objective, max_depth=max_depth)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    import mlflow.xgboost
+    from model_loader import FEATURE_COLUMNS, parity_probe_matrix
+
+    model_uri, output_path = sys.argv[1], sys.argv[2]
+    xgb_model = mlflow.xgboost.load_model(model_uri)
+    compiled = compile_booster(xgb_model, FEATURE_COLUMNS)
+
+    booster = xgb_model.get_booster() if hasattr(xgb_model, 'get_booster') else xgb_model
+    probe = parity_probe_matrix()
+    expected = booster.inplace_predict(probe, validate_features=False)
+    max_diff = float(np.max(np.abs(compiled.predict(probe) - expected)))
+
+    compiled.save(output_path)
+    print(f"✓ Compiled {compiled.num_trees} trees ({len(compiled.feature)} nodes, "
+          f"depth {compiled.max_depth}, {compiled.objective}) to {output_path}")
+    print(f"  Max difference from XGBoost on the parity probe: {max_diff:.2e}")
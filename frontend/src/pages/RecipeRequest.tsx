@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { Sidebar } from '@/components/Sidebar';
 import { TagInput } from '@/components/TagInput';
 import { useApp } from '@/context/AppContext';
+import { streamRecommendations } from '@/services/api';
 import { Search, Clock, ChefHat, Globe, Loader2 } from 'lucide-react';
 
 // Common ingredients for recipe requests
@@ -31,9 +32,6 @@ const CUISINES = [  'Any',
   'British'];
 const DIFFICULTIES = ['Any', 'Easy', 'Medium', 'Hard'];
 
-// API configuration
-const API_BASE_URL = 'http://localhost:5000';
-
 export default function RecipeRequest() {
   const navigate = useNavigate();
   const { setSearchResults, setLastRequest, user } = useApp();
@@ -58,37 +56,38 @@ export default function RecipeRequest() {
         return;
       }
 
-      // Call the backend recommendation API
-      const response = await fetch(`${API_BASE_URL}/api/recommend`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
+      // Stream the ranked recipes so the results page can show the first
+      // cards while the rest are still being scored
+      const results: any[] = [];
+      const request = { ingredients, cookingTime, difficulty, cuisine };
+      await streamRecommendations(
+        {
           user_id: user.id,
           search_ingredients: ingredients,  // ← This is the key ingredient search!
           preferred_cuisine: cuisine !== 'Any' ? [cuisine] : [],
           max_cooking_time: cookingTime,
-        })
-      });
-
-      if (!response.ok) {
-        const errorData = await response.json();
-        throw new Error(errorData.error || 'Failed to fetch recommendations');
+        },
+        {
+          onRecipe: (recipe) => {
+            results.push({
+              ...recipe,
+              matchScore: Math.round(recipe.ml_score * 100), // Convert 0-1 score to percentage
+            });
+            setSearchResults([...results]);
+            if (results.length === 1) {
+              setLastRequest(request);
+              navigate('/recipe-results');
+            }
+          },
+        }
+      );
+
+      if (results.length === 0) {
+        setSearchResults([]);
+        setLastRequest(request);
+        navigate('/recipe-results');
       }
 
-      const data = await response.json();
-      
-      // Transform the response to match your app's format
-      const results = data.recipes.map((recipe: any) => ({
-        ...recipe,
-        matchScore: Math.round(recipe.ml_score * 100), // Convert 0-1 score to percentage
-      }));
-
-      setSearchResults(results);
-      setLastRequest({ ingredients, cookingTime, difficulty, cuisine });
-      navigate('/recipe-results');
-
     } catch (err) {
       console.error('Search error:', err);
       setError(err instanceof Error ? err.message : 'Failed to search recipes. Please try again.');
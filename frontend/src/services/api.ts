@@ -60,4 +60,53 @@ export const recipeAPI = {
   recommend: (data: any) => api.post('/recommend', data),
 };
 
+// Streamed recommendations (NDJSON): onHeader gets the candidate counts,
+// onRecipe each ranked recipe as soon as the backend sends it
+export const streamRecommendations = async (
+  data: any,
+  handlers: {
+    onHeader?: (header: any) => void;
+    onRecipe: (recipe: any, rank: number) => void;
+  }
+) => {
+  const response = await fetch(`${API_BASE_URL}/recommend?stream=ndjson`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'application/x-ndjson',
+    },
+    body: JSON.stringify(data),
+  });
+
+  if (!response.ok || !response.body) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.error || 'Failed to fetch recommendations');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let count = 0;
+
+  const handle = (line: string) => {
+    if (!line.trim()) return;
+    const record = JSON.parse(line);
+    if (record.type === 'header') handlers.onHeader?.(record);
+    else if (record.type === 'recipe') handlers.onRecipe(record.recipe, record.rank);
+    else if (record.type === 'end') count = record.count;
+    else if (record.type === 'error') throw new Error(record.error);
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop() || '';
+    lines.forEach(handle);
+  }
+  handle(buffer + decoder.decode());
+  return count;
+};
+
 export default api;
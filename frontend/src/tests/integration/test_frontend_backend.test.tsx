@@ -50,6 +50,26 @@ vi.mock('lucide-react', () => ({
   Loader2: () => <span>⏳</span>,
 }));
 
+// Streamed /recommend response: NDJSON records split into chunks that cut
+// lines in half, as the network may deliver them
+const ndjsonResponse = (records: any[], chunkSize = 40) => {
+  const text = records.map(record => JSON.stringify(record)).join('\n') + '\n';
+  const chunks: Uint8Array[] = [];
+  for (let i = 0; i < text.length; i += chunkSize) {
+    chunks.push(new TextEncoder().encode(text.slice(i, i + chunkSize)));
+  }
+  return {
+    ok: true,
+    body: {
+      getReader: () => ({
+        read: async () => (chunks.length
+          ? { done: false, value: chunks.shift() }
+          : { done: true, value: undefined }),
+      }),
+    },
+  };
+};
+
 describe('RecipeRequest Component', () => {
   beforeEach(() => {
     vi.clearAllMocks();
@@ -70,26 +90,24 @@ describe('RecipeRequest Component', () => {
   });
 
   it('submits search and calls API', async () => {
-    const mockResponse = {
-      recipes: [
-        {
-          id: 1,
-          recipe_name: 'Test Recipe',
-          ml_score: 0.85,
-          ingredients_list: ['test'],
-          cuisine: 'italian',
-          cook_time_minutes: 30,
-          calories: 400,
-          servings: 4,
-          rating: 4.5,
-        },
-      ],
+    const recipe = {
+      id: 1,
+      recipe_name: 'Test Recipe',
+      ml_score: 0.85,
+      ingredients_list: ['test'],
+      cuisine: 'italian',
+      cook_time_minutes: 30,
+      calories: 400,
+      servings: 4,
+      rating: 4.5,
     };
 
-    global.fetch = vi.fn().mockResolvedValue({
-      ok: true,
-      json: async () => mockResponse,
-    });
+    global.fetch = vi.fn().mockResolvedValue(ndjsonResponse([
+      { type: 'header', total_candidates: 2, total_scored: 2 },
+      { type: 'recipe', rank: 1, recipe },
+      { type: 'recipe', rank: 2, recipe: { ...recipe, id: 2, ml_score: 0.5 } },
+      { type: 'end', count: 2 },
+    ]));
 
     render(
       <BrowserRouter>
@@ -100,31 +118,69 @@ describe('RecipeRequest Component', () => {
     fireEvent.click(screen.getByRole('button', { name: /find recipes/i }));
 
     await waitFor(() => {
-      // Check API was called
+      // Check the streaming endpoint was called
       expect(global.fetch).toHaveBeenCalledWith(
-        'http://localhost:5000/api/recommend',
+        'http://localhost:5000/api/recommend?stream=ndjson',
         expect.objectContaining({
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
+          headers: { 'Content-Type': 'application/json', Accept: 'application/x-ndjson' },
         })
       );
 
-      // Check results were processed
-      expect(mockSetSearchResults).toHaveBeenCalled();
+      // Check results were passed on one recipe at a time
+      expect(mockSetSearchResults).toHaveBeenCalledTimes(2);
+      expect(mockSetSearchResults.mock.calls[0][0]).toHaveLength(1);
       expect(mockSetSearchResults.mock.calls[0][0][0].matchScore).toBe(85);
-      
-      // Check navigation
+      expect(mockSetSearchResults.mock.calls[1][0].map((r: any) => r.matchScore)).toEqual([85, 50]);
+
+      // Check navigation happened once, with the first recipe
+      expect(mockNavigate).toHaveBeenCalledTimes(1);
+      expect(mockNavigate).toHaveBeenCalledWith('/recipe-results');
+    });
+  });
+
+  it('navigates to empty results when nothing matches', async () => {
+    global.fetch = vi.fn().mockResolvedValue(ndjsonResponse([
+      { type: 'header', total_candidates: 0, total_scored: 0 },
+      { type: 'end', count: 0 },
+    ]));
+
+    render(
+      <BrowserRouter>
+        <RecipeRequest />
+      </BrowserRouter>
+    );
+
+    fireEvent.click(screen.getByRole('button', { name: /find recipes/i }));
+
+    await waitFor(() => {
+      expect(mockSetSearchResults).toHaveBeenCalledWith([]);
       expect(mockNavigate).toHaveBeenCalledWith('/recipe-results');
     });
   });
 
+  it('shows the error sent in the stream', async () => {
+    global.fetch = vi.fn().mockResolvedValue(ndjsonResponse([
+      { type: 'header', total_candidates: 2, total_scored: 2 },
+      { type: 'error', error: 'Scoring failed' },
+    ]));
+
+    render(
+      <BrowserRouter>
+        <RecipeRequest />
+      </BrowserRouter>
+    );
+
+    fireEvent.click(screen.getByRole('button', { name: /find recipes/i }));
+
+    expect(await screen.findByText('Scoring failed')).toBeInTheDocument();
+    expect(mockNavigate).not.toHaveBeenCalled();
+  });
+
   it('shows loading state', async () => {
     global.fetch = vi.fn().mockImplementation(
       () => new Promise(resolve => 
-        setTimeout(() => resolve({
-          ok: true,
-          json: async () => ({ recipes: [] }),
-        }), 100)
+        setTimeout(() => resolve(ndjsonResponse([{ type: 'end', count: 0 }])), 100)
       )
     );
 